@@ -1,3 +1,6 @@
+from functools import lru_cache
+import re
+
 from termcolor import colored
 
 from enums import Hand, Positions
@@ -53,65 +56,136 @@ def color_field(field):
     field = field.replace('.', colored('.', 'yellow'))
     return field
 
-def print_field(game, field):
-    field = color_field(field)
-    assert 'PPP' in field
+# Every token of `field` is a fixed-width slot. Compiling the field once finds
+# where each slot sits, so a frame is just the slots' contents and a redraw
+# only has to touch the slots that changed.
+SLOT_TOKENS = ['XXXXXXXXXXXXX', 'PPP', 'BBB', 'CCC', 'R1', 'R2', 'R3', '1B', '2B', '3B', 'SS', 'LF', 'CF', 'RF']
+_slot_pattern = re.compile('|'.join(SLOT_TOKENS))
+
+
+class FieldTemplate:
+    # `parts[row]` alternates pre-colored static text and slot tokens;
+    # `slots[token]` is (row, column, width), 0-based.
+    def __init__(self, field):
+        self.parts = []
+        self.slots = {}
+        for row, line in enumerate(field.split('\n')):
+            parts = []
+            end   = 0
+            for match in _slot_pattern.finditer(line):
+                parts.append(color_field(line[end:match.start()]))
+                parts.append(match.group())
+                self.slots[match.group()] = (row, match.start(), len(match.group()))
+                end = match.end()
+            parts.append(color_field(line[end:]))
+            self.parts.append(parts)
+
+    @property
+    def height(self) -> int:
+        return len(self.parts)
+
+    def render(self, slots) -> str:
+        # the whole field with `slots` (token -> text) filled in
+        return '\n'.join(
+            ''.join(slots.get(part, part) if i % 2 else part for i, part in enumerate(parts))
+            for parts in self.parts
+        )
+
+
+@lru_cache(maxsize=None)
+def compile_field(field) -> FieldTemplate:
+    return FieldTemplate(field)
+
+def move_to(row, column) -> str:
+    # ANSI cursor position, 0-based
+    return f"\x1b[{row+1};{column+1}H"
+
+
+class FieldRenderer:
+    # Draws the field at screen row `top`: in full the first time, then only
+    # the slots that differ from the last frame, as ANSI cursor moves.
+    def __init__(self, field=field, top=0):
+        self.template = compile_field(field)
+        self.top      = top
+        self._drawn   = None
+
+    def reset(self, top=None):
+        # the screen was cleared: draw everything next time
+        if top is not None:
+            self.top = top
+        self._drawn = None
+
+    def frame(self, slots) -> str:
+        if self._drawn is None:
+            self._drawn = dict(slots)
+            return move_to(self.top, 0) + self.template.render(slots)
+        changes = []
+        for token, text in slots.items():
+            if self._drawn.get(token) != text:
+                row, column, width = self.template.slots[token]
+                changes.append(move_to(self.top + row, column) + text)
+                self._drawn[token] = text
+        return ''.join(changes)
+
+
+def field_slots(game) -> dict:
+    # token -> colored text of every slot, for the current at-bat
+    half  = game.inning.half
+    slots = {}
 
     # DRAW FIELDERS
     # draw pitcher
-    player = game.inning.half.fielding.pitcher
+    player = half.fielding.pitcher
     if player.hand == Hand.R:
         sub = f"{player.number:>3}"
     else:
         sub = f"{player.number:<3}"
-    field = field.replace('PPP', colored(sub, game.inning.half.fielding.color))
+    slots['PPP'] = colored(sub, half.fielding.color)
 
     # draw fielders
-    for player in game.inning.half.fielding.lineup:
-        #print(player.name, player.pos.name, player.number)
+    for player in half.fielding.lineup:
         if player.pos.name == 'C':
             pos = 'CCC'
-            if game.inning.half.batting.up_to_bat.hand == Hand.R:
+            if half.batting.up_to_bat.hand == Hand.R:
                 sub = f"{player.number:>3}"
             else:
                 sub = f"{player.number:<3}"
         else:
             pos = player.pos.name
             sub = f"{player.number:>2}"
-        field = field.replace(pos, colored(sub, game.inning.half.fielding.color))
+        if pos in SLOT_TOKENS:
+            slots.setdefault(pos, colored(sub, half.fielding.color))
 
     # DRAW BATTING TEAM
     # draw batter
-    player = game.inning.half.batting.up_to_bat
-    #print('batter:', player.name, player.number)
+    player = half.batting.up_to_bat
     if player.hand == Hand.R:
         sub = f"{player.number:<3}"
     else:
         sub = f"{player.number:>3}"
-    field = field.replace('BBB', colored(sub, game.inning.half.batting.color))
+    slots['BBB'] = colored(sub, half.batting.color)
 
     # draw runners
-    #print('runners:')
     for base_number, player in enumerate(game.bases):
         base_number += 1
         pos = f"R{base_number}"
         if player:
-            #print(player.name, player.number)
             sub = f"{player.number:>2}"
-            field = field.replace(pos, colored(sub, game.inning.half.batting.color))
+            slots[pos] = colored(sub, half.batting.color)
         else:
             if base_number == 3:
                 sub = f"{'o':<2}"
             else:
                 sub = f"{'o':>2}"
-            field = field.replace(pos, colored(sub, 'white'))
+            slots[pos] = colored(sub, 'white')
 
     # draw result of AB
-    ab_result = game.inning.half.at_bat.result or ''
-    sub = f"{ab_result:^13}"
-    field = field.replace('XXXXXXXXXXXXX', sub)
+    ab_result = half.at_bat.result or ''
+    slots['XXXXXXXXXXXXX'] = f"{ab_result:^13}"
+    return slots
 
-    print(field)
+def print_field(game, field):
+    print(compile_field(field).render(field_slots(game)))
 
 
 if __name__ == '__main__':
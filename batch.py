@@ -0,0 +1,199 @@
+from collections import Counter
+
+import numpy as np
+
+from dice import D12, D20, PITCHER_DICE
+from enums import Positions, SwingResult
+from events import play_hit
+from game import Team, N_INNINGS
+import odds
+from simulate import MatchupResult, load_roster
+import tables
+
+
+# what `AtBat.play` makes of each swing result
+OUT, HIT, WALK, CRITICAL_HIT = 0, 1, 2, 3
+
+OUTCOME = np.full(len(SwingResult)+1, OUT, dtype=np.int8)
+OUTCOME[SwingResult.CRITICAL_HIT] = CRITICAL_HIT
+OUTCOME[SwingResult.ORDINARY_HIT] = HIT
+OUTCOME[SwingResult.WALK]         = WALK
+
+# base state after the batter takes n bases and the runners r, and the runs
+# it scores: ADVANCE_MASK[mask, n, r]
+ADVANCE_MASK = np.array([ [ [ t[0] for t in row ] for row in rows ] for rows in tables.PLAY_ADVANCE ])
+ADVANCE_RUNS = np.array([ [ [ t[1] for t in row ] for row in rows ] for rows in tables.PLAY_ADVANCE ])
+
+
+def pitch_die(player):
+    spec = PITCHER_DICE[player.pd]
+    return spec.sign, spec.sides
+
+
+def hit_plays(team) -> np.ndarray:
+    # plays[critical, d20-1, d12-1] = (great play, batter bases, runner bases,
+    # error) of a hit against `team`'s fielders, the d20 after the batter's
+    # traits
+    mods  = dict(odds.team_defense(team))
+    plays = np.zeros((2, D20.sides, D12.sides, 4), dtype=np.int64)
+    for critical in (0, 1):
+        for hit_roll in range(1, D20.sides+1):
+            hit_events = tables.hit_table(hit_roll)
+            for d12 in range(1, D12.sides+1):
+                play = play_hit(hit_events, bool(critical), { pos: d12 + mods.get(pos, 0) for pos in Positions })
+                plays[critical, hit_roll-1, d12-1] = play.great_play, play.batter_bases, play.runner_bases, play.error
+    return plays
+
+
+def counts(values) -> Counter:
+    return Counter({ int(v): int(n) for v, n in zip(*np.unique(values, return_counts=True)) })
+
+
+class BatchResult:
+    def __init__(self, runs, hits, innings, regulation_runs=None, errors=None):
+        self.runs            = runs             # (n_games, 2): away, home
+        self.hits            = hits             # (n_games, 2): away, home
+        self.innings         = innings          # (n_games,)
+        self.regulation_runs = regulation_runs  # (n_games, 2): runs before extra innings
+        self.errors          = errors           # (n_games, 2): errors by the fielding side
+
+    @property
+    def n_games(self):
+        return len(self.innings)
+
+    def win_pct(self, side: int) -> float:
+        wins = self.runs[:, side] > self.runs[:, 1-side]
+        return wins.mean()
+
+    def to_matchup_result(self, away, home) -> MatchupResult:
+        result = MatchupResult(away, home)
+        result.games         = self.n_games
+        result.wins          = [ int((self.runs[:, s] > self.runs[:, 1-s]).sum()) for s in (0, 1) ]
+        result.runs          = [ counts(self.runs[:, s]) for s in (0, 1) ]
+        result.innings       = counts(self.innings)
+        result.extra_innings = int((self.innings > N_INNINGS).sum())
+        return result
+
+
+class BatchEngine:
+    # Plays many games between the same two teams in lockstep. The state of
+    # every game lives in arrays and each step plays one at-bat in every game
+    # that is not over yet, with the same rules as `Game.play`.
+
+    def __init__(self, away: Team, home: Team):
+        self.teams = away, home
+
+        starters = [ team.starting_pitchers for team in self.teams ]
+
+        # swing outcome by batting side, lineup slot and MSS, and what the
+        # batter's traits add to the swing and the hit table roll
+        self.swing     = np.zeros((2, 9, tables.MAX_MSS+1), dtype=np.int8)
+        self.swing_mod = np.zeros((2, 9), dtype=np.int64)
+        self.hit_mod   = np.zeros((2, 9), dtype=np.int64)
+        for side, team in enumerate(self.teams):
+            for slot, batter in enumerate(team.lineup):
+                self.swing[side, slot]     = OUTCOME[np.array(batter.swing_results)]
+                self.swing_mod[side, slot] = batter.mods.swing
+                self.hit_mod[side, slot]   = batter.mods.hit
+
+        # what a hit comes to against each side's fielders
+        self.plays = np.stack([ hit_plays(team) for team in self.teams ])
+
+        # signed pitch die of each candidate starting pitcher, per side
+        self.n_starters  = [ len(pitchers) for pitchers in starters ]
+        self.pitch_sign  = [ np.array([ pitch_die(p)[0] for p in pitchers ]) for pitchers in starters ]
+        self.pitch_sides = [ np.array([ pitch_die(p)[1] for p in pitchers ]) for pitchers in starters ]
+        self.pitch_mod   = [ np.array([ p.mods.pitch for p in pitchers ]) for pitchers in starters ]
+
+    def play(self, n_games: int, seed=None) -> BatchResult:
+        rng = np.random.default_rng(seed)
+
+        # pitch die of the starter of each side, chosen like `random.choice`
+        sign  = np.empty((n_games, 2), dtype=np.int64)
+        sides = np.empty((n_games, 2), dtype=np.int64)
+        mod   = np.empty((n_games, 2), dtype=np.int64)
+        for side in (0, 1):
+            starter = rng.integers(0, self.n_starters[side], n_games)
+            sign[:, side]  = self.pitch_sign[side][starter]
+            sides[:, side] = self.pitch_sides[side][starter]
+            mod[:, side]   = self.pitch_mod[side][starter]
+
+        outs    = np.zeros(n_games, dtype=np.int64)
+        bases   = np.zeros(n_games, dtype=np.int64)  # bit n-1 set: runner on base n
+        half    = np.zeros(n_games, dtype=np.int64)  # 0: top, away bats
+        inning  = np.ones(n_games, dtype=np.int64)
+        slot    = np.full((n_games, 2), -1, dtype=np.int64)
+        runs    = np.zeros((n_games, 2), dtype=np.int64)
+        hits    = np.zeros((n_games, 2), dtype=np.int64)
+        errors  = np.zeros((n_games, 2), dtype=np.int64)
+        regulation = np.zeros((n_games, 2), dtype=np.int64)
+
+        active = np.arange(n_games)
+        while active.size:
+            g   = active
+            bat = half[g]
+            fld = 1 - bat
+
+            # next batter up
+            batter = (slot[g, bat] + 1) % 9
+            slot[g, bat] = batter
+
+            # pitch and swing
+            pitch = rng.integers(1, sides[g, fld] + 1) * sign[g, fld] + mod[g, fld]
+            swing = rng.integers(1, 101, g.size) + self.swing_mod[bat, batter]
+            mss   = np.clip(swing + pitch, 1, tables.MAX_MSS)
+            code  = self.swing[bat, batter, mss]
+
+            # a hit rolls on the hit table, and the defense a d12 whether or
+            # not the hit gives it a chance
+            is_hit = (code == HIT) | (code == CRITICAL_HIT)
+            h   = g[is_hit]
+            b   = bat[is_hit]
+            hit_roll = np.clip(rng.integers(0, D20.sides, h.size) + self.hit_mod[b, batter[is_hit]], 0, D20.sides-1)
+            d12      = rng.integers(0, D12.sides, h.size)
+            great_play, n, r, error = self.plays[1-b, (code[is_hit] == CRITICAL_HIT).astype(np.int64), hit_roll, d12].T
+
+            safe = great_play == 0
+            h, b, n, r = h[safe], b[safe], n[safe], r[safe]
+            scored = ADVANCE_RUNS[bases[h], n, r]
+            runs[h, b] += scored
+            regulation[h, b] += scored * (inning[h] <= N_INNINGS)
+            hits[h, b] += 1
+            errors[h, 1-b] += error[safe]
+            bases[h] = ADVANCE_MASK[bases[h], n, r]
+
+            is_out = code == OUT
+            outs[g[is_out]] += 1
+            outs[g[is_hit][~safe]] += 1
+
+            # three outs end the half
+            over = g[outs[g] == 3]
+            outs[over]  = 0
+            bases[over] = 0
+            top    = over[half[over] == 0]
+            bottom = over[half[over] == 1]
+            half[top] = 1
+            half[bottom] = 0
+
+            # after a full inning the game is over unless it is still tied or
+            # has not gone the distance yet
+            done = bottom[(inning[bottom] >= N_INNINGS) & (runs[bottom, 0] != runs[bottom, 1])]
+            inning[bottom] += 1
+
+            if done.size:
+                finished = np.zeros(n_games, dtype=bool)
+                finished[done] = True
+                active = g[~finished[g]]
+
+        return BatchResult(runs, hits, inning - 1, regulation, errors)
+
+
+def simulate_batch(roster_a, roster_b, n_games, seed=None) -> MatchupResult:
+    away = Team(*load_roster(roster_a))
+    home = Team(*load_roster(roster_b))
+    if roster_a == roster_b:
+        home.name = "The Dopplegangers"
+    for team in (away, home):
+        team.set_lineup()
+    result = BatchEngine(away, home).play(n_games, seed=seed)
+    return result.to_matchup_result(away.name, home.name)
@@ -0,0 +1,269 @@
+import argparse
+from collections import namedtuple
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+
+from tabulate import tabulate
+
+import art
+from batch import BatchEngine
+import dice
+from game import Game, Team, roll
+from simulate import load_roster, play_game
+import tables
+
+
+# Benchmarks with fixed rosters and seeds, so two runs do the same work.
+# Every benchmark is timed `REPEAT` times with enough calls to last at least
+# `MIN_SECS` each, and the fastest is kept: the others only add noise. Runs
+# are appended to a JSON history; `compare` flags benchmarks that got slower
+# than a threshold between two runs.
+
+ROSTER_AWAY = 'roster__denver_dingers.csv'
+ROSTER_HOME = 'roster__diamond_dogs.csv'
+SEED        = 2023
+HISTORY     = 'bench_history.json'
+REPEAT      = 5
+MIN_SECS    = 0.2
+THRESHOLD   = 0.10
+
+Benchmark = namedtuple('Benchmark', ['name', 'kind', 'setup'])
+
+BENCHMARKS = []
+
+def benchmark(kind):
+    # `setup()` returns the function to time and the units of work one call
+    # does, e.g. {'games': 20, 'at_bats': 1364}
+    def register(setup):
+        BENCHMARKS.append(Benchmark(setup.__name__, kind, setup))
+        return setup
+    return register
+
+
+def rosters():
+    return load_roster(ROSTER_AWAY), load_roster(ROSTER_HOME)
+
+def started_game(seed=SEED) -> Game:
+    # a game with its first at-bat played, so every part of it exists
+    game = Game(seed=seed)
+    away, home = rosters()
+    game.set_teams(Team(*away), Team(*home))
+    for team, color in zip(game.teams, ('light_red', 'light_blue')):
+        team.color = color
+        team.set_lineup()
+    game.set_starting_pitchers()
+    next(game.steps())
+    return game
+
+
+@benchmark('micro')
+def roll_d100():
+    dice.seed(SEED)
+    return (lambda: roll('d100')), { 'rolls': 1 }
+
+@benchmark('micro')
+def dice_roll():
+    roller = dice.Roller(SEED)
+    return (lambda: dice.D100.roll(roller)), { 'rolls': 1 }
+
+@benchmark('micro')
+def advance_batter():
+    bases = started_game().bases
+    def run():
+        bases.clear()
+        for n in (1, 1, 2, 1, 3, 4):
+            bases.advance_batter(n)
+    return run, { 'advances': 6 }
+
+@benchmark('micro')
+def swing_result_table():
+    def run():
+        for mss in range(1, tables.MAX_MSS+1):
+            tables.swing_result_table(30, 38, mss)
+    return run, { 'lookups': tables.MAX_MSS }
+
+@benchmark('micro')
+def swing_results_compile():
+    compile = tables.swing_results.__wrapped__
+    return (lambda: compile(30, 38)), { 'tables': 1 }
+
+@benchmark('micro')
+def get_team_from_roster():
+    game = Game(seed=SEED)
+    return (lambda: game.get_team_from_roster(ROSTER_AWAY)), { 'rosters': 1 }
+
+@benchmark('micro')
+def print_field():
+    game = started_game()
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            game.print_field()
+    return run, { 'frames': 1 }
+
+@benchmark('micro')
+def field_frame():
+    # what the ANSI observer draws for an at-bat that changed a few slots
+    game     = started_game()
+    renderer = art.FieldRenderer()
+    slots    = art.field_slots(game)
+    other    = dict(slots, R1=' 9', BBB='12 ', XXXXXXXXXXXXX='   SINGLE    ')
+    renderer.frame(slots)
+    def run():
+        renderer.frame(other)
+        renderer.frame(slots)
+    return run, { 'frames': 2 }
+
+@benchmark('macro')
+def headless_games():
+    away, home = rosters()
+    seeds = range(SEED, SEED+20)
+    at_bats = sum(
+        len(half.at_bats)
+        for game in (play_game(away, home, seed=seed) for seed in seeds)
+        for inning in game.innings
+        for half in inning.halfs
+    )
+    def run():
+        for seed in seeds:
+            play_game(away, home, seed=seed)
+    return run, { 'games': len(seeds), 'at_bats': at_bats }
+
+@benchmark('macro')
+def batch_games():
+    away, home = rosters()
+    away, home = Team(*away), Team(*home)
+    for team in (away, home):
+        team.set_lineup()
+    engine = BatchEngine(away, home)
+    return (lambda: engine.play(2000, seed=SEED)), { 'games': 2000 }
+
+@benchmark('macro')
+def load_rosters():
+    return (lambda: rosters()), { 'rosters': 2 }
+
+
+def time_benchmark(bench: Benchmark, repeat=REPEAT, min_secs=MIN_SECS) -> dict:
+    run, units = bench.setup()
+    timer = timeit.Timer(run)
+    calls = 1
+    while timer.timeit(calls) < min_secs:
+        calls *= 2
+    best  = min(timer.repeat(repeat, calls)) / calls
+    return {
+        'kind':  bench.kind,
+        'secs':  best,
+        'rates': { unit: n / best for unit, n in units.items() },
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(select=None, repeat=REPEAT, min_secs=MIN_SECS) -> dict:
+    results = {}
+    for bench in BENCHMARKS:
+        if select and not any(s in bench.name for s in select):
+            continue
+        results[bench.name] = time_benchmark(bench, repeat, min_secs)
+    return {
+        'time':     datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit':   git_commit(),
+        'python':   platform.python_version(),
+        'machine':  platform.machine(),
+        'results':  results,
+    }
+
+
+def load_history(filename) -> list:
+    if not os.path.exists(filename):
+        return []
+    with open(filename) as fh:
+        return json.load(fh)
+
+def save_run(filename, run):
+    history = load_history(filename)
+    history.append(run)
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_filename, 'w') as fh:
+        json.dump(history, fh, indent=1)
+    os.replace(tmp_filename, filename)
+
+def compare(before: dict, after: dict, threshold=THRESHOLD) -> list:
+    # (name, secs before, secs after, change, regressed) of every benchmark in
+    # both runs; a change of +0.25 is 25% slower
+    rows = []
+    for name, result in after['results'].items():
+        if name not in before['results']:
+            continue
+        old    = before['results'][name]['secs']
+        new    = result['secs']
+        change = new / old - 1
+        rows.append((name, old, new, change, change > threshold))
+    return rows
+
+def format_secs(secs) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if secs >= scale:
+            return f"{secs / scale:.3g} {unit}"
+    return f"{secs / 1e-9:.3g} ns"
+
+def print_run(run):
+    rows = [
+        [ name, result['kind'], format_secs(result['secs']), ', '.join(f"{rate:,.0f} {unit}/s" for unit, rate in result['rates'].items()) ]
+        for name, result in run['results'].items()
+    ]
+    print(tabulate(rows, headers=['Benchmark', 'Kind', 'Per call', 'Rate'], tablefmt='fancy_grid'))
+
+def print_comparison(rows, threshold):
+    print(tabulate(
+        [ [ name, format_secs(old), format_secs(new), f"{change:+.1%}", 'REGRESSION' if regressed else '' ] for name, old, new, change, regressed in rows ],
+        headers=['Benchmark', 'Before', 'After', 'Change', f"> {threshold:.0%}"],
+        tablefmt='fancy_grid',
+    ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths of the engine.")
+    parser.add_argument('--history', default=HISTORY, help="JSON file of past runs")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the benchmarks and add them to the history")
+    run_parser.add_argument('select', nargs='*', help="only benchmarks whose name contains one of these")
+    run_parser.add_argument('--repeat', type=int, default=REPEAT)
+    run_parser.add_argument('--min-secs', type=float, default=MIN_SECS)
+    run_parser.add_argument('--no-save', action='store_true', help="do not add this run to the history")
+
+    compare_parser = commands.add_parser('compare', help="compare two runs of the history, the last two by default")
+    compare_parser.add_argument('before', type=int, nargs='?', default=-2, help="index of the earlier run")
+    compare_parser.add_argument('after', type=int, nargs='?', default=-1, help="index of the later run")
+    compare_parser.add_argument('--threshold', type=float, default=THRESHOLD, help="slowdown that counts as a regression")
+
+    commands.add_parser('list', help="list the benchmarks")
+
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for bench in BENCHMARKS:
+            print(f"{bench.name:<24}{bench.kind}")
+    elif args.command == 'run':
+        run = run_benchmarks(args.select, args.repeat, args.min_secs)
+        print_run(run)
+        if not args.no_save:
+            save_run(args.history, run)
+    else:
+        history = load_history(args.history)
+        if len(history) < 2:
+            sys.exit(f"Need two runs in {args.history} to compare.")
+        rows = compare(history[args.before], history[args.after], args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row[-1] for row in rows):
+            sys.exit(1)
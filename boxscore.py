@@ -0,0 +1,230 @@
+import math
+
+from tabulate import tabulate
+
+from enums import SwingResult
+from observers import Observer
+
+
+# Box scores over any number of games. Everything here is a count, a running
+# mean and variance or a fixed-size histogram, so memory stays the same however
+# many games are fed in, and everything merges, so every worker can keep its
+# own and send it back.
+
+# runs in a game by one team: the last bin is for this many or more
+MAX_RUNS = 30
+
+
+class RunningStat:
+    # Count, mean, variance (Welford's online algorithm), min and max of a
+    # stream of numbers. Merging uses the pairwise update of Chan et al.
+    __slots__ = ('n', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self):
+        self.n    = 0
+        self.mean = 0.0
+        self.m2   = 0.0
+        self.min  = math.inf
+        self.max  = -math.inf
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2   += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def merge(self, other: 'RunningStat'):
+        if not other.n:
+            return self
+        n     = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2   += other.m2 + delta * delta * self.n * other.n / n
+        self.n     = n
+        self.min   = min(self.min, other.min)
+        self.max   = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self) -> float:
+        # of the sample
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class Histogram:
+    # Counts of whole numbers 0..size-1, the last bin taking everything
+    # bigger.
+    __slots__ = ('counts',)
+
+    def __init__(self, size=MAX_RUNS+1):
+        self.counts = [0] * size
+
+    def add(self, x):
+        self.counts[min(x, len(self.counts) - 1)] += 1
+
+    def merge(self, other: 'Histogram'):
+        assert len(self.counts) == len(other.counts), "Histograms of different sizes."
+        self.counts = [ a + b for a, b in zip(self.counts, other.counts) ]
+        return self
+
+    @property
+    def n(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q) -> int:
+        # smallest x with at least a `q` fraction of the counts at or below it
+        target = q * self.n
+        total  = 0
+        for x, count in enumerate(self.counts):
+            total += count
+            if total >= target and total:
+                return x
+        return len(self.counts) - 1
+
+
+class BattingLine:
+    # A player's plate appearances, hits, walks, outs made, runs scored and
+    # runs batted in.
+    __slots__ = ('pa', 'h', 'bb', 'outs', 'r', 'rbi')
+
+    def __init__(self):
+        self.pa   = 0
+        self.h    = 0
+        self.bb   = 0
+        self.outs = 0
+        self.r    = 0
+        self.rbi  = 0
+
+    def merge(self, other: 'BattingLine'):
+        self.pa   += other.pa
+        self.h    += other.h
+        self.bb   += other.bb
+        self.outs += other.outs
+        self.r    += other.r
+        self.rbi  += other.rbi
+        return self
+
+    @property
+    def avg(self) -> float:
+        at_bats = self.pa - self.bb
+        return self.h / at_bats if at_bats else 0.0
+
+    @property
+    def obp(self) -> float:
+        return (self.h + self.bb) / self.pa if self.pa else 0.0
+
+
+class TeamLine:
+    # Per-game distributions of one team: runs scored and allowed, hits and
+    # errors, and a histogram of runs scored.
+    __slots__ = ('runs', 'allowed', 'hits', 'errors', 'runs_histogram')
+
+    def __init__(self):
+        self.runs           = RunningStat()
+        self.allowed        = RunningStat()
+        self.hits           = RunningStat()
+        self.errors         = RunningStat()
+        self.runs_histogram = Histogram()
+
+    def add(self, runs, allowed, hits, errors):
+        self.runs.add(runs)
+        self.allowed.add(allowed)
+        self.hits.add(hits)
+        self.errors.add(errors)
+        self.runs_histogram.add(runs)
+
+    def merge(self, other: 'TeamLine'):
+        self.runs.merge(other.runs)
+        self.allowed.merge(other.allowed)
+        self.hits.merge(other.hits)
+        self.errors.merge(other.errors)
+        self.runs_histogram.merge(other.runs_histogram)
+        return self
+
+
+class BoxScore:
+    # Batting lines of every player, by (team name, number), and team lines
+    # by team name, over every game recorded or merged.
+    def __init__(self):
+        self.players = {}
+        self.names   = {}
+        self.teams   = {}
+
+    def line(self, team, player) -> BattingLine:
+        key  = (team.name, player.number)
+        line = self.players.get(key)
+        if line is None:
+            line = self.players[key] = BattingLine()
+            self.names[key] = player.name
+        return line
+
+    def add_at_bat(self, at_bat):
+        team = at_bat.half.batting
+        line = self.line(team, at_bat.batter)
+        line.pa += 1
+        if at_bat.hit_roll is not None and not at_bat.great_play:
+            line.h += 1
+        elif at_bat.swing_result is SwingResult.WALK:
+            line.bb += 1
+        else:
+            line.outs += 1
+        # runs that score on an error are not batted in
+        if not at_bat.error:
+            line.rbi += len(at_bat.scored)
+        for runner in at_bat.scored:
+            self.line(team, runner).r += 1
+
+    def add_game(self, game):
+        score = game.linescore
+        for side, team in enumerate(game.teams):
+            line = self.teams.get(team.name)
+            if line is None:
+                line = self.teams[team.name] = TeamLine()
+            line.add(score.runs[side], score.runs[1-side], score.hits[side], score.errors[side])
+
+    def merge(self, other: 'BoxScore'):
+        for key, line in other.players.items():
+            if key in self.players:
+                self.players[key].merge(line)
+            else:
+                self.players[key] = line
+                self.names[key]   = other.names[key]
+        for name, line in other.teams.items():
+            if name in self.teams:
+                self.teams[name].merge(line)
+            else:
+                self.teams[name] = line
+        return self
+
+    def print(self):
+        rows = [
+            [ team, self.names[team, number], line.pa, line.h, line.bb, line.outs, line.r, line.rbi, f"{line.avg:.3f}", f"{line.obp:.3f}" ]
+            for (team, number), line in sorted(self.players.items())
+        ]
+        print(tabulate(rows, headers=['Team', 'Player', 'PA', 'H', 'BB', 'Outs', 'R', 'RBI', 'AVG', 'OBP'], tablefmt='fancy_grid'))
+        rows = [
+            [ name, line.runs.n, f"{line.runs.mean:.2f} ± {line.runs.std:.2f}", line.runs_histogram.quantile(0.5), line.runs_histogram.quantile(0.9),
+              f"{line.allowed.mean:.2f}", f"{line.hits.mean:.2f}", f"{line.errors.mean:.2f}" ]
+            for name, line in sorted(self.teams.items())
+        ]
+        print(tabulate(rows, headers=['Team', 'G', 'R/G', 'Median R', '90% R', 'RA/G', 'H/G', 'E/G'], tablefmt='fancy_grid'))
+
+
+class BoxScoreKeeper(Observer):
+    # Feeds every game it watches into `box`.
+    def __init__(self, box: BoxScore):
+        self.box = box
+
+    def at_bat_finished(self, at_bat):
+        self.box.add_at_bat(at_bat)
+
+    def game_finished(self, game):
+        self.box.add_game(game)
@@ -0,0 +1,136 @@
+import json
+import os
+
+import numpy as np
+
+from playlog import PlateAppearance
+
+
+# Plate appearances stored a column to a file: `<column>.bin` holds the
+# column's fixed-width values back to back, and `schema.json` names every
+# column and its NumPy dtype. A reader maps the files into memory and hands
+# out NumPy views of them, so scanning a column reads it straight from the
+# page cache with no parsing and no copies. Appending only ever adds to the
+# end of every file; a log cut short while writing is read up to its last
+# complete row.
+
+SCHEMA  = 'schema.json'
+VERSION = 2
+
+COLUMNS = (
+    ('game',         '<u8'),
+    ('inning',       '<u2'),
+    ('half',         'u1'),
+    ('batter',       'u1'),
+    ('pitcher',      'u1'),
+    ('pitch',        'i1'),
+    ('swing',        'i1'),
+    ('mss',          'u1'),
+    ('result',       'u1'),
+    ('bases_before', 'u1'),
+    ('bases_after',  'u1'),
+    ('outs',         'u1'),
+    ('runs_away',    '<u2'),
+    ('runs_home',    '<u2'),
+    ('runs',         'u1'),
+)
+assert tuple(name for name, dtype in COLUMNS) == PlateAppearance._fields
+
+ROW = np.dtype(list(COLUMNS))
+
+
+def column_filename(directory, name):
+    return os.path.join(directory, f"{name}.bin")
+
+def read_schema(directory) -> dict:
+    with open(os.path.join(directory, SCHEMA)) as fh:
+        return json.load(fh)
+
+def write_schema(directory):
+    schema = { 'version': VERSION, 'columns': [ list(column) for column in COLUMNS ] }
+    filename = os.path.join(directory, SCHEMA)
+    if os.path.exists(filename):
+        assert read_schema(directory) == schema, f"{directory} holds plate appearances of another schema."
+        return
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_filename, 'w') as fh:
+        json.dump(schema, fh, indent=1)
+    os.replace(tmp_filename, filename)
+
+
+class ColumnarSink:
+    # A `PlayLog` sink that appends to the column files of `directory`,
+    # `batch_size` rows at a time: rows are kept as tuples until then and
+    # turned into columns in one go.
+    def __init__(self, directory, batch_size=65536):
+        self.directory  = directory
+        self.batch_size = batch_size
+
+        os.makedirs(directory, exist_ok=True)
+        write_schema(directory)
+        self._files = [ open(column_filename(directory, name), 'ab') for name, dtype in COLUMNS ]
+        self._rows  = []
+
+    def write(self, record):
+        self._rows.append(record)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        table = np.array(self._rows, dtype=ROW)
+        for (name, dtype), fh in zip(COLUMNS, self._files):
+            fh.write(np.ascontiguousarray(table[name]).tobytes())
+            fh.flush()
+        self._rows = []
+
+    def close(self):
+        self.flush()
+        for fh in self._files:
+            fh.close()
+
+
+class ColumnarLog:
+    # The columns of `directory`, memory-mapped: `log['mss']` is a read-only
+    # NumPy array backed by the file.
+    def __init__(self, directory):
+        self.directory = directory
+
+        schema = read_schema(directory)
+        assert schema['version'] == VERSION, f"{directory} is version {schema['version']} of the format."
+        self.dtypes = { name: np.dtype(dtype) for name, dtype in schema['columns'] }
+
+        sizes = [ os.path.getsize(column_filename(directory, name)) // dtype.itemsize for name, dtype in self.dtypes.items() ]
+        self.n_rows   = min(sizes) if sizes else 0
+        self._columns = {}
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, name) -> np.ndarray:
+        column = self._columns.get(name)
+        if column is None:
+            dtype = self.dtypes[name]
+            if self.n_rows:
+                column = np.memmap(column_filename(self.directory, name), dtype=dtype, mode='r', shape=(self.n_rows,))
+            else:
+                column = np.empty(0, dtype=dtype)
+            self._columns[name] = column
+        return column
+
+    @property
+    def columns(self) -> list:
+        return list(self.dtypes)
+
+    def row(self, i) -> PlateAppearance:
+        return PlateAppearance(*( self[name][i].item() for name in self.dtypes ))
+
+
+def open_parts(directory) -> list:
+    # the logs of a directory of parts, one per worker task, in name order
+    return [
+        ColumnarLog(os.path.join(directory, name))
+        for name in sorted(os.listdir(directory))
+        if os.path.exists(os.path.join(directory, name, SCHEMA))
+    ]
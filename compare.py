@@ -0,0 +1,186 @@
+import argparse
+from collections import namedtuple
+from functools import partial
+from multiprocessing import Pool
+import math
+import os
+
+from tabulate import tabulate
+
+from boxscore import RunningStat
+from dice import SlotRoller
+from game import Game, Team
+from simulate import chunk_game_seeds, load_roster, make_tasks
+
+
+# Compares two variants of a team, two rosters or two batting orders of one,
+# against the same opponent with common random numbers: both variants play
+# every game from the same seed, so with the same starting pitchers, and a
+# SlotRoller gives every plate-appearance slot (a side's n-th plate appearance
+# of the game) the same dice in both. The luck the variants share cancels out
+# of their difference, which then needs far fewer games than two separate runs
+# for the same confidence. With `antithetic` every game is also played with
+# all the dice turned over, and each variant counts the mean of the two.
+
+Z = 1.96  # 95% confidence
+
+# what is compared, per game of the variant's team
+STATS = ('won', 'runs', 'allowed')
+
+# `roster` is a roster file, `order` a batting order by number, None for the
+# roster's own
+Variant = namedtuple('Variant', ['roster', 'order'])
+
+
+class Comparison:
+    # Running statistics of each variant, and of their paired differences
+    # (A - B), per game or antithetic pair of games. Merges like the results
+    # of `simulate`.
+    def __init__(self, names, antithetic=False):
+        self.names      = names
+        self.antithetic = antithetic
+        self.stats      = { stat: (RunningStat(), RunningStat(), RunningStat()) for stat in STATS }
+
+    def add(self, a: tuple, b: tuple):
+        for stat, x, y in zip(STATS, a, b):
+            stat_a, stat_b, diff = self.stats[stat]
+            stat_a.add(x)
+            stat_b.add(y)
+            diff.add(x - y)
+
+    def merge(self, other: 'Comparison'):
+        for stat, stats in other.stats.items():
+            for mine, theirs in zip(self.stats[stat], stats):
+                mine.merge(theirs)
+        return self
+
+    @property
+    def n(self) -> int:
+        return self.stats[STATS[0]][2].n
+
+    def difference(self, stat='won', z=Z) -> tuple:
+        # mean paired difference and its confidence interval
+        diff  = self.stats[stat][2]
+        error = z * diff.std / math.sqrt(diff.n) if diff.n else 0.0
+        return diff.mean, (diff.mean - error, diff.mean + error)
+
+    def independent_interval(self, stat='won', z=Z) -> tuple:
+        # the interval the same number of games would give each variant played
+        # on streams of its own
+        stat_a, stat_b, diff = self.stats[stat]
+        error = z * math.sqrt((stat_a.variance + stat_b.variance) / diff.n) if diff.n else 0.0
+        return diff.mean - error, diff.mean + error
+
+    def variance_reduction(self, stat='won') -> float:
+        # how many times fewer games the paired difference needs
+        stat_a, stat_b, diff = self.stats[stat]
+        return (stat_a.variance + stat_b.variance) / diff.variance if diff.variance else math.inf
+
+    def print_summary(self):
+        rows = []
+        for stat in STATS:
+            stat_a, stat_b, diff = self.stats[stat]
+            mean, ci    = self.difference(stat)
+            independent = self.independent_interval(stat)
+            reduction   = self.variance_reduction(stat)
+            rows.append([ stat.capitalize(), f"{stat_a.mean:.3f}", f"{stat_b.mean:.3f}", f"{mean:+.3f}",
+                          f"{ci[0]:+.3f} - {ci[1]:+.3f}", f"{independent[0]:+.3f} - {independent[1]:+.3f}",
+                          f"{reduction:.1f}x" if reduction < math.inf else "-" ])
+        print(tabulate(
+            rows,
+            headers=['Per game', f"A: {self.names[0]}", f"B: {self.names[1]}", 'A - B', '95% CI', 'Unpaired 95% CI', 'Variance cut'],
+            tablefmt='fancy_grid',
+        ))
+        print(f"{self.n} {'antithetic pairs of games' if self.antithetic else 'games'} per variant on common random numbers.")
+
+
+def play_variant(roster, order, opponent, seed, home=False, antithetic=False) -> tuple:
+    # (won, runs, allowed) of one game of `roster`'s team batting in `order`
+    game  = Game(seed=seed, keep_at_bats=False, roller=partial(SlotRoller, antithetic=antithetic))
+    team  = Team(*roster)
+    other = Team(*opponent)
+    game.set_teams(*((other, team) if home else (team, other)))
+    team.set_lineup(list(order) if order else None)
+    other.set_lineup()
+    game.set_starting_pitchers()
+    game.play()
+    return int(team.runs > other.runs), team.runs, other.runs
+
+
+# rosters loaded once per worker process by `init_worker`
+_variants   = None
+_opponent   = None
+_home       = False
+_antithetic = False
+
+def init_worker(variant_a, variant_b, opponent, home=False, antithetic=False):
+    global _variants, _opponent, _home, _antithetic
+    _home       = home
+    _antithetic = antithetic
+    _variants   = [ (load_roster(v.roster), v.order) for v in (variant_a, variant_b) ]
+    _opponent   = load_roster(opponent)
+    if opponent in (variant_a.roster, variant_b.roster):
+        _opponent = ("The Dopplegangers", _opponent[1])
+
+def variant_name(roster, order) -> str:
+    return roster[0] if not order else f"{roster[0]} ({', '.join(map(str, order))})"
+
+def run_chunk(task) -> Comparison:
+    n_games, chunk_seed = task
+    result = Comparison([ variant_name(*variant) for variant in _variants ], _antithetic)
+    for seed in chunk_game_seeds(n_games, chunk_seed):
+        a, b = [ play_variant(roster, order, _opponent, seed, _home) for roster, order in _variants ]
+        if _antithetic:
+            turned_a, turned_b = [ play_variant(roster, order, _opponent, seed, _home, antithetic=True) for roster, order in _variants ]
+            a = tuple( (x + y) / 2 for x, y in zip(a, turned_a) )
+            b = tuple( (x + y) / 2 for x, y in zip(b, turned_b) )
+        result.add(a, b)
+    return result
+
+def compare(variant_a: Variant, variant_b: Variant, opponent, n_games, workers=None, seed=None, home=False, antithetic=False) -> Comparison:
+    # Like `simulate_matchup`, a seeded run gives the same totals however many
+    # workers share it. The variants bat first unless `home`.
+    assert n_games > 0, "Compare over at least one game."
+    workers = workers or os.cpu_count() or 1
+    tasks   = make_tasks(n_games, seed)
+    args    = (variant_a, variant_b, opponent, home, antithetic)
+
+    if workers == 1:
+        init_worker(*args)
+        results = [ run_chunk(task) for task in tasks ]
+    else:
+        with Pool(workers, initializer=init_worker, initargs=args) as pool:
+            results = list(pool.imap(run_chunk, tasks))
+
+    total, *rest = results
+    for result in rest:
+        total.merge(result)
+    return total
+
+
+def parse_order(text) -> tuple:
+    order = tuple( int(n) for n in text.split(',') )
+    assert len(order) == 9, "A batting order names nine players."
+    return order
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare two rosters, or two batting orders, against the same opponent on common random numbers.")
+    parser.add_argument('roster_a', help="roster file of variant A")
+    parser.add_argument('opponent', help="roster file of the opponent")
+    parser.add_argument('--roster-b', help="roster file of variant B, the same as A by default")
+    parser.add_argument('--order-a', type=parse_order, help="batting order of A by number, e.g. 3,1,2,4,5,6,7,8,9")
+    parser.add_argument('--order-b', type=parse_order, help="batting order of B by number")
+    parser.add_argument('-n', '--games', type=int, default=1000)
+    parser.add_argument('-w', '--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--home', action='store_true', help="the variants bat second")
+    parser.add_argument('--antithetic', action='store_true', help="also play every game with the dice turned over")
+    args = parser.parse_args()
+
+    result = compare(
+        Variant(args.roster_a, args.order_a),
+        Variant(args.roster_b or args.roster_a, args.order_b),
+        args.opponent, args.games, workers=args.workers, seed=args.seed, home=args.home, antithetic=args.antithetic,
+    )
+    result.print_summary()
@@ -33,6 +33,11 @@ def make_team():
             t.pitcher = player
     return t
 
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path_factory, monkeypatch):
+    # league caches go to a directory of the test run, not the user's
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path_factory.mktemp('cache')))
+
 @pytest.fixture
 def player():
     return make_position_player(1)
@@ -57,3 +62,17 @@ def game_ready():
     g.inning.make_next_half()
     return g
 
+
+def make_roster_game(observers=None):
+    g = game.Game(observers=observers)
+    away = g.get_team_from_roster('roster__denver_dingers.csv')
+    home = g.get_team_from_roster('roster__diamond_dogs.csv')
+    g.set_teams(away, home)
+    for team in g.teams:
+        team.set_lineup()
+        team.set_pitcher(team.starting_pitchers[0])
+    return g
+
+@pytest.fixture
+def roster_game():
+    return make_roster_game()
@@ -0,0 +1,153 @@
+from functools import lru_cache
+import random
+
+from enums import PitcherDice
+
+
+# how many random numbers a Roller draws at once. A game of the bundled
+# rosters uses 180 on average (median 168, 99th percentile 355); of the sizes
+# measured, 192 spent the least per game on refills and numbers thrown away
+# with the roller.
+BUFFER_SIZE = 192
+# random numbers a SlotRoller sets aside for one plate appearance: the pitch,
+# the swing, the hit table and a chance for the defense
+SLOT_DRAWS  = 4
+# 1 - u - 2**-53 turns random() = k / 2**53 into (2**53 - 1 - k) / 2**53, so
+# a die rolled with it lands on the opposite face
+ANTITHETIC  = 1.0 - 2.0**-53
+
+
+class Roller:
+    # Source of randomness for dice. Uniform floats are drawn from its own
+    # generator in bulk and handed out one at a time.
+    def __init__(self, seed=None):
+        self.random  = random.Random(seed)
+        self._buffer = []
+
+    def seed(self, seed=None):
+        self.random.seed(seed)
+        self._buffer = []
+
+    def refill(self):
+        draw = self.random.random
+        self._buffer = [ draw() for n in range(BUFFER_SIZE) ]
+
+    def uniform(self) -> float:
+        try:
+            return self._buffer.pop()
+        except IndexError:
+            self.refill()
+            return self._buffer.pop()
+
+    def uniforms(self, n: int) -> list:
+        # the next `n` numbers `uniform` would hand out, in order, taken a
+        # buffer at a time
+        result = []
+        while n > 0:
+            if not self._buffer:
+                self.refill()
+            buffer = self._buffer
+            take   = min(n, len(buffer))
+            result += buffer[:-take-1:-1]
+            del buffer[-take:]
+            n -= take
+        return result
+
+    def start_slot(self, side):
+        # every plate appearance of `side` starts with this; only a
+        # SlotRoller makes anything of it
+        pass
+
+
+class SlotRoller(Roller):
+    # Common random numbers: each side draws its plate appearances' numbers
+    # from a generator of its own, SLOT_DRAWS apiece whether they are used or
+    # not, so a side's n-th plate appearance rolls the same dice in every game
+    # with the same seed, whatever came before it. `antithetic` turns every
+    # die over.
+    def __init__(self, seed=None, antithetic=False):
+        super().__init__(seed)
+        self.antithetic = antithetic
+        self._sides     = self.side_generators()
+
+    def seed(self, seed=None):
+        super().seed(seed)
+        self._sides = self.side_generators()
+
+    def side_generators(self) -> tuple:
+        return tuple( random.Random(self.random.getrandbits(64)) for side in range(2) )
+
+    def start_slot(self, side):
+        draw = self._sides[side].random
+        if self.antithetic:
+            self._buffer = [ ANTITHETIC - draw() for n in range(SLOT_DRAWS) ]
+        else:
+            self._buffer = [ draw() for n in range(SLOT_DRAWS) ]
+
+    def refill(self):
+        raise AssertionError(f"A plate appearance used more than {SLOT_DRAWS} random numbers.")
+
+
+default_roller = Roller()
+
+def seed(n=None):
+    default_roller.seed(n)
+
+
+class Dice:
+    # A compiled dice spec such as '2d10' or '-d4'. The sign applies to the
+    # total, e.g. a '-d4' pitcher subtracts from the swing.
+    __slots__ = ('count', 'sides', 'sign', 'name')
+
+    def __init__(self, count: int, sides: int, sign: int = 1, name=None):
+        self.count = count
+        self.sides = sides
+        self.sign  = sign
+        self.name  = name or f"{'-' if sign < 0 else ''}{count if count > 1 else ''}d{sides}"
+
+    def __repr__(self):
+        return f"Dice({self.name!r})"
+
+    @property
+    def min(self) -> int:
+        return min(self.sign * self.count, self.sign * self.count * self.sides)
+
+    @property
+    def max(self) -> int:
+        return max(self.sign * self.count, self.sign * self.count * self.sides)
+
+    def roll(self, roller: Roller = None) -> int:
+        uniform = (roller or default_roller).uniform
+        sides   = self.sides
+        if self.count == 1:
+            return self.sign * (int(uniform() * sides) + 1)
+        total = 0
+        for n in range(self.count):
+            total += int(uniform() * sides) + 1
+        return self.sign * total
+
+    def roll_many(self, n: int, roller: Roller = None) -> list:
+        # the same rolls as `n` calls to `roll`, from one draw of all the
+        # numbers they need, turned into faces and summed in bulk
+        import numpy as np
+        uniforms = np.array((roller or default_roller).uniforms(n * self.count))
+        faces    = (uniforms * self.sides).astype(np.int64) + 1
+        return (self.sign * faces.reshape(n, self.count).sum(axis=1)).tolist()
+
+
+@lru_cache(maxsize=None)
+def parse(kind: str) -> Dice:
+    kind = kind.strip()
+    sign = -1 if kind.startswith('-') else 1
+    count, n_sides = kind.strip('-').split('d')
+    count   = int(count) if count else 1
+    n_sides = int(n_sides)
+    assert count > 0 and n_sides > 0, f"Bad dice spec: {kind}"
+    return Dice(count, n_sides, sign, name=kind)
+
+
+PITCHER_DICE = { pd: parse(pd.name) for pd in PitcherDice }
+
+D12  = parse('d12')
+D20  = parse('d20')
+D100 = parse('d100')
@@ -1,4 +1,4 @@
-from enum import Enum
+from enum import Enum, IntEnum
 
 
 Hand = Enum('Hand', ['L', 'R', 'S'])
@@ -46,6 +46,30 @@ Traits = Enum('Traits', [
     'T+',
 ])
 
+SwingResult = IntEnum('SwingResult', [
+    'ODDITY',
+    'CRITICAL_HIT',
+    'ORDINARY_HIT',
+    'WALK',
+    'POSSIBLE_ERROR',
+    'PRODUCTIVE_OUT',
+    'OUT',
+])
+
+HitResult = IntEnum('HitResult', [
+    'SINGLE',
+    'SINGLE_DEF_1B',
+    'SINGLE_DEF_2B',
+    'SINGLE_DEF_3B',
+    'SINGLE_DEF_SS',
+    'SINGLE_ADVANCE_2',
+    'DOUBLE_DEF_LF',
+    'DOUBLE_DEF_CF',
+    'DOUBLE_DEF_RF',
+    'DOUBLE_ADVANCE_3',
+    'HOME_RUN',
+])
+
 InningHalfName = Enum('InningHalfName', ['TOP', 'BOTTOM'])
 
 pos_pitchers = (
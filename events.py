@@ -3,34 +3,159 @@ import abc
 from enums import Positions
 
 
+# Events are immutable flyweights: constructing one with the same arguments
+# always gives back the same instance, so the hit table is built once and a
+# plate appearance allocates no events. Resolving an event looks up a handler
+# by its integer code. The handlers only mark what the hit comes to on the
+# at-bat (`batter_bases`, `runner_bases`, `error`, `great_play`), and
+# `AtBat.play` applies that to the game once every event has been resolved.
+# A `Play` stands in for the at-bat when the dice are enumerated rather than
+# rolled, so the exact and batch engines resolve hits with the same handlers.
+
+# event codes: indexes into `DISPATCH`
+HIT, DEF_CHANCE, RUNNERS_ADVANCE = range(3)
+
+# d12 on the Defense Table, after the fielder's D+/D- modifier
+DEF_ERROR      = 1   # and below: the batter and every runner take an extra base
+DEF_GREAT_PLAY = 10  # and above: the batter is out and the runners hold
+
+
 class Event(abc.ABC):
-    def resolve(self):
-        raise NotImplemented
+    __slots__ = ('code', 'arg', 'args')
+    _instances = {}
+
+    def __new__(cls, *args):
+        key = (cls, args)
+        event = Event._instances.get(key)
+        if event is None:
+            event = super().__new__(cls)
+            object.__setattr__(event, 'code', cls.CODE)
+            object.__setattr__(event, 'arg', cls.make_arg(*args))
+            object.__setattr__(event, 'args', args)
+            Event._instances[key] = event
+        return event
+
+    @staticmethod
+    def make_arg(*args):
+        return None
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} events are immutable")
+
+    def __reduce__(self):
+        # unpickled as the shared instance
+        return type(self), self.args
+
+    def __repr__(self):
+        return f"{type(self).__name__}({'' if self.arg is None else self.arg!r})"
+
+    def resolve(self, at_bat):
+        DISPATCH[self.code](at_bat, self.arg)
+
 
 class Single(Event):
-    def resolve(self, game):
-        game.single()
+    __slots__ = ()
+    CODE = HIT
+
+    @staticmethod
+    def make_arg():
+        return 1
 
 class Double(Event):
-    def resolve(self, game):
-        game.double()
+    __slots__ = ()
+    CODE = HIT
+
+    @staticmethod
+    def make_arg():
+        return 2
+
+class Triple(Event):
+    __slots__ = ()
+    CODE = HIT
+
+    @staticmethod
+    def make_arg():
+        return 3
 
 class HomeRun(Event):
-    def resolve(self, game):
-        game.home_run()
+    __slots__ = ()
+    CODE = HIT
+
+    @staticmethod
+    def make_arg():
+        return 4
 
 class DefChance(Event):
-    def __init__(self, pos: Positions):
-        self.pos = pos
+    __slots__ = ()
+    CODE = DEF_CHANCE
+
+    @staticmethod
+    def make_arg(pos: Positions):
+        return pos
 
-    def resolve(self, game):
-        # roll on def table
-        raise NotImplemented
+    @property
+    def pos(self) -> Positions:
+        return self.arg
 
 class RunnersAdvance(Event):
-    def __init__(self, n: int):
-        self.n = n
+    __slots__ = ()
+    CODE = RUNNERS_ADVANCE
+
+    @staticmethod
+    def make_arg(n: int):
+        return n
+
+    @property
+    def n(self) -> int:
+        return self.arg
+
+
+class Play:
+    # What a hit comes to with the defense rolling `defense_rolls[pos]` on
+    # a chance at `pos`, modifier included.
+    __slots__ = ('critical', 'batter_bases', 'runner_bases', 'defense', 'error', 'great_play', 'defense_rolls')
+
+    def __init__(self, critical, defense_rolls):
+        self.critical      = critical
+        self.batter_bases  = 0
+        self.runner_bases  = 0
+        self.defense       = None
+        self.error         = False
+        self.great_play    = False
+        self.defense_rolls = defense_rolls
+
+    def defense_roll(self, pos):
+        return self.defense_rolls[pos]
+
+
+def play_hit(hit_events, critical, defense_rolls) -> Play:
+    play = Play(critical, defense_rolls)
+    for event in hit_events:
+        event.resolve(play)
+    return play
+
+
+def resolve_hit(at_bat, n):
+    # a critical hit is one base better, for the batter and the runners
+    n = min(4, n + at_bat.critical)
+    at_bat.batter_bases = n
+    at_bat.runner_bases = max(at_bat.runner_bases, n)
+
+def resolve_def_chance(at_bat, pos):
+    roll = at_bat.defense_roll(pos)
+    at_bat.defense = roll
+    if roll <= DEF_ERROR:
+        at_bat.error        = True
+        at_bat.batter_bases = min(4, at_bat.batter_bases + 1)
+        at_bat.runner_bases = min(4, at_bat.runner_bases + 1)
+    elif roll >= DEF_GREAT_PLAY:
+        at_bat.great_play = True
+
+def resolve_runners_advance(at_bat, n):
+    at_bat.runner_bases = max(at_bat.runner_bases, min(4, n + at_bat.critical))
 
-    def resolve(self, game):
-        # advance runners
-        raise NotImplemented
+DISPATCH = (
+    resolve_hit,              # HIT
+    resolve_def_chance,       # DEF_CHANCE
+    resolve_runners_advance,  # RUNNERS_ADVANCE
+)
@@ -1,8 +1,9 @@
-from collections import UserList
+import argparse
+import bisect
+from collections.abc import Sequence
 import csv
 from enum import Enum
 import logging
-import os
 import random
 import sys
 
@@ -10,66 +11,117 @@ from tabulate import tabulate
 from termcolor import colored
 
 from art import field, print_field
-from enums import Hand, PitcherDice, Positions, Traits, InningHalfName, pos_pitchers
+import dice
+from dice import D12, D20, D100, PITCHER_DICE
+from enums import Hand, PitcherDice, Positions, SwingResult, Traits, InningHalfName, pos_pitchers
+from observers import AnsiTerminalObserver, TerminalObserver
+from playlog import BinarySink, PlayLog
 import tables
+from traits import compile_traits, parse_traits
 
 
-logging.basicConfig(filename='debug.log', level=logging.DEBUG)
-
 # CONFIGURATION
 N_INNINGS = 9
 SLEEP_SECS = 0
+# seeds are unsigned 64-bit, as play logs and result stores keep them
+MAX_SEED = 2**64 - 1
+
+HIT_NAMES = (None, "SINGLE", "DOUBLE", "TRIPLE", "HOME RUN")
 
 
 def roll(kind: str) -> int:
-    # drop negative sign
-    kind = kind.strip('-')
-    count, n_sides = kind.split('d')
-    count   = int(count) if count else 1
-    n_sides = int(n_sides)
-    result = 0
-    for n in range(count):
-        result += random.randrange(1, n_sides+1)
-    logging.debug("Rolled %s -> %s", kind, result)
-    return result
-
-
-class BaseQueue(UserList):
+    # negative signs are dropped: roll('-d4') is a plain d4
+    return abs(dice.parse(kind).roll())
+
+
+def parse_seed(text) -> int:
+    seed = int(text)
+    if not 0 <= seed <= MAX_SEED:
+        raise argparse.ArgumentTypeError(f"a seed is from 0 to {MAX_SEED}")
+    return seed
+
+
+def clean_row(n, row):
+    return {
+        'number': n,
+        'name'  : row['Name'],
+        'hand'  : Hand[row['Handedness']],
+        'bt'    : int(row['BT']) if row['BT'] else None,
+        'obt'   : int(row['OBT']) if row['OBT'] else None,
+        'pd'    : PitcherDice[row['PD']] if row['PD'] else PitcherDice['-d4'],
+        'pos'   : Positions[row['Position']],
+        'traits': [ Traits[t] for t in row['Traits'].split() ],
+    }
+
+def team_name_from_filename(filename):
+    # 'rosters/roster__denver_dingers.csv' -> 'Denver Dingers'
+    return filename.split('roster__')[-1].split('.')[0].replace('_', ' ').title()
+
+
+class BaseQueue:
+    # The runners on base: an occupancy mask (bit n-1 set when base n is
+    # taken) and the player on each base. Compares equal to a list such as
+    # [batter, None, None].
     def __init__(self, game):
         self.game = game
 
-        self.data = [ None ] * 3
+        self.mask    = 0
+        self.runners = [ None ] * 3
 
     def clear(self):
-        self.data = [ None ] * 3
+        self.mask    = 0
+        self.runners = [ None ] * 3
 
     def get_player_at_base(self, n):
         assert 0 < n < 4, "Can only get base 1, 2, or 3."
-        return self.data[n-1]
+        return self.runners[n-1]
 
     def base_is_empty(self, n):
-        return self.get_player_at_base(n) is None
-
-    def check_for_runs(self):
-        logging.debug("Runners: %s", self.data)
-        if len(self.data) > 3:
-            for p in self.data[3:]:
-                if p:
-                    self.game.runner_reached_home()
-            self.data = self.data[:3]
-        logging.debug("Runners after cleanup: %s", self.data)
+        return not self.mask & (1 << (n-1))
 
     def advance_batter(self, n):
-        logging.debug("Advance batter %s bases", n)
-        if n >= 1:
-            self.data.insert(0, self.game.inning.half.batting.up_to_bat)
-            n_extra_bases = n-1
-            for n in range(n_extra_bases):
-                self.data.insert(0, None)
-        self.check_for_runs()
+        self.advance(n, n)
+
+    def advance(self, n, runner_bases):
+        # the batter takes n bases and the runners `runner_bases` each
+        if n < 1:
+            return
+        mask, runs, moves, scored = tables.PLAY_ADVANCE[self.mask][n][runner_bases]
+        runners  = self.runners
+        batter   = self.game.inning.half.batting.up_to_bat
+        advanced = [ None ] * 3
+        for frm, to in moves:
+            advanced[to] = runners[frm]
+        if n < 4:
+            advanced[n-1] = batter
+        self.runners = advanced
+        self.mask    = mask
+        for base in scored:
+            self.game.runner_reached_home(runners[base] if base < 3 else batter)
+
+    def __iter__(self):
+        return iter(self.runners)
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, i):
+        return self.runners[i]
+
+    def __eq__(self, other):
+        if isinstance(other, BaseQueue):
+            other = other.runners
+        elif not isinstance(other, Sequence):
+            return NotImplemented
+        return self.runners == list(other)
+
+    def __repr__(self):
+        return repr(self.runners)
 
 
 class Player:
+    __slots__ = ('number', 'name', 'pos', 'hand', 'bt', 'obt', 'traits', 'pd', '_mods', '_swing_results')
+
     def __init__(self, number, name, pos, hand, bt, obt, traits=None, pd=None):
         self.number = number
         self.name   = name
@@ -80,6 +132,29 @@ class Player:
         self.traits = traits or []
         self.pd     = pd
 
+        self._mods          = None
+        self._swing_results = None
+
+    def compile_traits(self):
+        # whenever the player goes in, in case the traits changed; `traits`
+        # may still be a roster's "K+ CN-"
+        self._mods = compile_traits(parse_traits(self.traits))
+
+    @property
+    def mods(self):
+        # players the engines look at before they go in, like starting
+        # pitchers, are compiled on first use
+        if self._mods is None:
+            self.compile_traits()
+        return self._mods
+
+    @property
+    def swing_results(self):
+        # compiled lazily: pitchers on a roster may have no BT/OBT
+        if self._swing_results is None:
+            self._swing_results = tables.swing_results(self.bt, self.obt)
+        return self._swing_results
+
     def __str__(self):
         return '\n'.join([
             line.strip() for line in
@@ -88,55 +163,179 @@ class Player:
             {'-'*len(self.name)}
             Position: {self.pos.name} Handed: {self.hand.name}
             BT: {self.bt} OBT: {self.obt} {'PD:' if self.pd else ''} {self.pd.name if self.pd else ''}
-            {'Traits:' if self.traits else ''} {' '.join([t.name for t in self.traits]) if self.traits else ''}
+            {'Traits:' if self.traits else ''} {' '.join([t.name for t in parse_traits(self.traits)]) if self.traits else ''}
             '''.split('\n')
         ]).strip()
 
 
+class Roster:
+    # A team's players, indexed by number, and by position while they are
+    # available: a retired player leaves the position index.
+    __slots__ = ('players', 'by_number', 'by_position')
+
+    def __init__(self, players=None):
+        self.players     = set()
+        self.by_number   = {}
+        self.by_position = {}
+        for player in players or ():
+            self.add(player)
+
+    def add(self, player: Player):
+        # a number worn twice finds the player who was added first
+        self.players.add(player)
+        self.by_number.setdefault(player.number, player)
+        at_position = self.by_position.setdefault(player.pos, [])
+        bisect.insort(at_position, player, key=lambda p: p.number)
+
+    def retire(self, player: Player):
+        at_position = self.by_position.get(player.pos, [])
+        lo = bisect.bisect_left(at_position, player.number, key=lambda p: p.number)
+        hi = bisect.bisect_right(at_position, player.number, key=lambda p: p.number)
+        for i in range(lo, hi):
+            if at_position[i] is player:
+                del at_position[i]
+                return
+
+    def at_position(self, pos) -> list:
+        # available players, in order of number
+        return list(self.by_position.get(pos, ()))
+
+
+class Lineup:
+    # The batting order. `advance` walks it as a ring, and the team's bench
+    # is kept up to date as players go in and out. Fielders are indexed by
+    # position for the defense's chances.
+    __slots__ = ('team', '_players', '_slots', '_positions', '_current')
+
+    def __init__(self, team, players=()):
+        self.team       = team
+        self._players   = []
+        self._slots     = {}
+        self._positions = {}
+        self._current   = -1
+        for player in players:
+            self.append(player)
+
+    def __iter__(self):
+        return iter(self._players)
+
+    def __len__(self):
+        return len(self._players)
+
+    def __getitem__(self, i):
+        return self._players[i]
+
+    def __contains__(self, player):
+        return player in self._slots
+
+    def __eq__(self, other):
+        if isinstance(other, Lineup):
+            other = other._players
+        elif not isinstance(other, Sequence):
+            return NotImplemented
+        return self._players == list(other)
+
+    def __repr__(self):
+        return repr(self._players)
+
+    @property
+    def up_to_bat(self):
+        return self._players[self._current]
+
+    def advance(self):
+        self._current += 1
+        if self._current == len(self._players):
+            self._current = 0
+
+    def index(self, player) -> int:
+        return self._slots[player]
+
+    def append(self, player: Player):
+        player.compile_traits()
+        self._slots[player] = len(self._players)
+        self._players.append(player)
+        self._positions.setdefault(player.pos, player)
+        self.team._bench.discard(player)
+
+    def insert(self, i, player: Player):
+        player.compile_traits()
+        self._players.insert(i, player)
+        # the batter up stays up
+        if i <= self._current:
+            self._current += 1
+        self._reindex()
+        self.team._bench.discard(player)
+
+    def remove(self, player: Player):
+        i = self._slots[player]
+        del self._players[i]
+        # whoever moves into the slot of the batter up bats next
+        if i <= self._current:
+            self._current -= 1
+        self._reindex()
+
+    def replace(self, leaving: Player, entering: Player):
+        entering.compile_traits()
+        i = self._slots.pop(leaving)
+        self._players[i] = entering
+        self._slots[entering] = i
+        self._reindex_positions()
+        self.team._bench.discard(entering)
+        return i
+
+    def _reindex(self):
+        self._slots = { p: i for i, p in enumerate(self._players) }
+        self._reindex_positions()
+
+    def _reindex_positions(self):
+        # the first in the order when two share a position
+        self._positions = {}
+        for player in self._players:
+            self._positions.setdefault(player.pos, player)
+
+    def at_position(self, pos):
+        # the player fielding `pos`, if any
+        return self._positions.get(pos)
+
+
 class Team:
     def __init__(self, name, players=None):
-        self.name     = name
-        self._players = set(players) if players else set()
+        self.name    = name
+        self.roster  = Roster(players)
 
-        self.game      = None
-        self._retired  = set()
-        self._batter_n = -1
-        self.lineup    = []
-        self.bullpen   = { p for p in self.players if p.pos in pos_pitchers }
-        self.pitcher   = None
+        self.game     = None
+        self._retired = set()
+        self._bench   = set(self.roster.players)
+        self.lineup   = Lineup(self)
+        self.bullpen  = { p for p in self.players if p.pos in pos_pitchers }
+        self.pitcher  = None
 
         logging.debug("Inited team %s with %s ball players.", self.name, len(self.players))
 
     @property
-    def halfs_at_bat(self):
-        result = []
-        for inning in self.game.innings:
-            for half in inning.halfs:
-                if half.batting == self:
-                    result.append(half)
-        return result
-
+    def side(self):
+        # 0 for the visitors, 1 for the home team
+        return 0 if self is self.game.teams[0] else 1
 
     @property
     def runs(self):
-        return sum([ half.runs for half in self.halfs_at_bat ])
+        return self.game.linescore.runs[self.side]
 
     @property
     def hits(self):
-        return sum([ half.hits for half in self.halfs_at_bat ])
+        return self.game.linescore.hits[self.side]
 
     @property
     def errors(self):
-        return sum([ half.errors for half in self.halfs_at_bat ])
+        return self.game.linescore.errors[self.side]
 
     @property
     def players(self):
-        return self._players
+        return self.roster.players
 
     @property
     def up_to_bat(self):
-        # TODO: you _could_ use a collections.deque here and rotate it
-        return self.lineup[self._batter_n % 9]
+        return self.lineup.up_to_bat
 
     @property
     def retired(self):
@@ -144,14 +343,18 @@ class Team:
 
     @property
     def bench(self):
-        return self.players - set(self.lineup) - self.retired
+        return set(self._bench)
 
     @property
     def starting_pitchers(self):
-        return [ p for p in self.bullpen if p.pos.name == 'SP' ]
+        # ordered by number, so that a seeded `random.choice` picks the same
+        # pitcher every run
+        return self.roster.at_position(Positions.SP)
 
     def add_player(self, player: Player):
-        self.players.add(player)
+        self.roster.add(player)
+        if player not in self.lineup and player not in self.retired:
+            self._bench.add(player)
         logging.debug("Added player %s to team %s", player.name, self)
         if player.pd:
             self.bullpen.add(player)
@@ -161,36 +364,42 @@ class Team:
 
         assert len(numbers) == 9, "Nine players are required to set a lineup."
 
-        logging.debug("Setting lineup: %s", ', '.join([ str(n) for n in numbers ]))
+        logging.debug("Setting lineup: %s", numbers)
 
-        self.lineup = [
+        self._bench = self.players - self.retired
+        self.lineup = Lineup(self, [
             self.get_player_by_number(n)
             for n in numbers
-        ]
+        ])
 
     def set_pitcher(self, player: Player):
+        player.compile_traits()
         self.pitcher = player
 
     def retire(self, player: Player) -> int:
-        i = self.lineup.index(player)
-        self.lineup.remove(player)
+        # the player's slot in the lineup, None for a player out of it such
+        # as a pitcher
+        i = None
+        if player in self.lineup:
+            i = self.lineup.index(player)
+            self.lineup.remove(player)
+        self._bench.discard(player)
         self._retired.add(player)
+        self.roster.retire(player)
         return i
 
     def is_available(self, player):
         return player not in self.retired
 
     def get_player_by_number(self, n):
-        return [
-            p for p in self.players
-            if p.number == n
-        ][0]
+        return self.roster.by_number[n]
 
     def sub_player(self, entering: Player, leaving: Player):
-        assert entering in self.bench
+        assert entering in self._bench
 
-        i = self.retire(leaving)
-        self.lineup.insert(i, entering)
+        self.lineup.replace(leaving, entering)
+        self._retired.add(leaving)
+        self.roster.retire(leaving)
 
     def print_lineup(self):
         fields = [
@@ -256,98 +465,171 @@ class Team:
 class AtBat:
     def __init__(self, half):
         self.half   = half
-
-        self.result = None
-
-    def print(self):
-        os.system('clear')
-        self.half.inning.game.print_scoreboard()
-        self.half.inning.game.print_atbat()
-        self.half.inning.game.print_field()
+        self.game   = half.inning.game
+
+        self.batter       = None
+        self.pitcher      = None
+        self.pitch        = None
+        self.swing        = None
+        self.mss          = None
+        self.swing_result = None
+        self.bases_before = None
+        self.result       = None
+        self.scored       = ()  # runners who came home on the play
+
+        # what the hit table and the defense made of a hit
+        self.hit_roll     = None
+        self.critical     = False
+        self.batter_bases = 0
+        self.runner_bases = 0
+        self.defense      = None
+        self.error        = False
+        self.great_play   = False
 
     def play(self):
-        batter  = self.half.batting.up_to_bat
-        pitcher = self.half.fielding.pitcher
+        self.batter  = batter  = self.half.batting.up_to_bat
+        self.pitcher = pitcher = self.half.fielding.pitcher
+        self.bases_before = self.game.bases.mask
 
-        self.print()
+        for observer in self.game.observers:
+            observer.at_bat_started(self)
 
-        # throw the pitch
-        # TODO add mods
-        pitch_value_multiplier = -1 if '-' in pitcher.pd.name else 1
-        pitch_value = roll(pitcher.pd.name) * pitch_value_multiplier
-        logging.info("Pitcher %s threw %s.", pitcher.name, pitch_value)
+        # throw the pitch, then the batter swings; both with their traits
+        roller = self.game.roller
+        roller.start_slot(self.half.side)
+        self.pitch = pitch_value = PITCHER_DICE[pitcher.pd].roll(roller) + pitcher.mods.pitch
+        self.swing = swing_value = D100.roll(roller) + batter.mods.swing
 
-        # batter swings
-        swing_value = roll('d100')
-        logging.info("Batter %s swung %s.", batter.name, swing_value)
-
-        mss = max(1, swing_value + pitch_value)
-        logging.debug("MSS=%s", mss)
-
-        # TODO modify swing value with traits
-        swing_result = tables.swing_result_table(batter.bt, batter.obt, mss)
-        logging.debug("Swing result: %s", swing_result)
+        self.mss = mss = min(tables.MAX_MSS, max(1, swing_value + pitch_value))
+        self.swing_result = swing_result = batter.swing_results[mss]
 
         # TODO check rules to see if roll should be <= bt or < bt
 
-        # TODO simple hit/out check for now
-        if 'hit' in swing_result.lower():
-            logging.debug("HIT!")
-            # TODO every hit is a single for now
-            self.half.inning.game.single()
-            self.result = "SINGLE"
-        elif 'walk' in swing_result.lower():
+        if swing_result is SwingResult.ORDINARY_HIT or swing_result is SwingResult.CRITICAL_HIT:
+            # roll on the hit table and play out its events
+            self.critical = swing_result is SwingResult.CRITICAL_HIT
+            self.hit_roll = D20.roll(roller)
+            for event in batter.mods.hit_table[self.hit_roll - 1]:
+                event.resolve(self)
+            if self.great_play:
+                self.game.out()
+                self.result = "GREAT PLAY"
+            else:
+                self.game.hit(self.batter_bases, self.runner_bases)
+                if self.error:
+                    self.half.add_error()
+                self.result = HIT_NAMES[self.batter_bases] + (" + E" if self.error else "")
+        elif swing_result is SwingResult.WALK:
             self.result = "WALK"
-        elif 'out' in swing_result.lower():
-            self.half.inning.game.out()
-            self.result = f"OUT #{self.half.outs}"
         else:
-            # TODO other stuff
-            self.half.inning.game.out()
+            # TODO oddities and errors are outs for now
+            self.game.out()
             self.result = f"OUT #{self.half.outs}"
 
-        # TODO
-        import time
-        time.sleep(SLEEP_SECS)
+        for observer in self.game.observers:
+            observer.at_bat_finished(self)
+
+    def defense_roll(self, pos):
+        # d12 on the Defense Table for a chance at `pos`
+        fielder = self.half.fielding.lineup.at_position(pos)
+        return D12.roll(self.game.roller) + (fielder.mods.defense if fielder else 0)
+
+
+class Linescore:
+    # Runs, hits and errors of both sides (0: visitors, 1: home), kept up to
+    # date as they happen, in total and runs per inning.
+    def __init__(self):
+        self.runs    = [0, 0]
+        self.hits    = [0, 0]
+        self.errors  = [0, 0]
+        self.innings = ([], [])
+
+    def start_half(self, side):
+        self.innings[side].append(0)
+
+    def add_run(self, side):
+        self.runs[side] += 1
+        self.innings[side][-1] += 1
+
+    def add_hit(self, side):
+        self.hits[side] += 1
 
-        self.print()
-        time.sleep(SLEEP_SECS)
+    def add_error(self, side):
+        self.errors[side] += 1
+
+    def inning_runs(self, side, n):
+        # runs scored by `side` in inning n, or None if it has not batted yet
+        innings = self.innings[side]
+        return innings[n-1] if n <= len(innings) else None
+
+    @property
+    def is_tied(self):
+        return self.runs[0] == self.runs[1]
 
 
 class InningHalf:
     def __init__(self, inning, name: InningHalfName):
         self.inning = inning
         self.name   = name
+        self.side   = 0 if name is InningHalfName.TOP else 1
 
         self.outs    = 0
         self.runs    = 0
         self.hits    = 0
-        self.errors  = 0
+        self.errors  = 0  # made by the fielding team, unlike the rest
         self.at_bats = []
+        self.n_at_bats = 0
 
         if self.name is InningHalfName.TOP:
             self.batting, self.fielding = self.inning.game.teams
         else:
             self.fielding, self.batting = self.inning.game.teams
 
+        self.linescore = self.inning.game.linescore
+        self.linescore.start_half(self.side)
         self.inning.game.bases.clear()
 
     @property
     def at_bat(self):
         return self.at_bats[-1]
 
+    def add_run(self):
+        self.runs += 1
+        self.linescore.add_run(self.side)
+
+    def add_hit(self):
+        self.hits += 1
+        self.linescore.add_hit(self.side)
+
+    def add_error(self):
+        # charged to the fielding team, here and in the linescore
+        self.errors += 1
+        self.linescore.add_error(self.fielding.side)
+
     def make_next_at_bat(self):
-        self.batting._batter_n += 1
-        self.at_bats.append(AtBat(self))
+        self.batting.lineup.advance()
+        self.n_at_bats += 1
+        if self.inning.game.keep_at_bats or not self.at_bats:
+            self.at_bats.append(AtBat(self))
+        else:
+            self.at_bats[-1] = AtBat(self)
 
-    def play(self):
-        logging.debug(f"Starting half: {self}")
+    def steps(self):
+        # plays the half one at-bat at a time, yielding each one once played
+        observers = self.inning.game.observers
+        for observer in observers:
+            observer.half_started(self)
         while self.outs < 3:
             # select next batter
             self.make_next_at_bat()
             self.at_bat.play()
-            logging.debug("Outs: %s", self.outs)
-        logging.debug(f"Ending half: {self}")
+            yield self.at_bat
+        for observer in observers:
+            observer.half_finished(self)
+
+    def play(self):
+        for at_bat in self.steps():
+            pass
 
     def __str__(self):
         return f"{self.name.name} of the {self.inning.number}"
@@ -376,19 +658,35 @@ class Inning:
 
         self.halfs.append(half)
 
-    def play(self):
+    def steps(self):
         while len(self.halfs) < 2:
             self.make_next_half()
-            print()
-            print(self.half)
-            print()
-            self.half.play()
+            yield from self.half.steps()
+
+    def play(self):
+        for at_bat in self.steps():
+            pass
 
 
 class Game:
-    def __init__(self, teams=None):
-        self.teams   = teams or []
-        self.innings = []
+    def __init__(self, teams=None, observers=None, seed=None, keep_at_bats=True, roller=None):
+        self.teams     = teams or []
+        self.innings   = []
+        self.observers = list(observers) if observers else []
+        self.linescore = Linescore()
+        # without them only the last at-bat of every half is kept, for games
+        # that are only played for their totals
+        self.keep_at_bats = keep_at_bats
+
+        # Every game has its own seed, so any game can be played again.
+        # Decisions like the starting pitchers and the dice get separate
+        # generators; `roller` makes the dice's from their seed.
+        assert seed is None or 0 <= seed <= MAX_SEED, f"A game's seed is from 0 to {MAX_SEED}, not {seed}."
+        self.seed   = seed if seed is not None else random.getrandbits(64)
+        self.random = random.Random(self.seed)
+        self.roller = (roller or dice.Roller)(self.random.getrandbits(64))
+        # timings of this game, when `instrument` is enabled and sampled it
+        self.stats  = None
 
         self._n_inning = 0
         self.bases = BaseQueue(self)
@@ -397,6 +695,10 @@ class Game:
     def inning(self):
         return self.innings[-1]
 
+    @property
+    def headless(self):
+        return not self.observers
+
     @property
     def away(self):
         return self.teams[0]
@@ -405,9 +707,27 @@ class Game:
     def home(self):
         return self.teams[1]
 
-    def hit(self, n_bases):
-        self.bases.advance_batter(n_bases)
-        self.inning.half.hits += 1
+    def set_teams(self, away: Team, home: Team):
+        away.game = self
+        home.game = self
+        self.teams = [away, home]
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def set_starting_pitchers(self, numbers=None):
+        # by number, or else picked at random with the game's own generator
+        numbers = numbers or [ None, None ]
+        for team, number in zip(self.teams, numbers):
+            if number is None:
+                pitcher = self.random.choice(team.starting_pitchers)
+            else:
+                pitcher = team.get_player_by_number(number)
+            team.set_pitcher(pitcher)
+
+    def hit(self, n_bases, runner_bases=None):
+        self.bases.advance(n_bases, runner_bases or n_bases)
+        self.inning.half.add_hit()
 
     def single(self):
         self.hit(1)
@@ -421,23 +741,17 @@ class Game:
     def home_run(self):
         self.hit(4)
 
-    def runner_reached_home(self):
-        self.inning.half.runs += 1
+    def runner_reached_home(self, runner=None):
+        half = self.inning.half
+        half.add_run()
+        if runner is not None and half.at_bats:
+            half.at_bat.scored += (runner,)
 
     def out(self):
         self.inning.half.outs += 1
 
     def clean_row(self, n, row):
-        return {
-            'number': n,
-            'name'  : row['Name'],
-            'hand'  : Hand[row['Handedness']],
-            'bt'    : int(row['BT']) if row['BT'] else None,
-            'obt'   : int(row['OBT']) if row['OBT'] else None,
-            'pd'    : PitcherDice[row['PD']] if row['PD'] else PitcherDice['-d4'],
-            'pos'   : Positions[row['Position']],
-            'traits': [ Traits[t] for t in row['Traits'].split() ],
-        }
+        return clean_row(n, row)
 
     def get_team_from_roster(self, filename) -> Team:
         logging.debug("Loading roster file: %s", filename)
@@ -447,7 +761,7 @@ class Game:
             roster = [ self.clean_row(n+1, row) for n, row in enumerate(reader) ]
 
         players = [ Player(**row) for row in roster ]
-        team_name = filename.split('roster__')[-1].split('.')[0].replace('_', ' ').title()
+        team_name = team_name_from_filename(filename)
         logging.debug("Loaded team '%s' from roster file: %s", team_name, filename)
         return Team(team_name, players=players)
 
@@ -457,6 +771,9 @@ class Game:
         self.innings.append(inning)
 
     def print_atbat(self):
+        print(self.atbat_table())
+
+    def atbat_table(self) -> str:
         headers = ['Batting', 'Outs', 'At Bat']
         batting_team = self.inning.half.batting
         rows = [[
@@ -464,85 +781,93 @@ class Game:
             self.inning.half.outs,
             batting_team.up_to_bat.name,
         ]]
-        print(tabulate(
+        return tabulate(
             rows,
             headers=headers,
             tablefmt='fancy_grid',
-        ))
+        )
 
     def print_field(self):
         print_field(self, field)
 
     def print_scoreboard(self):
+        print(self.scoreboard())
+
+    def scoreboard(self) -> str:
         n_innings = max(self._n_inning, N_INNINGS)
-        # TODO clean up: merge these
-        halfs_away = self.away.halfs_at_bat
-
-        runs_away = []
-        for n in range(n_innings):
-            try:
-                runs = halfs_away[n].runs
-            except IndexError:
-                runs = None
-            runs_away.append(runs)
-
-
-        halfs_home = []
-        for inning in self.innings:
-            for half in inning.halfs:
-                if half.batting == self.home:
-                    halfs_home.append(half)
-
-        runs_home = []
-        for n in range(n_innings):
-            try:
-                runs = halfs_home[n].runs
-            except IndexError:
-                runs = None
-            runs_home.append(runs)
+        runs_away, runs_home = [
+            [ self.linescore.inning_runs(side, n+1) for n in range(n_innings) ]
+            for side in (0, 1)
+        ]
 
         rows = [
             [colored('Visitors', self.away.color), self.away.name] + runs_away + ['', self.away.runs, self.away.hits, self.away.errors],
             [colored('Home',     self.home.color), self.home.name] + runs_home + ['', self.home.runs, self.home.hits, self.home.errors],
         ]
 
-        print(tabulate(
+        return tabulate(
             rows,
             headers=['', 'Team'] + [ n+1 for n in range(n_innings) ] + ['', 'R', 'H', 'E'],
             tablefmt='fancy_grid',
-        ))
+        )
+
+    def steps(self):
+        # plays the game one at-bat at a time, yielding each one once played
+        for observer in self.observers:
+            observer.game_started(self)
 
-    def play(self):
         while self._n_inning < N_INNINGS:
             self.make_next_inning()
 
             if not self.inning.is_over:
-                # TODO go in to extra innings
-                self.inning.play()
-        # extra innings
+                yield from self.inning.steps()
 
-        # TODO!
-        while self.away.runs == self.home.runs:
+        # extra innings
+        while self.linescore.is_tied:
             self.make_next_inning()
-            self.inning.play()
+            yield from self.inning.steps()
 
-if __name__ == '__main__':
-    # clear the debug log
-    os.system(':>debug.log')
+        for observer in self.observers:
+            observer.game_finished(self)
+
+    def play(self):
+        for at_bat in self.steps():
+            pass
 
-    roster_filename_a = sys.argv[1]
-    roster_filename_b = sys.argv[2]
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play a game between two rosters.")
+    parser.add_argument('roster_a', help="roster file of the visiting team")
+    parser.add_argument('roster_b', help="roster file of the home team")
+    parser.add_argument('--log', metavar='FILE', help="append the play-by-play to a binary log")
+    parser.add_argument('--columns', metavar='DIR', help="append the play-by-play to a columnar log")
+    parser.add_argument('--seed', type=parse_seed, default=None, help="play the game with this seed again")
+    parser.add_argument('--plain', action='store_true', help="clear and redraw the whole screen every frame")
+    parser.add_argument('--profile', action='store_true', help="time the hot paths and report them after the game")
+    args = parser.parse_args()
+
+    roster_filename_a = args.roster_a
+    roster_filename_b = args.roster_b
 
     use_defaults = True
 
-    game = Game()
+    if args.profile:
+        import instrument
+        instrument.enable(engine=sys.modules[__name__])
+
+    observer = TerminalObserver if args.plain else AnsiTerminalObserver
+    game = Game(observers=[observer(sleep_secs=SLEEP_SECS)], seed=args.seed)
+    if args.log:
+        play_log = PlayLog(sink=BinarySink(args.log))
+        game.add_observer(play_log)
+    if args.columns:
+        from columnar import ColumnarSink
+        columns_log = PlayLog(sink=ColumnarSink(args.columns))
+        game.add_observer(columns_log)
     team_away = game.get_team_from_roster(roster_filename_a)
     team_home = game.get_team_from_roster(roster_filename_b)
-    team_away.game = game
-    team_home.game = game
     team_away.color = 'light_red'
     team_home.color = 'light_blue'
-    game.teams = [team_away, team_home]
+    game.set_teams(team_away, team_home)
 
     if roster_filename_a == roster_filename_b:
         game.teams[1].name = "The Dopplegangers"
@@ -562,7 +887,7 @@ if __name__ == '__main__':
                 pass
             print("Bullpen:")
             team.print_bullpen()
-        starting_pitcher = random.choice(team.starting_pitchers)
+        starting_pitcher = game.random.choice(team.starting_pitchers)
         team.set_pitcher(starting_pitcher)
         if not use_defaults:
             print()
@@ -577,3 +902,10 @@ if __name__ == '__main__':
     game.play()
     print("THAT'S THE GAME!")
     game.print_scoreboard()
+    print(f"Seed: {game.seed}")
+    if args.profile:
+        print(game.stats.report())
+    if args.log:
+        play_log.close()
+    if args.columns:
+        columns_log.close()
@@ -0,0 +1,250 @@
+from collections import Counter
+import random
+import sys
+from time import perf_counter_ns
+
+from tabulate import tabulate
+
+import art
+import dice
+import game
+import observers
+
+
+# Opt-in timing of the hot paths. Nothing here touches the engine until
+# `enable()` wraps a few methods of `Game` and `AtBat`, and `disable()` puts
+# them back, so a disabled build runs exactly the same code as before. When
+# enabled, a game is only timed if it was sampled: timed wrappers replace the
+# functions below while a sampled game is played, and a game that was not
+# sampled only pays for one wrapper per at-bat.
+#
+# Timings are inclusive: an at-bat's time includes its dice, lookups, base
+# moves and bookkeeping, and rendering includes the print paths it calls.
+#
+# Memory is not counted per allocation, which CPython cannot do cheaply: a
+# game's `net_blocks` is how many more memory blocks are allocated after it
+# than before (`sys.getallocatedblocks`), i.e. what it left behind. Objects
+# made and freed during the game do not show.
+
+PHASES = [
+    # phase               owner                             name
+    ('dice',              'dice.Dice',                      'roll'),
+    ('swing_lookup',      'game.Player',                    'swing_results'),  # and the index into it
+    ('bases',             'game.BaseQueue',                 'advance'),
+    ('bookkeeping',       'game.Linescore',                 'add_run'),
+    ('bookkeeping',       'game.Linescore',                 'add_hit'),
+    ('bookkeeping',       'game.Linescore',                 'add_error'),
+    ('render',            'observers.TerminalObserver',     'draw'),
+    ('render',            'observers.AnsiTerminalObserver', 'draw'),
+    ('print_scoreboard',  'game.Game',                      'print_scoreboard'),
+    ('print_atbat',       'game.Game',                      'print_atbat'),
+    ('print_field',       'game.Game',                      'print_field'),
+    ('field_frame',       'art.FieldRenderer',              'frame'),
+]
+
+# the Stats of the game being played, if it is sampled
+current = None
+# everything recorded since `enable()`
+totals  = None
+
+_originals = []
+_phases    = []
+_playing   = 0  # sampled games being played
+_sampler   = None
+_sample    = 1.0
+_engine    = None
+
+
+class Stats:
+    # Calls and cumulative nanoseconds per phase, and the net memory blocks
+    # the games left allocated. Mergeable, so workers can send theirs back.
+    def __init__(self):
+        self.calls      = Counter()
+        self.nanos      = Counter()
+        self.games      = 0
+        self.net_blocks = 0
+
+    def add(self, phase, nanos):
+        self.calls[phase] += 1
+        self.nanos[phase] += nanos
+
+    def merge(self, other):
+        self.calls.update(other.calls)
+        self.nanos.update(other.nanos)
+        self.games      += other.games
+        self.net_blocks += other.net_blocks
+
+    def report(self) -> str:
+        at_bat = self.nanos['at_bat'] or 1
+        rows = [
+            [
+                phase,
+                self.calls[phase],
+                f"{self.nanos[phase] / 1e6:.2f}",
+                f"{self.nanos[phase] / self.calls[phase] / 1e3:.2f}",
+                f"{self.nanos[phase] / at_bat:.1%}" if phase != 'at_bat' else '',
+            ]
+            for phase, nanos in self.nanos.most_common()
+        ]
+        table = tabulate(rows, headers=['Phase', 'Calls', 'Total ms', 'Per call us', 'Of at-bats'], tablefmt='fancy_grid')
+        games = max(self.games, 1)
+        return f"{table}\n{self.games} games, {self.net_blocks / games:+,.0f} memory blocks left allocated per game (net, not allocations made)"
+
+
+def timed(phase, function):
+    def wrapper(*args, **kwargs):
+        stats = current
+        if stats is None:
+            return function(*args, **kwargs)
+        start = perf_counter_ns()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats.add(phase, perf_counter_ns() - start)
+    wrapper.__wrapped__ = function
+    return wrapper
+
+class TimedTable:
+    # A lookup table that times the index into it, along with getting it.
+    __slots__ = ('phase', 'table', 'stats', 'start')
+
+    def __init__(self, phase, table, stats, start):
+        self.phase = phase
+        self.table = table
+        self.stats = stats
+        self.start = start
+
+    def __getitem__(self, key):
+        try:
+            return self.table[key]
+        finally:
+            self.stats.add(self.phase, perf_counter_ns() - self.start)
+
+def timed_lookup(phase, fget):
+    # a property getter whose table is only ever indexed in the at-bat
+    def getter(self):
+        stats = current
+        if stats is None:
+            return fget(self)
+        start = perf_counter_ns()
+        return TimedTable(phase, fget(self), stats, start)
+    getter.__wrapped__ = fget
+    return getter
+
+def timed_at_bat(function):
+    # tells the other wrappers which game they are timing
+    def play(self):
+        global current
+        stats = self.game.stats
+        if stats is None:
+            return function(self)
+        current = stats
+        start   = perf_counter_ns()
+        try:
+            return function(self)
+        finally:
+            stats.add('at_bat', perf_counter_ns() - start)
+            current = None
+    play.__wrapped__ = function
+    return play
+
+def sampled_init(function):
+    def __init__(self, *args, **kwargs):
+        function(self, *args, **kwargs)
+        if _sampler.random() < _sample:
+            self.stats = Stats()
+    __init__.__wrapped__ = function
+    return __init__
+
+def counted_steps(function):
+    # The phase wrappers are only in place while a sampled game is being
+    # played; games that were not sampled only go through `timed_at_bat`.
+    # They come off at every yield, so a game left unfinished, e.g. by
+    # `Replay.seek`, leaves nothing installed.
+    def steps(self):
+        stats = self.stats
+        if stats is None:
+            yield from function(self)
+            return
+        blocks = sys.getallocatedblocks()
+        played = function(self)
+        while True:
+            install()
+            try:
+                at_bat = next(played)
+            except StopIteration:
+                break
+            finally:
+                uninstall()
+            yield at_bat
+        stats.games      += 1
+        stats.net_blocks += sys.getallocatedblocks() - blocks
+        totals.merge(stats)
+    steps.__wrapped__ = function
+    return steps
+
+def install():
+    global _playing
+    if not _playing:
+        for owner, name, original, wrapper in _phases:
+            setattr(owner, name, wrapper)
+    _playing += 1
+
+def uninstall():
+    global _playing
+    _playing -= 1
+    if not _playing:
+        for owner, name, original, wrapper in _phases:
+            setattr(owner, name, original)
+
+
+def patch(owner, name, wrapper):
+    original = vars(owner)[name]
+    _originals.append((owner, name, original))
+    setattr(owner, name, wrapper)
+
+def resolve(path):
+    # 'game.AtBat' -> the class; `game` is whichever module the engine runs
+    # from, which is `__main__` when game.py is run as a script
+    module, *rest = path.split('.')
+    owner = { 'game': _engine, 'dice': dice, 'art': art, 'observers': observers }[module]
+    for name in rest:
+        owner = getattr(owner, name)
+    return owner
+
+def enable(sample=1.0, seed=None, engine=None):
+    # time a `sample` fraction of the games created from now on
+    global totals, _sampler, _sample, _engine
+    if _originals:
+        disable()
+    totals   = Stats()
+    _sampler = random.Random(seed)
+    _sample  = sample
+    _engine  = engine or game
+
+    patch(_engine.Game, '__init__', sampled_init(vars(_engine.Game)['__init__']))
+    patch(_engine.Game, 'steps', counted_steps(vars(_engine.Game)['steps']))
+    patch(_engine.AtBat, 'play', timed_at_bat(vars(_engine.AtBat)['play']))
+    for phase, path, name in PHASES:
+        owner    = resolve(path)
+        original = vars(owner)[name]
+        if isinstance(original, property):
+            wrapper = property(timed_lookup(phase, original.fget))
+        else:
+            wrapper = timed(phase, original)
+        _phases.append((owner, name, original, wrapper))
+
+def disable():
+    global current, _playing
+    while _originals:
+        owner, name, original = _originals.pop()
+        setattr(owner, name, original)
+    if _playing:
+        for owner, name, original, wrapper in _phases:
+            setattr(owner, name, original)
+    _phases.clear()
+    _playing = 0
+    current  = None
+
+def is_enabled() -> bool:
+    return bool(_originals)
@@ -0,0 +1,211 @@
+import csv
+import glob
+import hashlib
+import io
+import logging
+import mmap
+import os
+import pickle
+import struct
+
+from enums import Hand, PitcherDice, Positions, Traits
+from game import Player, Team, clean_row, team_name_from_filename
+
+
+ROSTER_GLOB   = 'roster__*.csv'
+ROSTER_HEADER = ['Name', 'Position', 'Handedness', 'BT', 'OBT', 'Traits', 'PD']
+
+# The cache is one file per league directory, named after the directory and
+# the hash of every roster in it: a magic string, the length of the index, the
+# pickled index of team name -> (offset, length) and then one pickled blob per
+# team. Opening it only reads the index; a team's blob is unpickled the first
+# time the team is used. Unpickling runs whatever the file says, so caches
+# live in a directory of the user's own (mode 0700), never next to rosters
+# that others may be able to write to.
+CACHE_MAGIC  = b'DEADBALL-LEAGUE-1\n'
+CACHE_PREFIX = 'league-'
+CACHE_SUFFIX = '.cache'
+_length = struct.Struct('<Q')
+
+
+class RosterError(ValueError):
+    pass
+
+
+def default_cache_dir() -> str:
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'deadball')
+
+
+def row_to_record(n, row) -> tuple:
+    # a compact, picklable form of `clean_row`: enums are stored as values
+    cleaned = clean_row(n, row)
+    return (
+        cleaned['number'],
+        cleaned['name'],
+        cleaned['pos'].value,
+        cleaned['hand'].value,
+        cleaned['bt'],
+        cleaned['obt'],
+        tuple(t.value for t in cleaned['traits']),
+        cleaned['pd'].value,
+    )
+
+def record_to_player(record) -> Player:
+    number, name, pos, hand, bt, obt, traits, pd = record
+    return Player(
+        number = number,
+        name   = name,
+        pos    = Positions(pos),
+        hand   = Hand(hand),
+        bt     = bt,
+        obt    = obt,
+        traits = [ Traits(t) for t in traits ],
+        pd     = PitcherDice(pd),
+    )
+
+def parse_roster(filename, content: bytes, errors: list) -> list:
+    # records of one roster file; problems are appended to `errors` so that a
+    # whole league can be checked at once
+    reader = csv.DictReader(io.StringIO(content.decode()))
+    if reader.fieldnames != ROSTER_HEADER:
+        errors.append(f"{filename}: expected columns {','.join(ROSTER_HEADER)}")
+        return []
+    records = []
+    for n, row in enumerate(reader):
+        try:
+            records.append(row_to_record(n+1, row))
+        except (KeyError, ValueError) as e:
+            errors.append(f"{filename}:{n+2}: bad value {e}")
+    if not records:
+        errors.append(f"{filename}: no players")
+    return records
+
+
+class League:
+    # All the `roster__*.csv` files of one directory.
+    def __init__(self, directory, cache=True, cache_dir=None):
+        self.directory = directory
+        self.filenames = sorted(glob.glob(os.path.join(directory, ROSTER_GLOB)))
+
+        contents = {}
+        digest   = hashlib.sha256()
+        for filename in self.filenames:
+            with open(filename, 'rb') as fh:
+                contents[filename] = fh.read()
+            digest.update(os.path.basename(filename).encode() + b'\0')
+            digest.update(contents[filename] + b'\0')
+        self.hash = digest.hexdigest()
+
+        self._players = {}
+        self._records = None
+        self._index   = None
+        self._mmap    = None
+        if cache:
+            cache_dir = cache_dir or default_cache_dir()
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            # one prefix per league directory, for clearing out its stale caches
+            self._cache_prefix = os.path.join(cache_dir, f"{CACHE_PREFIX}{hashlib.sha256(os.path.abspath(directory).encode()).hexdigest()[:16]}-")
+            self.cache_filename = f"{self._cache_prefix}{self.hash[:16]}{CACHE_SUFFIX}"
+            if not os.path.exists(self.cache_filename):
+                self.write_cache(self.cache_filename, self.compile(contents))
+            self._index = self.open_cache(self.cache_filename)
+        else:
+            self._records = self.compile(contents)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # the cache is mapped again if a team still to be read is asked for
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    @property
+    def names(self) -> list:
+        return list(self._index if self._index is not None else self._records)
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        return name in (self._index if self._index is not None else self._records)
+
+    def compile(self, contents) -> dict:
+        # team name -> player records, checking every file before giving up
+        errors  = []
+        records = {}
+        for filename, content in contents.items():
+            name = team_name_from_filename(filename)
+            if name in records:
+                errors.append(f"{filename}: duplicate team name '{name}'")
+            records[name] = parse_roster(filename, content, errors)
+        if errors:
+            raise RosterError('\n'.join(errors))
+        logging.debug("Compiled %s rosters in %s", len(records), self.directory)
+        return records
+
+    def write_cache(self, cache_filename, records):
+        blobs  = { name: pickle.dumps(r, protocol=pickle.HIGHEST_PROTOCOL) for name, r in records.items() }
+        index  = {}
+        offset = 0
+        for name, blob in blobs.items():
+            index[name] = (offset, len(blob))
+            offset += len(blob)
+        header = pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # write aside and rename, so a reader never sees half a cache
+        tmp_filename = f"{cache_filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, 'wb') as fh:
+            fh.write(CACHE_MAGIC)
+            fh.write(_length.pack(len(header)))
+            fh.write(header)
+            for blob in blobs.values():
+                fh.write(blob)
+        os.replace(tmp_filename, cache_filename)
+
+        # older caches of this directory are stale now
+        for filename in glob.glob(f"{glob.escape(self._cache_prefix)}*{CACHE_SUFFIX}"):
+            if filename != cache_filename:
+                os.remove(filename)
+
+    def map_cache(self):
+        with open(self.cache_filename, 'rb') as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def open_cache(self, cache_filename) -> dict:
+        self.map_cache()
+        start = len(CACHE_MAGIC)
+        assert self._mmap[:start] == CACHE_MAGIC, f"Not a league cache: {cache_filename}"
+        (header_length,) = _length.unpack_from(self._mmap, start)
+        start += _length.size
+        index = pickle.loads(self._mmap[start:start+header_length])
+        self._data_start = start + header_length
+        return index
+
+    def players(self, name) -> list:
+        # the players of one team, built the first time they are asked for
+        if name not in self._players:
+            if self._index is not None:
+                if self._mmap is None:
+                    self.map_cache()
+                offset, length = self._index[name]
+                start   = self._data_start + offset
+                records = pickle.loads(self._mmap[start:start+length])
+            else:
+                records = self._records[name]
+            self._players[name] = [ record_to_player(r) for r in records ]
+            if self._index is not None and len(self._players) == len(self._index):
+                # every team read: the cache is not needed any more
+                self.close()
+        return self._players[name]
+
+    def team(self, name) -> Team:
+        # a fresh team, ready for a new game, sharing the league's players
+        return Team(name, players=self.players(name))
@@ -0,0 +1,188 @@
+from functools import lru_cache
+
+import numpy as np
+
+from game import N_INNINGS
+import odds
+import tables
+
+
+# A half-inning is a Markov chain over (outs, runners, lineup slot) that ends
+# with the third out. Solving it gives, for every leadoff slot, the joint
+# distribution of runs scored and the slot that leads off the next time the
+# team bats. Chaining halves gives run distributions over a game, and with
+# them exact win probabilities. Extra innings are another absorbing chain over
+# the two teams' lineup slots while the score stays tied.
+
+# half-innings with more runs than this are vanishingly unlikely
+MAX_RUNS = 30
+# game totals beyond this are lumped together
+MAX_GAME_RUNS = 80
+
+N_SLOTS  = 9
+N_STATES = 3 * 8 * N_SLOTS
+
+
+def state_index(outs, bases, slot):
+    return (outs * 8 + bases) * N_SLOTS + slot
+
+def advance(bases, n, runner_bases=None):
+    # `BaseQueue.advance`: the batter takes n bases and the runners
+    # `runner_bases`, n by default
+    if n == 0:
+        return bases, 0
+    mask, runs, moves, scored = tables.PLAY_ADVANCE[bases][n][n if runner_bases is None else runner_bases]
+    return mask, runs
+
+@lru_cache(maxsize=None)
+def moves(n_outs, n_bases, runner_bases) -> tuple:
+    # for every (outs, bases) of a half: where an event takes it (-1 for the
+    # third out) and the runs it scores; states are outs * 8 + bases
+    frm, to, runs = [], [], []
+    for outs in range(3):
+        for bases in range(8):
+            frm.append(outs * 8 + bases)
+            if n_outs:
+                to.append(-1 if outs + n_outs >= 3 else (outs + n_outs) * 8 + bases)
+                runs.append(0)
+            else:
+                moved, scored = advance(bases, n_bases, runner_bases)
+                to.append(outs * 8 + moved)
+                runs.append(scored)
+    return np.array(frm), np.array(to), np.array(runs)
+
+def transitions(events) -> tuple:
+    # (Q, A) of a lineup whose slot s has the events `events[s]`: Q[k] the
+    # transient -> transient moves that score k runs, A the transient ->
+    # third out ones, by the next leadoff slot
+    Q = np.zeros((5, N_STATES, N_STATES))
+    A = np.zeros((N_SLOTS, N_STATES))
+    for slot, slot_events in enumerate(events):
+        following = (slot + 1) % N_SLOTS
+        for p, n_outs, n_bases, r_bases in slot_events:
+            frm, to, runs = moves(n_outs, n_bases, r_bases)
+            i     = frm * N_SLOTS + slot
+            ended = to < 0
+            # every (outs, bases) once, so no index repeats
+            Q[runs[~ended], to[~ended] * N_SLOTS + following, i[~ended]] += p
+            A[following, i[ended]] += p
+    return Q, A
+
+def plate_appearance_events(outcomes: odds.Outcomes):
+    # (probability, outs, batter bases, runner bases) of each thing a plate
+    # appearance can do, as `AtBat.play` plays it
+    return [
+        (float(p), outs, n, r)
+        for (outs, n, r), p in outcomes.plays.items()
+    ]
+
+
+class HalfInning:
+    # `events[slot]` is the list of (probability, outs, batter bases, runner
+    # bases) for the batter in that lineup slot.
+
+    def __init__(self, events, max_runs=MAX_RUNS):
+        self.max_runs = max_runs
+
+        Q, A = transitions(events)
+
+        # expected visits to every state before the third out, per run total
+        N = np.linalg.inv(np.eye(N_STATES) - Q[0])
+        start = np.zeros((N_STATES, N_SLOTS))
+        for slot in range(N_SLOTS):
+            start[state_index(0, 0, slot), slot] = 1
+
+        visits = [ N @ start ]
+        for r in range(1, max_runs+1):
+            arriving = sum(Q[k] @ visits[r-k] for k in range(1, min(r, 4)+1))
+            visits.append(N @ arriving)
+
+        # runs[leadoff, r, next leadoff]
+        self.runs = np.zeros((N_SLOTS, max_runs+1, N_SLOTS))
+        for r in range(max_runs+1):
+            ended = A @ visits[r]
+            self.runs[:, r, :] = ended.T
+
+    @classmethod
+    def for_matchup(cls, lineup, pitcher, defense=(), **kwargs):
+        return cls([
+            plate_appearance_events(odds.matchup(batter, pitcher, defense))
+            for batter in lineup
+        ], **kwargs)
+
+    def runs_distribution(self, leadoff: int) -> np.ndarray:
+        return self.runs[leadoff].sum(axis=1)
+
+    @property
+    def expected_runs(self) -> np.ndarray:
+        # per leadoff slot
+        return self.runs.sum(axis=2) @ np.arange(self.max_runs+1)
+
+    @property
+    def next_leadoff(self) -> np.ndarray:
+        # next_leadoff[l, l'] = P(l' leads off next | l led off)
+        return self.runs.sum(axis=1)
+
+
+def game_runs(half: HalfInning, n_innings=N_INNINGS, leadoff=0) -> np.ndarray:
+    # dist[runs, next leadoff] after batting in `n_innings` halves
+    dist = np.zeros((MAX_GAME_RUNS+1, N_SLOTS))
+    dist[0, leadoff] = 1
+    for n in range(n_innings):
+        result = np.zeros_like(dist)
+        for r in range(half.max_runs+1):
+            moved = dist @ half.runs[:, r, :]
+            if r:
+                result[r:-1] += moved[:-r-1]
+                result[-1]   += moved[-r-1:].sum(axis=0)
+            else:
+                result += moved
+        dist = result
+    return dist
+
+def win_probability(away_half: HalfInning, home_half: HalfInning) -> tuple:
+    # `away_half` is the away lineup against the home pitcher, and vice versa.
+    # Regulation innings are always played in full, then whole innings are
+    # added while the score is tied, as in `Game.play`.
+    away = game_runs(away_half)
+    home = game_runs(home_half)
+    away_runs = away.sum(axis=1)
+    home_runs = home.sum(axis=1)
+
+    cumulative_home = np.cumsum(home_runs)
+    p_away = float(away_runs[1:] @ cumulative_home[:-1])
+    p_home = float(home_runs[1:] @ np.cumsum(away_runs)[:-1])
+
+    # tied[a, h]: tied after regulation with away slot a and home slot h up
+    tied = (away.T @ home).flatten()
+
+    # One extra inning from (a, h): away wins it if the top scores more than
+    # the bottom, home wins it if less, and ties move on to the slots (x, y).
+    top    = away_half.runs
+    bottom = home_half.runs
+    top_runs   = top.sum(axis=2)                        # [a, r]
+    home_cdf   = np.cumsum(bottom.sum(axis=2), axis=1)  # [h, r]: P(home <= r)
+    home_less  = np.concatenate([ np.zeros((N_SLOTS, 1)), home_cdf[:, :-1] ], axis=1)
+    away_wins  = (top_runs @ home_less.T).flatten()
+    home_wins  = (top_runs @ (home_cdf[:, -1:] - home_cdf).T).flatten()
+    still_tied = np.einsum('arx,hry->xyah', top, bottom).reshape(N_SLOTS**2, N_SLOTS**2)
+
+    # every extra inning at once: expected visits to each tied state
+    visits = np.linalg.solve(np.eye(N_SLOTS**2) - still_tied, tied)
+    p_away += float(away_wins @ visits)
+    p_home += float(home_wins @ visits)
+    return p_away, p_home
+
+def matchup_win_probability(away, home) -> tuple:
+    # averaged over the starting pitchers, each picked with equal odds like
+    # the `random.choice` in a real game
+    away_halves = [ HalfInning.for_matchup(away.lineup, p, odds.team_defense(home)) for p in home.starting_pitchers ]
+    home_halves = [ HalfInning.for_matchup(home.lineup, p, odds.team_defense(away)) for p in away.starting_pitchers ]
+    results = [
+        win_probability(away_half, home_half)
+        for away_half in away_halves
+        for home_half in home_halves
+    ]
+    p_away = sum(r[0] for r in results) / len(results)
+    p_home = sum(r[1] for r in results) / len(results)
+    return p_away, p_home
@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+
+from art import FieldRenderer, field_slots, move_to
+
+
+class Observer:
+    # Base class for anything that wants to watch a game being played.
+    # Every hook is a no-op, so subclasses only override what they need.
+    # A game with no observers is headless: nothing is rendered at all.
+
+    def game_started(self, game):
+        pass
+
+    def half_started(self, half):
+        pass
+
+    def at_bat_started(self, at_bat):
+        pass
+
+    def at_bat_finished(self, at_bat):
+        pass
+
+    def half_finished(self, half):
+        pass
+
+    def game_finished(self, game):
+        pass
+
+
+class TerminalObserver(Observer):
+    # Redraws the scoreboard, the at-bat and the field around every plate
+    # appearance, pausing `sleep_secs` so a human can follow along.
+
+    def __init__(self, sleep_secs=0):
+        self.sleep_secs = sleep_secs
+
+    def draw(self, game):
+        os.system('clear')
+        game.print_scoreboard()
+        game.print_atbat()
+        game.print_field()
+
+    def half_started(self, half):
+        print()
+        print(half)
+        print()
+
+    def at_bat_started(self, at_bat):
+        self.draw(at_bat.game)
+
+    def at_bat_finished(self, at_bat):
+        time.sleep(self.sleep_secs)
+        self.draw(at_bat.game)
+        time.sleep(self.sleep_secs)
+
+
+CLEAR_SCREEN = '\x1b[H\x1b[2J'
+CLEAR_LINE   = '\x1b[K'
+HIDE_CURSOR  = '\x1b[?25l'
+SHOW_CURSOR  = '\x1b[?25h'
+
+
+class AnsiTerminalObserver(TerminalObserver):
+    # Like `TerminalObserver`, but clears the screen once and from then on
+    # only rewrites the header lines and field slots that changed, with ANSI
+    # cursor moves: no flicker and next to no output per frame.
+
+    def __init__(self, sleep_secs=0, stream=None):
+        super().__init__(sleep_secs)
+        self.stream   = stream or sys.stdout
+        self.renderer = FieldRenderer()
+        self._header  = None
+
+    def frame(self, game) -> str:
+        header = [ str(game.inning.half) ]
+        header += game.scoreboard().split('\n')
+        header += game.atbat_table().split('\n')
+
+        if self._header is None or len(header) != len(self._header):
+            # first frame, or the header changed shape: start over
+            self._header = header
+            self.renderer.reset(top=len(header))
+            out = [ HIDE_CURSOR, CLEAR_SCREEN, '\n'.join(header) ]
+        else:
+            out = [
+                move_to(row, 0) + line + CLEAR_LINE
+                for row, (line, drawn) in enumerate(zip(header, self._header))
+                if line != drawn
+            ]
+            self._header = header
+        out.append(self.renderer.frame(field_slots(game)))
+        return ''.join(out)
+
+    def draw(self, game):
+        self.stream.write(self.frame(game))
+        self.stream.flush()
+
+    def half_started(self, half):
+        # the half is part of the header
+        pass
+
+    def game_finished(self, game):
+        # leave the cursor below the field, if anything was drawn
+        if self._header is None:
+            return
+        self.stream.write(move_to(len(self._header) + self.renderer.template.height, 0) + SHOW_CURSOR)
+        self.stream.flush()
@@ -0,0 +1,173 @@
+from collections import defaultdict
+from fractions import Fraction
+from functools import lru_cache
+
+from dice import D12, D20, D100, PITCHER_DICE, Dice
+from enums import PitcherDice, Positions, SwingResult
+from events import play_hit
+import tables
+
+
+# Exact plate-appearance odds. A plate appearance is a pitch roll plus a d100
+# swing, clamped to at least 1 and looked up on the swing result table, so the
+# odds of every outcome follow from convolving the dice. A hit then rolls a d20
+# on the hit table and a d12 for any chance the defense gets. All
+# probabilities are Fractions and sum to exactly one.
+
+
+def dice_distribution(spec: Dice) -> dict:
+    die  = { face: Fraction(1, spec.sides) for face in range(1, spec.sides+1) }
+    dist = { 0: Fraction(1) }
+    for n in range(spec.count):
+        dist = convolve(dist, die)
+    return { spec.sign * value: p for value, p in dist.items() }
+
+def convolve(a: dict, b: dict) -> dict:
+    result = defaultdict(Fraction)
+    for x, px in a.items():
+        for y, py in b.items():
+            result[x+y] += px * py
+    return dict(result)
+
+@lru_cache(maxsize=None)
+def mss_distribution(pd: PitcherDice, mod=0) -> dict:
+    # `mod` is what the traits of the batter and the pitcher add to the MSS
+    dist = convolve(dice_distribution(PITCHER_DICE[pd]), dice_distribution(D100))
+    result = defaultdict(Fraction)
+    for mss, p in dist.items():
+        result[min(tables.MAX_MSS, max(1, mss + mod))] += p
+    return dict(result)
+
+@lru_cache(maxsize=None)
+def hit_bases(critical=False, hit=0) -> dict:
+    # bases taken on a d20 roll, plus `hit`, on the hit table; a critical hit
+    # is one level better: single to double, double to triple, a home run
+    # stays one
+    result = defaultdict(Fraction)
+    p = Fraction(1, D20.sides)
+    for n in range(1, D20.sides+1):
+        bases = tables.HIT_BASES[tables.HIT_TABLE[min(D20.sides, max(1, n + hit)) - 1]]
+        if critical:
+            bases = min(bases+1, 4)
+        result[bases] += p
+    return dict(result)
+
+def team_defense(team) -> tuple:
+    # the D+/D- modifiers of `team`'s fielders, as ((position, mod), ...)
+    defense = []
+    for player in team.lineup:
+        if player.mods.defense:
+            defense.append((player.pos, player.mods.defense))
+    return tuple(sorted(defense, key=lambda d: d[0].value))
+
+@lru_cache(maxsize=None)
+def hit_plays(critical=False, defense=(), hit=0) -> tuple:
+    # ({(outs, batter bases, runner bases): p}, p(error)) of a hit by a batter
+    # whose traits add `hit` to the d20, resolved by the same events as
+    # `AtBat.play` over every d20 and d12 roll
+    table = tables.shifted_hit_table(hit)
+    mods  = dict(defense)
+    plays = defaultdict(Fraction)
+    error = Fraction(0)
+    p     = Fraction(1, D20.sides * D12.sides)
+    for hit_events in table:
+        for d12 in range(1, D12.sides+1):
+            play = play_hit(hit_events, critical, { pos: d12 + mods.get(pos, 0) for pos in Positions })
+            if play.great_play:
+                plays[(1, 0, 0)] += p
+            else:
+                plays[(0, play.batter_bases, play.runner_bases)] += p
+                error += p * play.error
+    return dict(plays), error
+
+
+class Outcomes:
+    # Odds of one batter facing one pitcher, and a fielding team with
+    # `defense` from `team_defense`.
+    def __init__(self, swing, defense=(), hit=0):
+        self.swing = swing  # probability of each SwingResult, indexed by code
+
+        hits = (
+            (swing[SwingResult.ORDINARY_HIT], hit_bases(hit=hit)),
+            (swing[SwingResult.CRITICAL_HIT], hit_bases(critical=True, hit=hit)),
+        )
+        bases = defaultdict(Fraction)
+        for p_hit, dist in hits:
+            for n, p in dist.items():
+                bases[n] += p_hit * p
+        self.bases = dict(bases)  # probability of a hit for n bases, n = 1..4
+
+        # how the plate appearance ends once the defense has had its chance:
+        # {(outs, batter bases, runner bases): p}, a walk doing nothing
+        plays = defaultdict(Fraction)
+        plays[(0, 0, 0)] += self.walk
+        plays[(1, 0, 0)] += self.out
+        self.error = Fraction(0)
+        for critical, p_hit in ((False, swing[SwingResult.ORDINARY_HIT]), (True, swing[SwingResult.CRITICAL_HIT])):
+            hit_dist, error = hit_plays(critical, defense, hit)
+            for play, p in hit_dist.items():
+                plays[play] += p_hit * p
+            self.error += p_hit * error
+        self.plays = dict(plays)
+
+    def __getitem__(self, result: SwingResult) -> Fraction:
+        return self.swing[result]
+
+    @property
+    def hit(self) -> Fraction:
+        return self.swing[SwingResult.ORDINARY_HIT] + self.swing[SwingResult.CRITICAL_HIT]
+
+    @property
+    def walk(self) -> Fraction:
+        return self.swing[SwingResult.WALK]
+
+    @property
+    def out(self) -> Fraction:
+        # oddities and possible errors are played as outs; a hit is a swing
+        # result, so great plays on hits are not counted here
+        return 1 - self.hit - self.walk
+
+
+@lru_cache(maxsize=None)
+def plate_appearance(bt, obt, pd: PitcherDice, defense=(), mod=0, hit=0) -> Outcomes:
+    # `mod` and `hit` are what traits add to the MSS and the hit table roll
+    results = tables.swing_results(bt, obt)
+    swing = [ Fraction(0) ] * (len(SwingResult)+1)
+    for mss, p in mss_distribution(pd, mod).items():
+        swing[results[mss]] += p
+    return Outcomes(tuple(swing), defense, hit)
+
+def matchup(batter, pitcher, defense=()) -> Outcomes:
+    mods = batter.mods
+    return plate_appearance(batter.bt, batter.obt, pitcher.pd, defense, mods.swing + pitcher.mods.pitch, mods.hit)
+
+
+class MatchupMatrix:
+    # Odds of every batter in one team's lineup against every pitcher in the
+    # other team's bullpen.
+    def __init__(self, batting, fielding):
+        self.batters  = list(batting.lineup)
+        self.pitchers = sorted(fielding.bullpen, key=lambda p: p.number)
+        defense       = team_defense(fielding)
+        self.outcomes = [
+            [ matchup(batter, pitcher, defense) for pitcher in self.pitchers ]
+            for batter in self.batters
+        ]
+
+        self._batter_index  = { p: i for i, p in enumerate(self.batters) }
+        self._pitcher_index = { p: i for i, p in enumerate(self.pitchers) }
+
+    def __getitem__(self, key) -> Outcomes:
+        batter, pitcher = key
+        return self.outcomes[self._batter_index[batter]][self._pitcher_index[pitcher]]
+
+    def matrix(self, outcome='hit') -> list:
+        # e.g. matrix('walk') -> [[p(walk) for each pitcher] for each batter]
+        return [
+            [ float(getattr(o, outcome)) for o in row ]
+            for row in self.outcomes
+        ]
+
+def matchup_matrices(away, home):
+    # (away batting against home pitching, home batting against away pitching)
+    return MatchupMatrix(away, home), MatchupMatrix(home, away)
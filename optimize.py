@@ -0,0 +1,188 @@
+import argparse
+from collections import namedtuple
+from multiprocessing import Pool
+import os
+import random
+
+import numpy as np
+from tabulate import tabulate
+
+from batch import BatchEngine
+from game import Team, N_INNINGS
+import markov
+import odds
+from simulate import load_roster
+
+
+# Picks a batting order by local search over swaps of two batters, scoring
+# every order by its exact expected runs over the regulation innings from the
+# half-inning Markov chain. Only expected runs and the next leadoff are needed,
+# which is one linear solve per order; rotations of an order are the same
+# chain with the leadoff moved, so they share that solve. Restarts from random
+# orders run in parallel, and the best of the orders they end at are then
+# played out with the batch engine for a confidence interval.
+
+RESTARTS = 8
+TOP      = 5
+N_GAMES  = 4000
+
+RankedLineup = namedtuple('RankedLineup', ['order', 'expected_runs', 'runs', 'ci'])
+
+
+def solve_half(events) -> tuple:
+    # (expected runs by leadoff slot, next_leadoff[l, l']) of a lineup whose
+    # slot s has the (probability, outs, batter bases, runner bases) events
+    # `events[s]`, from the same chain as `markov.HalfInning` but only its
+    # expectation: one linear solve
+    n    = markov.N_SLOTS
+    Q, A = markov.transitions(events)
+    R    = np.arange(len(Q)) @ Q.sum(axis=1)  # expected runs of a step from each state
+
+    start = np.zeros((markov.N_STATES, n))
+    start[np.arange(n), np.arange(n)] = 1  # state_index(0, 0, slot) == slot
+    visits = np.linalg.solve(np.eye(markov.N_STATES) - Q.sum(axis=0), start)
+    return R @ visits, (A @ visits).T
+
+def regulation_runs(expected, next_leadoff, n_innings=N_INNINGS) -> float:
+    leadoff = np.zeros(markov.N_SLOTS)
+    leadoff[0] = 1
+    total = 0.0
+    for n in range(n_innings):
+        total   += leadoff @ expected
+        leadoff  = leadoff @ next_leadoff
+    return float(total)
+
+
+class LineupScorer:
+    # Expected regulation runs of batting orders of the same nine players,
+    # averaged over the pitchers they might face, against a fielding team with
+    # `defense` from `odds.team_defense`.
+    def __init__(self, players, pitchers, defense=()):
+        self.players = { p.number: p for p in players }
+        self.events  = {
+            pitcher.number: {
+                p.number: tuple(markov.plate_appearance_events(odds.matchup(p, pitcher, defense)))
+                for p in players
+            }
+            for pitcher in pitchers
+        }
+        self.scores  = {}
+        self._halves = {}
+
+    def half(self, events) -> tuple:
+        # solved once for all nine rotations of an order
+        rotations = [ events[k:] + events[:k] for k in range(markov.N_SLOTS) ]
+        canonical = min(rotations)
+        k = rotations.index(canonical)
+        if canonical not in self._halves:
+            self._halves[canonical] = solve_half(canonical)
+        expected, next_leadoff = self._halves[canonical]
+        # slot l of this order is slot (l - k) of the canonical one
+        moved = (np.arange(markov.N_SLOTS) - k) % markov.N_SLOTS
+        return expected[moved], next_leadoff[np.ix_(moved, moved)]
+
+    def score(self, order) -> float:
+        order = tuple(order)
+        if order not in self.scores:
+            self.scores[order] = sum(
+                regulation_runs(*self.half(tuple(events[n] for n in order)))
+                for events in self.events.values()
+            ) / len(self.events)
+        return self.scores[order]
+
+    def local_search(self, order) -> tuple:
+        # best swap of two batters, again and again, until none helps
+        order = list(order)
+        best  = self.score(order)
+        while True:
+            swaps = []
+            for i in range(len(order)):
+                for j in range(i+1, len(order)):
+                    candidate = list(order)
+                    candidate[i], candidate[j] = candidate[j], candidate[i]
+                    swaps.append((self.score(candidate), candidate))
+            score, candidate = max(swaps)
+            if score <= best:
+                return best, tuple(order)
+            best, order = score, candidate
+
+
+def init_worker(players, pitchers, defense=()):
+    global _scorer
+    _scorer = LineupScorer(players, pitchers, defense)
+
+def search(start) -> tuple:
+    # (score, order) of the best order found from `start`
+    return _scorer.local_search(start)
+
+def confidence_interval(values, z=1.96) -> tuple:
+    mean  = values.mean()
+    error = z * values.std(ddof=1) / np.sqrt(len(values))
+    return float(mean), (float(mean - error), float(mean + error))
+
+def optimize_lineup(team: Team, opponent: Team, restarts=RESTARTS, top=TOP, n_games=N_GAMES, workers=None, seed=None) -> list:
+    # The best orders of the nine players in `team`'s lineup against
+    # `opponent`'s starting pitchers that the restarts end at, at most `top`
+    # of them, best first. Their runs are simulated
+    # with `team` batting first against `opponent`'s lineup.
+    assert len(team.lineup) == 9 and len(opponent.lineup) == 9, "Set both lineups first."
+    players  = list(team.lineup)
+    pitchers = opponent.starting_pitchers
+    defense  = odds.team_defense(opponent)
+    picks    = random.Random(seed)
+    starts   = [ tuple(p.number for p in players) ]
+    while len(starts) < restarts:
+        starts.append(tuple(picks.sample(starts[0], len(starts[0]))))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        init_worker(players, pitchers, defense)
+        results = [ search(start) for start in starts ]
+    else:
+        with Pool(min(workers, restarts), initializer=init_worker, initargs=(players, pitchers, defense)) as pool:
+            results = pool.map(search, starts)
+
+    # restarts that end up at the same order count once
+    scores = dict( (order, score) for score, order in results )
+    best   = sorted(scores, key=scores.get, reverse=True)[:top]
+
+    lineup = [ p.number for p in team.lineup ]
+    ranked = []
+    try:
+        for n, order in enumerate(best):
+            team.set_lineup(list(order))
+            result = BatchEngine(team, opponent).play(n_games, seed=None if seed is None else seed + n)
+            # regulation runs only, like the score: extra innings are common
+            # and would swamp the runs per game
+            runs, ci = confidence_interval(result.regulation_runs[:, 0])
+            ranked.append(RankedLineup(order, scores[order], runs, ci))
+    finally:
+        team.set_lineup(lineup)
+    return ranked
+
+def print_lineups(team: Team, ranked):
+    players = { p.number: p for p in team.lineup }
+    rows = [
+        [ n+1, ', '.join(players[number].name for number in r.order), f"{r.expected_runs:.3f}", f"{r.runs:.3f}", f"{r.ci[0]:.3f} - {r.ci[1]:.3f}" ]
+        for n, r in enumerate(ranked)
+    ]
+    print(tabulate(rows, headers=['', 'Order', 'Expected R (reg.)', 'Simulated R (reg.)', '95% CI'], tablefmt='fancy_grid'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Find the best batting orders of a roster against another.")
+    parser.add_argument('roster', help="roster file of the team to optimize")
+    parser.add_argument('opponent', help="roster file of the opponent")
+    parser.add_argument('-r', '--restarts', type=int, default=RESTARTS)
+    parser.add_argument('-t', '--top', type=int, default=TOP)
+    parser.add_argument('-n', '--games', type=int, default=N_GAMES, help="games simulated per order")
+    parser.add_argument('-w', '--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    team     = Team(*load_roster(args.roster))
+    opponent = Team(*load_roster(args.opponent))
+    for t in (team, opponent):
+        t.set_lineup()
+    ranked = optimize_lineup(team, opponent, args.restarts, args.top, args.games, args.workers, args.seed)
+    print_lineups(team, ranked)
@@ -0,0 +1,133 @@
+from collections import deque, namedtuple
+import struct
+
+from observers import Observer
+
+
+# One record per plate appearance. `game` is the seed the game was played
+# with, which tells games apart and replays them, `half` is 0 for the top
+# and 1 for the bottom, `result` the SwingResult code, `bases_*` base
+# occupancy masks, `outs` the outs after the play and `runs` the runs it
+# scored.
+PlateAppearance = namedtuple('PlateAppearance', [
+    'game',
+    'inning',
+    'half',
+    'batter',
+    'pitcher',
+    'pitch',
+    'swing',
+    'mss',
+    'result',
+    'bases_before',
+    'bases_after',
+    'outs',
+    'runs_away',
+    'runs_home',
+    'runs',
+])
+
+RECORD = struct.Struct('<QHBBBbbBBBBBHHB')
+
+# A binary log starts with its magic and the version of its record layout,
+# so a log of another layout is never appended to nor read as this one.
+MAGIC   = b'DBPA'
+VERSION = 2
+HEADER  = struct.Struct('<4sHH')  # magic, version, record size
+
+def check_header(data: bytes, filename):
+    assert len(data) >= HEADER.size, f"{filename} is not a play log."
+    magic, version, size = HEADER.unpack_from(data)
+    assert magic == MAGIC, f"{filename} is not a play log."
+    assert (version, size) == (VERSION, RECORD.size), f"{filename} is version {version} of the play log format, not {VERSION}."
+
+
+class PlayLog(Observer):
+    # Keeps the last `capacity` plate appearances in memory and, given a
+    # sink, writes every one of them out. A game without a PlayLog attached
+    # pays nothing for it.
+    def __init__(self, capacity=4096, sink=None):
+        self.records = deque(maxlen=capacity)
+        self.sink    = sink
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def at_bat_finished(self, at_bat):
+        game = at_bat.game
+        record = PlateAppearance(
+            game.seed,
+            at_bat.half.inning.number,
+            at_bat.half.side,
+            at_bat.batter.number,
+            at_bat.pitcher.number,
+            at_bat.pitch,
+            at_bat.swing,
+            at_bat.mss,
+            at_bat.swing_result,
+            at_bat.bases_before,
+            game.bases.mask,
+            at_bat.half.outs,
+            game.linescore.runs[0],
+            game.linescore.runs[1],
+            len(at_bat.scored),
+        )
+        self.records.append(record)
+        if self.sink is not None:
+            self.sink.write(record)
+
+    def game_finished(self, game):
+        if self.sink is not None:
+            self.sink.flush()
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+
+
+class BinarySink:
+    # Appends packed records to a file, `batch_size` records per write. A new
+    # file gets the header; an old one must already have this one.
+    def __init__(self, filename, batch_size=1024):
+        self.filename   = filename
+        self.batch_size = batch_size
+
+        self._fh = open(filename, 'ab+')
+        self._fh.seek(0)
+        header = self._fh.read(HEADER.size)
+        if header:
+            check_header(header, filename)
+        else:
+            self._fh.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        self._buffer  = bytearray()
+        self._pending = 0
+
+    def write(self, record):
+        self._buffer += RECORD.pack(*record)
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._fh.write(self._buffer)
+            self._fh.flush()
+            self._buffer  = bytearray()
+            self._pending = 0
+
+    def close(self):
+        self.flush()
+        self._fh.close()
+
+
+def read_records(filename):
+    # up to the last complete record, should writing have been cut short
+    with open(filename, 'rb') as fh:
+        data = fh.read()
+    check_header(data, filename)
+    end = HEADER.size + (len(data) - HEADER.size) // RECORD.size * RECORD.size
+    for fields in RECORD.iter_unpack(memoryview(data)[HEADER.size:end]):
+        yield PlateAppearance(*fields)
@@ -0,0 +1,59 @@
+from collections import namedtuple
+
+from game import Game
+
+
+# Everything needed to play a game again, given the same two rosters: the
+# game's seed and the decisions made before the first pitch.
+ReplayRecord = namedtuple('ReplayRecord', ['seed', 'teams', 'lineups', 'pitchers'])
+
+
+def record(game: Game) -> ReplayRecord:
+    return ReplayRecord(
+        seed     = game.seed,
+        teams    = tuple( team.name for team in game.teams ),
+        lineups  = tuple( tuple( p.number for p in team.lineup ) for team in game.teams ),
+        pitchers = tuple( team.pitcher.number for team in game.teams ),
+    )
+
+
+class Replay:
+    # Plays a recorded game again, exactly, with fresh teams built from the
+    # same rosters. `seek` fast-forwards without any observers attached.
+    def __init__(self, record: ReplayRecord, away, home, keep_at_bats=True):
+        assert (away.name, home.name) == tuple(record.teams), "Replay needs the recorded teams."
+
+        self.record = record
+        self.game   = Game(seed=record.seed, keep_at_bats=keep_at_bats)
+        self.game.set_teams(away, home)
+        for team, numbers in zip(self.game.teams, record.lineups):
+            team.set_lineup(list(numbers))
+        self.game.set_starting_pitchers(record.pitchers)
+
+        self._steps = self.game.steps()
+
+    def seek(self, inning, half=0, at_bat=1):
+        # Plays up to and including at-bat number `at_bat` of the given half
+        # (0: top, 1: bottom) of the given inning, and returns it.
+        target = (inning, half, at_bat)
+        for played in self._steps:
+            position = (played.half.inning.number, played.half.side, played.half.n_at_bats)
+            if position == target:
+                return played
+            if position > target:
+                break
+        raise ValueError(f"The game never reached at-bat {at_bat} of half {half} of inning {inning}.")
+
+    def play(self, observers=()) -> Game:
+        # Plays out the rest of the game with `observers` watching. After a
+        # `seek` they are told of the start of the game and of the half under
+        # way first, as if they had been watching all along.
+        started = bool(self.game.innings)
+        for observer in observers:
+            self.game.add_observer(observer)
+            if started:
+                observer.game_started(self.game)
+                observer.half_started(self.game.inning.half)
+        for at_bat in self._steps:
+            pass
+        return self.game
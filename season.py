@@ -0,0 +1,292 @@
+import argparse
+from collections import Counter
+from multiprocessing import Pool
+import os
+import pickle
+import random
+
+from tabulate import tabulate
+
+from boxscore import BoxScore, BoxScoreKeeper
+from league import League
+from simulate import play_game
+
+
+# A season is a fixed schedule of days, every team playing at most once a day.
+# Every game's seed follows from the season's seed and its place in the
+# schedule, so a season plays out the same however it is split up: over any
+# number of workers, or stopped and resumed from a checkpoint.
+
+GAMES_PER_TEAM = 162
+
+
+def round_robin(names) -> list:
+    # circle method: len(names)-1 rounds (len(names) if odd, with byes) in
+    # which every team meets every other team once
+    teams = list(names)
+    if len(teams) % 2:
+        teams.append(None)
+    n = len(teams)
+    rounds = []
+    for r in range(n - 1):
+        pairs = [ (teams[i], teams[n-1-i]) for i in range(n // 2) ]
+        rounds.append([ pair for pair in pairs if None not in pair ])
+        teams.insert(1, teams.pop())
+    return rounds
+
+def make_schedule(names, games_per_team=GAMES_PER_TEAM) -> list:
+    # days of (away, home) pairs: round robins over and over until every team
+    # has its games, the team with fewer home games so far at home
+    assert len(names) > 1, "A season needs at least two teams."
+    # every game takes two teams
+    assert len(names) * games_per_team % 2 == 0, f"{len(names)} teams cannot play {games_per_team} games each."
+    rounds = round_robin(sorted(names))
+    played = Counter()
+    hosted = Counter()
+    days   = []
+    while min(played[name] for name in names) < games_per_team:
+        for pairs in rounds:
+            day = []
+            for a, b in pairs:
+                if played[a] < games_per_team and played[b] < games_per_team:
+                    away, home = (a, b) if hosted[a] >= hosted[b] else (b, a)
+                    day.append((away, home))
+                    played[a] += 1
+                    played[b] += 1
+                    hosted[home] += 1
+            if day:
+                days.append(day)
+    return days
+
+def game_seed(season_seed, day, n) -> int:
+    return random.Random(f"{season_seed}:{day}:{n}").getrandbits(64)
+
+
+class Standings:
+    # Wins, losses, runs for and against and the current streak of every
+    # team, updated one game at a time. A streak is +n for n wins in a row
+    # and -n for n losses.
+    def __init__(self, names):
+        self.wins    = { name: 0 for name in names }
+        self.losses  = { name: 0 for name in names }
+        self.scored  = { name: 0 for name in names }
+        self.allowed = { name: 0 for name in names }
+        self.streak  = { name: 0 for name in names }
+
+    def record(self, away, home, runs_away, runs_home):
+        winner, loser = (away, home) if runs_away > runs_home else (home, away)
+        self.wins[winner]   += 1
+        self.losses[loser]  += 1
+        self.streak[winner]  = self.streak[winner] + 1 if self.streak[winner] > 0 else 1
+        self.streak[loser]   = self.streak[loser] - 1 if self.streak[loser] < 0 else -1
+        self.scored[away]  += runs_away
+        self.allowed[away] += runs_home
+        self.scored[home]  += runs_home
+        self.allowed[home] += runs_away
+
+    def pct(self, name) -> float:
+        games = self.wins[name] + self.losses[name]
+        return self.wins[name] / games if games else 0
+
+    def run_differential(self, name) -> int:
+        return self.scored[name] - self.allowed[name]
+
+    def order(self) -> list:
+        return sorted(self.wins, key=lambda name: (-self.pct(name), -self.run_differential(name), name))
+
+    def leader(self):
+        return self.order()[0]
+
+    def rows(self) -> list:
+        order = self.order()
+        first = order[0]
+        rows  = []
+        for name in order:
+            games_behind = ((self.wins[first] - self.wins[name]) + (self.losses[name] - self.losses[first])) / 2
+            streak = self.streak[name]
+            rows.append([
+                name,
+                self.wins[name],
+                self.losses[name],
+                f"{self.pct(name):.3f}",
+                '-' if name == first else f"{games_behind:g}",
+                self.scored[name],
+                self.allowed[name],
+                f"{self.run_differential(name):+d}",
+                f"{'W' if streak > 0 else 'L'}{abs(streak)}" if streak else '-',
+            ])
+        return rows
+
+    def print(self):
+        print(tabulate(
+            self.rows(),
+            headers=['Team', 'W', 'L', 'Pct', 'GB', 'RS', 'RA', 'Diff', 'Strk'],
+            tablefmt='fancy_grid',
+        ))
+
+
+def init_worker(directory, box=False):
+    # `box`: keep box scores of the projected seasons
+    global _league, _box
+    _league = League(directory)
+    _box    = box
+
+def play_scheduled(task, observers=None) -> tuple:
+    away, home, seed = task
+    game = play_game((away, _league.players(away)), (home, _league.players(home)), seed=seed, observers=observers, keep_at_bats=False)
+    return game.away.runs, game.home.runs
+
+
+class Season:
+    def __init__(self, directory, games_per_team=GAMES_PER_TEAM, seed=None, checkpoint=None):
+        self.directory      = directory
+        self.league         = League(directory)
+        self.games_per_team = games_per_team
+        self.seed           = seed if seed is not None else random.getrandbits(64)
+        self.checkpoint     = checkpoint
+        self.schedule       = make_schedule(self.league.names, games_per_team)
+        self.standings      = Standings(self.league.names)
+        self.day            = 0
+
+        if checkpoint and os.path.exists(checkpoint):
+            self.resume()
+
+    @property
+    def is_over(self) -> bool:
+        return self.day == len(self.schedule)
+
+    def tasks(self, day) -> list:
+        return [
+            (away, home, game_seed(self.seed, day, n))
+            for n, (away, home) in enumerate(self.schedule[day])
+        ]
+
+    def record_day(self, results):
+        for (away, home), (runs_away, runs_home) in zip(self.schedule[self.day], results):
+            self.standings.record(away, home, runs_away, runs_home)
+        self.day += 1
+        if self.checkpoint:
+            self.save()
+
+    def play(self, workers=None, days=None):
+        # plays the rest of the season, or the next `days` days of it, one
+        # day at a time with the day's games spread over the workers
+        workers = workers or os.cpu_count() or 1
+        last    = len(self.schedule) if days is None else min(self.day + days, len(self.schedule))
+        if workers == 1:
+            init_worker(self.directory)
+            while self.day < last:
+                self.record_day([ play_scheduled(task) for task in self.tasks(self.day) ])
+        else:
+            with Pool(workers, initializer=init_worker, initargs=(self.directory,)) as pool:
+                while self.day < last:
+                    self.record_day(pool.map(play_scheduled, self.tasks(self.day)))
+        return self.standings
+
+    def state(self) -> dict:
+        return {
+            'league':         self.league.hash,
+            'games_per_team': self.games_per_team,
+            'seed':           self.seed,
+            'day':            self.day,
+            'standings':      self.standings,
+        }
+
+    def save(self):
+        # write aside and rename, so an interrupted save leaves the last one
+        tmp_filename = f"{self.checkpoint}.{os.getpid()}.tmp"
+        with open(tmp_filename, 'wb') as fh:
+            pickle.dump(self.state(), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, self.checkpoint)
+
+    def resume(self):
+        with open(self.checkpoint, 'rb') as fh:
+            state = pickle.load(fh)
+        assert state['league'] == self.league.hash, f"{self.checkpoint} is a season of other rosters."
+        assert state['games_per_team'] == self.games_per_team, f"{self.checkpoint} is a {state['games_per_team']} game season."
+        self.seed      = state['seed']
+        self.day       = state['day']
+        self.standings = state['standings']
+
+
+def play_season(task) -> tuple:
+    # a whole season in one worker, for projections: (standings, box score
+    # or None)
+    games_per_team, seed = task
+    names     = _league.names
+    standings = Standings(names)
+    box       = BoxScore() if _box else None
+    observers = [ BoxScoreKeeper(box) ] if _box else None
+    for day, pairs in enumerate(make_schedule(names, games_per_team)):
+        for n, (away, home) in enumerate(pairs):
+            standings.record(away, home, *play_scheduled((away, home, game_seed(seed, day, n)), observers))
+    return standings, box
+
+
+class Projection:
+    # How many games every team won, and how often it finished first, over
+    # many simulated seasons, and their box scores when kept.
+    def __init__(self, names):
+        self.seasons = 0
+        self.wins    = { name: Counter() for name in names }
+        self.firsts  = Counter()
+        self.box     = None
+
+    def record(self, standings: Standings, box=None):
+        self.seasons += 1
+        for name, wins in standings.wins.items():
+            self.wins[name][wins] += 1
+        self.firsts[standings.leader()] += 1
+        if box is not None:
+            self.box = self.box or BoxScore()
+            self.box.merge(box)
+
+    def mean_wins(self, name) -> float:
+        return sum(w * n for w, n in self.wins[name].items()) / self.seasons
+
+    def print_summary(self):
+        rows = [
+            [ name, f"{self.mean_wins(name):.1f}", min(self.wins[name]), max(self.wins[name]), f"{self.firsts[name] / self.seasons:.1%}" ]
+            for name in sorted(self.wins, key=self.mean_wins, reverse=True)
+        ]
+        print(f"{self.seasons} seasons")
+        print(tabulate(rows, headers=['Team', 'Mean W', 'Min W', 'Max W', 'First'], tablefmt='fancy_grid'))
+        if self.box is not None:
+            self.box.print()
+
+def project(directory, n_seasons, games_per_team=GAMES_PER_TEAM, workers=None, seed=None, box=False) -> Projection:
+    # Whole seasons are the unit of work: no checkpoints and no per-day
+    # round trips, just the games. Seeded runs match for any `workers`.
+    assert n_seasons > 0, "Project at least one season."
+    workers = workers or os.cpu_count() or 1
+    seeds   = random.Random(seed)
+    tasks   = [ (games_per_team, seeds.getrandbits(64)) for n in range(n_seasons) ]
+
+    projection = Projection(League(directory).names)
+    if workers == 1:
+        init_worker(directory, box)
+        for task in tasks:
+            projection.record(*play_season(task))
+    else:
+        with Pool(workers, initializer=init_worker, initargs=(directory, box)) as pool:
+            for standings, season_box in pool.imap_unordered(play_season, tasks):
+                projection.record(standings, season_box)
+    return projection
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play a season between all the rosters of a directory.")
+    parser.add_argument('league', help="directory with the roster files")
+    parser.add_argument('-g', '--games', type=int, default=GAMES_PER_TEAM, help="games per team")
+    parser.add_argument('-w', '--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--checkpoint', metavar='FILE', help="save after every day, and resume from it")
+    parser.add_argument('--seasons', type=int, default=None, help="project this many seasons instead")
+    parser.add_argument('--box', action='store_true', help="keep box scores of the projected seasons")
+    args = parser.parse_args()
+
+    if args.seasons:
+        project(args.league, args.seasons, args.games, workers=args.workers, seed=args.seed, box=args.box).print_summary()
+    else:
+        season = Season(args.league, args.games, seed=args.seed, checkpoint=args.checkpoint)
+        season.play(workers=args.workers).print()
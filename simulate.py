@@ -0,0 +1,226 @@
+import argparse
+from collections import Counter
+from multiprocessing import Pool
+from multiprocessing.util import Finalize
+import os
+import random
+
+from tabulate import tabulate
+
+from boxscore import BoxScore, BoxScoreKeeper
+from game import Game, Team, N_INNINGS
+import instrument
+from playlog import PlayLog
+
+
+# games per task handed to a worker; large enough to amortize the IPC,
+# small enough to keep every core busy until the end of the run
+CHUNK_SIZE = 250
+
+
+class MatchupResult:
+    # Compact, mergeable aggregates of many games between the same two teams.
+    # This is all that travels back from a worker process.
+    def __init__(self, away, home):
+        self.away = away
+        self.home = home
+
+        self.games         = 0
+        self.wins          = [0, 0]
+        self.runs          = [Counter(), Counter()]
+        self.innings       = Counter()
+        self.extra_innings = 0
+        self.stats         = None  # instrument.Stats of the profiled games
+        self.box           = None  # BoxScore, when kept
+
+    def record(self, game: Game):
+        runs = (game.away.runs, game.home.runs)
+        self.games += 1
+        self.wins[0 if runs[0] > runs[1] else 1] += 1
+        self.runs[0][runs[0]] += 1
+        self.runs[1][runs[1]] += 1
+        n_innings = len(game.innings)
+        self.innings[n_innings] += 1
+        if n_innings > N_INNINGS:
+            self.extra_innings += 1
+        if game.stats is not None:
+            self.stats = self.stats or instrument.Stats()
+            self.stats.merge(game.stats)
+
+    def merge(self, other: 'MatchupResult'):
+        self.games         += other.games
+        self.wins[0]       += other.wins[0]
+        self.wins[1]       += other.wins[1]
+        self.runs[0]       += other.runs[0]
+        self.runs[1]       += other.runs[1]
+        self.innings       += other.innings
+        self.extra_innings += other.extra_innings
+        if other.stats is not None:
+            self.stats = self.stats or instrument.Stats()
+            self.stats.merge(other.stats)
+        if other.box is not None:
+            self.box = self.box or BoxScore()
+            self.box.merge(other.box)
+        return self
+
+    def win_pct(self, side: int) -> float:
+        return self.wins[side] / self.games if self.games else 0.0
+
+    def mean_runs(self, side: int) -> float:
+        if not self.games:
+            return 0.0
+        return sum(r * n for r, n in self.runs[side].items()) / self.games
+
+    def print_summary(self):
+        rows = [
+            [name, self.wins[side], f"{self.win_pct(side):.3f}", f"{self.mean_runs(side):.2f}"]
+            for side, name in enumerate((self.away, self.home))
+        ]
+        print(tabulate(
+            rows,
+            headers=['Team', 'W', 'PCT', 'R/G'],
+            tablefmt='fancy_grid',
+        ))
+        print(f"{self.games} games, {self.extra_innings} went to extra innings.")
+        if self.box is not None:
+            self.box.print()
+        if self.stats is not None:
+            print(self.stats.report())
+
+
+def load_roster(filename):
+    team = Game().get_team_from_roster(filename)
+    return team.name, list(team.players)
+
+def play_game(roster_away, roster_home, seed=None, observers=None, keep_at_bats=True) -> Game:
+    # Teams carry per-game state, so every game gets fresh ones built around
+    # the same (stateless) players.
+    game = Game(observers=observers, seed=seed, keep_at_bats=keep_at_bats)
+    game.set_teams(Team(*roster_away), Team(*roster_home))
+    for team in game.teams:
+        team.set_lineup()
+    game.set_starting_pitchers()
+    game.play()
+    return game
+
+
+# rosters loaded once per worker process by `init_worker`
+_rosters = None
+_box     = False
+_record  = None
+_store   = None
+
+def init_worker(roster_a, roster_b, profile=None, box=False, record=None, store=None):
+    # `profile`: the fraction of games to time, if any; `box`: keep box
+    # scores; `record`: directory to store every plate appearance in;
+    # `store`: SQLite file to add the games to
+    global _rosters, _box, _record, _store
+    _box    = box
+    _record = record
+    _store  = None
+    if store:
+        from store import ResultStore
+        _store = ResultStore(store)
+        # closed as the process exits, which a pool worker does when the
+        # pool is closed and joined rather than terminated
+        Finalize(_store, _store.close, exitpriority=10)
+    if profile:
+        instrument.enable(sample=profile)
+    away = load_roster(roster_a)
+    home = load_roster(roster_b)
+    if roster_a == roster_b:
+        home = ("The Dopplegangers", home[1])
+    _rosters = away, home
+
+def chunk_game_seeds(n_games, chunk_seed):
+    seeds = random.Random(chunk_seed)
+    return [ seeds.getrandbits(64) for n in range(n_games) ]
+
+def run_chunk(task) -> MatchupResult:
+    n_games, chunk_seed = task
+    roster_away, roster_home = _rosters
+    result = MatchupResult(roster_away[0], roster_home[0])
+    observers = []
+    if _box:
+        result.box = BoxScore()
+        observers.append(BoxScoreKeeper(result.box))
+    if _record:
+        # a part of its own per task, so workers never share a file
+        from columnar import ColumnarSink
+        observers.append(PlayLog(capacity=1, sink=ColumnarSink(os.path.join(_record, f"part-{chunk_seed:020d}"))))
+    if _store:
+        observers.append(_store.recorder())
+    for seed in chunk_game_seeds(n_games, chunk_seed):
+        result.record(play_game(roster_away, roster_home, seed=seed, observers=observers, keep_at_bats=False))
+    for observer in observers:
+        if isinstance(observer, PlayLog):
+            observer.close()
+    if _store:
+        # in the database before the result is, even if the worker is then
+        # stopped
+        _store.flush()
+    return result
+
+def make_tasks(n_games, seed):
+    seeds = random.Random(seed)
+    tasks = []
+    while n_games > 0:
+        n = min(CHUNK_SIZE, n_games)
+        tasks.append((n, seeds.getrandbits(64)))
+        n_games -= n
+    return tasks
+
+def game_seed(n_games, seed, index) -> int:
+    # the seed game number `index` of a seeded run was played with, to replay it
+    n, chunk_seed = make_tasks(n_games, seed)[index // CHUNK_SIZE]
+    return chunk_game_seeds(n, chunk_seed)[index % CHUNK_SIZE]
+
+def simulate_matchup(roster_a, roster_b, n_games, workers=None, seed=None, profile=None, box=False, record=None, store=None) -> MatchupResult:
+    # Tasks and their seeds depend only on `n_games` and `seed`, so a seeded
+    # run gives the same totals no matter how many workers share it.
+    assert n_games > 0, "Simulate at least one game."
+    workers = workers or os.cpu_count() or 1
+    tasks   = make_tasks(n_games, seed)
+
+    if workers == 1:
+        init_worker(roster_a, roster_b, profile, box, record, store)
+        try:
+            results = [ run_chunk(task) for task in tasks ]
+        finally:
+            if profile:
+                instrument.disable()
+            if _store:
+                _store.close()
+    else:
+        with Pool(workers, initializer=init_worker, initargs=(roster_a, roster_b, profile, box, record, store)) as pool:
+            results = list(pool.imap_unordered(run_chunk, tasks))
+            pool.close()
+            pool.join()
+
+    total, *rest = results
+    for result in rest:
+        total.merge(result)
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate many games between two rosters.")
+    parser.add_argument('roster_a', help="roster file of the visiting team")
+    parser.add_argument('roster_b', help="roster file of the home team")
+    parser.add_argument('-n', '--games', type=int, default=1000)
+    parser.add_argument('-w', '--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--engine', choices=['object', 'batch'], default='object')
+    parser.add_argument('--profile', type=float, nargs='?', const=1.0, default=None, metavar='SAMPLE',
+                        help="time the hot paths of this fraction of the games (all by default) and report them")
+    parser.add_argument('--box', action='store_true', help="keep box scores of every player and team")
+    parser.add_argument('--record', metavar='DIR', help="store every plate appearance in columnar logs under DIR")
+    parser.add_argument('--store', metavar='FILE', help="add every game and plate appearance to a SQLite database")
+    args = parser.parse_args()
+
+    if args.engine == 'batch':
+        from batch import simulate_batch
+        result = simulate_batch(args.roster_a, args.roster_b, args.games, seed=args.seed)
+    else:
+        result = simulate_matchup(args.roster_a, args.roster_b, args.games, workers=args.workers, seed=args.seed, profile=args.profile, box=args.box, record=args.record, store=args.store)
+    result.print_summary()
@@ -0,0 +1,380 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+
+from game import Game
+from league import League
+from observers import Observer
+
+
+# Hosts many games at once and streams them to any number of viewers over TCP
+# or a unix socket, as newline-delimited JSON messages:
+#
+#   hello     snapshots of every game, sent on connect
+#   start     a game started
+#   play      one plate appearance, with only the scoreboard values it changed
+#   final     a game is over
+#   snapshot  every game again, after a viewer fell behind and missed plays
+#   done      every game is over; the server hangs up
+#
+# A viewer can send {"watch": [game, ...]} at any time to only get those games.
+#
+# Games never wait for viewers. Every viewer has a bounded queue; a viewer that
+# fills it stops getting plays until it has caught up, then gets a snapshot.
+# Nor does the end of the games: a viewer still not done `CLOSE_SECS` after
+# them is cut off.
+
+PACE_SECS  = 0.5
+QUEUE_SIZE = 256
+CLOSE_SECS = 5.0
+PORT       = 7575
+
+
+def encode(message) -> bytes:
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+DONE = encode({ 'type': 'done' })
+
+def scoreboard(game: Game) -> dict:
+    linescore = game.linescore
+    return {
+        'runs':    list(linescore.runs),
+        'hits':    list(linescore.hits),
+        'errors':  list(linescore.errors),
+        'innings': [ list(innings) for innings in linescore.innings ],
+    }
+
+def scoreboard_delta(before: dict, after: dict) -> dict:
+    delta = { key: after[key] for key in ('runs', 'hits', 'errors') if after[key] != before[key] }
+    # inning cells as [side, inning, runs]
+    cells = [
+        [ side, n+1, runs ]
+        for side in (0, 1)
+        for n, runs in enumerate(after['innings'][side])
+        if n >= len(before['innings'][side]) or before['innings'][side][n] != runs
+    ]
+    if cells:
+        delta['innings'] = cells
+    return delta
+
+def snapshot(game_id, game: Game) -> dict:
+    message = {
+        'game':   game_id,
+        'away':   game.away.name,
+        'home':   game.home.name,
+        'seed':   game.seed,
+        'inning': 0,
+        'half':   0,
+        'outs':   0,
+        'bases':  [ None, None, None ],
+        **scoreboard(game),
+    }
+    if game.innings:
+        half = game.inning.half
+        message.update(
+            inning = game.inning.number,
+            half   = half.side,
+            outs   = half.outs,
+            bases  = [ player.number if player else None for player in game.bases ],
+        )
+    return message
+
+
+class Feed(Observer):
+    # Turns one game's hooks into messages for the server.
+    def __init__(self, server, game_id):
+        self.server     = server
+        self.game_id    = game_id
+        self.scoreboard = None
+
+    def game_started(self, game):
+        self.scoreboard = scoreboard(game)
+        self.server.publish(self.game_id, {
+            'type': 'start',
+            'game': self.game_id,
+            'away': game.away.name,
+            'home': game.home.name,
+            'seed': game.seed,
+        })
+
+    def at_bat_finished(self, at_bat):
+        game  = at_bat.game
+        after = scoreboard(game)
+        self.server.publish(self.game_id, {
+            'type':    'play',
+            'game':    self.game_id,
+            'inning':  at_bat.half.inning.number,
+            'half':    at_bat.half.side,
+            'batter':  at_bat.batter.name,
+            'pitcher': at_bat.pitcher.name,
+            'result':  at_bat.result,
+            'outs':    at_bat.half.outs,
+            'bases':   [ player.number if player else None for player in game.bases ],
+            'delta':   scoreboard_delta(self.scoreboard, after),
+        })
+        self.scoreboard = after
+
+    def game_finished(self, game):
+        self.server.publish(self.game_id, {
+            'type':    'final',
+            'game':    self.game_id,
+            'runs':    list(game.linescore.runs),
+            'innings': len(game.innings),
+        })
+
+
+class Viewer:
+    # One connected client and its queue of encoded messages.
+    def __init__(self, writer, queue_size=QUEUE_SIZE):
+        self.writer  = writer
+        self.queue   = asyncio.Queue(queue_size)
+        self.watch   = None  # every game
+        self.lagging = False
+        self.dropped = 0
+
+    def offer(self, game_id, data: bytes):
+        if self.watch is not None and game_id is not None and game_id not in self.watch:
+            return
+        if self.lagging:
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.lagging  = True
+            self.dropped += 1
+
+    def finish(self):
+        # `done` always gets in, in place of the oldest message if need be
+        while True:
+            try:
+                self.queue.put_nowait(DONE)
+                return
+            except asyncio.QueueFull:
+                self.queue.get_nowait()
+                self.dropped += 1
+
+
+class SpectatorServer:
+    def __init__(self, games, pace_secs=PACE_SECS, queue_size=QUEUE_SIZE, close_secs=CLOSE_SECS):
+        # `games` are ready to play: teams, lineups and pitchers set
+        self.games      = list(games)
+        self.pace_secs  = pace_secs
+        self.queue_size = queue_size
+        self.close_secs = close_secs
+        self.viewers    = set()
+        self._servers   = []
+        self._handlers  = set()
+        self._finished  = False
+        for game_id, game in enumerate(self.games):
+            game.add_observer(Feed(self, game_id))
+
+    def publish(self, game_id, message):
+        # called from the games: never blocks, whatever the viewers do
+        data = encode(message)
+        for viewer in self.viewers:
+            viewer.offer(game_id, data)
+
+    def snapshots(self) -> list:
+        return [ snapshot(game_id, game) for game_id, game in enumerate(self.games) ]
+
+    async def listen_tcp(self, host='127.0.0.1', port=PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        self._servers.append(server)
+        return server
+
+    async def listen_unix(self, path):
+        server = await asyncio.start_unix_server(self.handle, path)
+        self._servers.append(server)
+        return server
+
+    async def play_game(self, game):
+        for at_bat in game.steps():
+            # also lets the other games and the viewers have a turn
+            await asyncio.sleep(self.pace_secs)
+
+    async def run(self):
+        # plays every game to the end, then says goodbye to the viewers
+        await asyncio.gather(*[ self.play_game(game) for game in self.games ])
+        self._finished = True
+        for viewer in list(self.viewers):
+            viewer.finish()
+        if self._handlers:
+            done, stalled = await asyncio.wait(set(self._handlers), timeout=self.close_secs)
+            for handler in stalled:
+                handler.cancel()
+            await asyncio.gather(*stalled, return_exceptions=True)
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+
+    async def handle(self, reader, writer):
+        viewer = Viewer(writer, self.queue_size)
+        writer.write(encode({ 'type': 'hello', 'games': self.snapshots() }))
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        try:
+            if self._finished:
+                writer.write(DONE)
+            else:
+                self.viewers.add(viewer)
+                sending   = asyncio.create_task(self.send(viewer))
+                listening = asyncio.create_task(self.listen(reader, viewer))
+                # done when the games are, or when the viewer hangs up
+                try:
+                    await asyncio.wait({ sending, listening }, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for task in (sending, listening):
+                        task.cancel()
+                    self.viewers.discard(viewer)
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+        except asyncio.CancelledError:
+            # cut off at the end: the viewer stopped reading, so nothing
+            # more can be written to it
+            writer.transport.abort()
+            raise
+        finally:
+            self._handlers.discard(handler)
+
+    async def listen(self, reader, viewer):
+        async for line in reader:
+            try:
+                request = json.loads(line)
+                viewer.watch = set(request['watch'])
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    async def send(self, viewer):
+        writer = viewer.writer
+        try:
+            while True:
+                data = await viewer.queue.get()
+                writer.write(data)
+                await writer.drain()
+                if data is DONE:
+                    return
+                if viewer.lagging and viewer.queue.empty():
+                    # caught up: everything it missed is in the snapshot
+                    writer.write(encode({ 'type': 'snapshot', 'dropped': viewer.dropped, 'games': self.snapshots() }))
+                    await writer.drain()
+                    viewer.lagging = False
+                    viewer.dropped = 0
+        except ConnectionError:
+            pass
+
+
+def make_games(league: League, n_games, seed=None) -> list:
+    # pairs teams of the league, every one in turn, with random home teams
+    picks = random.Random(seed)
+    names = league.names
+    games = []
+    for n in range(n_games):
+        away, home = picks.sample(names, 2) if len(names) > 1 else (names[0], names[0])
+        game = Game(seed=picks.getrandbits(64))
+        game.set_teams(league.team(away), league.team(home))
+        if away == home:
+            game.home.name = "The Dopplegangers"
+        for team in game.teams:
+            team.set_lineup()
+        game.set_starting_pitchers()
+        games.append(game)
+    return games
+
+
+def apply_delta(snap: dict, delta: dict):
+    # the inverse of `scoreboard_delta`, one inning cell at a time
+    for key in ('runs', 'hits', 'errors'):
+        if key in delta:
+            snap[key] = delta[key]
+    innings = snap.setdefault('innings', [[], []])
+    for side, n, runs in delta.get('innings', ()):
+        cells = innings[side]
+        cells.extend([0] * (n - len(cells)))
+        cells[n-1] = runs
+
+def describe(message, games) -> str:
+    # one line of text for a message, keeping `games` (id -> snapshot) current
+    kind = message['type']
+    if kind in ('hello', 'snapshot'):
+        for snap in message['games']:
+            games[snap['game']] = snap
+        missed = f" ({message['dropped']} plays missed)" if kind == 'snapshot' else ''
+        return f"{len(message['games'])} games{missed}"
+    if kind == 'done':
+        return "All games are over."
+
+    game = games.setdefault(message['game'], { 'away': message.get('away'), 'home': message.get('home'), 'runs': [0, 0], 'innings': [[], []] })
+    title = f"[{message['game']:>3}] {game['away']} @ {game['home']}"
+    if kind == 'start':
+        game.update(away=message['away'], home=message['home'], runs=[0, 0], innings=[[], []])
+        return f"[{message['game']:>3}] {message['away']} @ {message['home']}: play ball!"
+    if kind == 'final':
+        game['runs'] = message['runs']
+        return f"{title}: final {message['runs'][0]}-{message['runs'][1]} in {message['innings']}"
+    apply_delta(game, message['delta'])
+    half = 'T' if message['half'] == 0 else 'B'
+    return f"{title} {half}{message['inning']} {game['runs'][0]}-{game['runs'][1]}: {message['batter']} {message['result']}"
+
+async def watch(reader, writer, watching=None, out=sys.stdout):
+    if watching:
+        writer.write(encode({ 'watch': watching }))
+        await writer.drain()
+    games = {}
+    async for line in reader:
+        message = json.loads(line)
+        print(describe(message, games), file=out)
+        if message['type'] == 'done':
+            break
+    writer.close()
+
+
+async def serve(args):
+    server = SpectatorServer(make_games(League(args.league), args.games, args.seed), args.pace)
+    if args.unix:
+        await server.listen_unix(args.unix)
+        print(f"Serving {args.games} games on {args.unix}")
+    else:
+        await server.listen_tcp(args.host, args.port)
+        print(f"Serving {args.games} games on {args.host}:{args.port}")
+    if args.wait:
+        await asyncio.sleep(args.wait)
+    await server.run()
+
+async def connect(args):
+    if args.unix:
+        reader, writer = await asyncio.open_unix_connection(args.unix)
+    else:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+    await watch(reader, writer, args.game)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play many games at once and watch them from other terminals.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help="host the games")
+    serve_parser.add_argument('league', help="directory with the roster files")
+    serve_parser.add_argument('-g', '--games', type=int, default=12, help="number of games")
+    serve_parser.add_argument('--pace', type=float, default=PACE_SECS, help="seconds between plate appearances of a game")
+    serve_parser.add_argument('--wait', type=float, default=0, help="seconds to wait for viewers before the first pitch")
+    serve_parser.add_argument('--seed', type=int, default=None, help="seed for the pairings and the games")
+
+    watch_parser = commands.add_parser('watch', help="watch the games")
+    watch_parser.add_argument('game', type=int, nargs='*', help="only watch these games")
+
+    for command in (serve_parser, watch_parser):
+        command.add_argument('--host', default='127.0.0.1')
+        command.add_argument('--port', type=int, default=PORT)
+        command.add_argument('--unix', metavar='PATH', help="use a unix socket instead of TCP")
+
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args) if args.command == 'serve' else connect(args))
+    except KeyboardInterrupt:
+        pass
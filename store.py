@@ -0,0 +1,263 @@
+import argparse
+import pathlib
+import queue
+import sqlite3
+import threading
+
+from tabulate import tabulate
+
+from enums import SwingResult
+from observers import Observer
+
+
+# Game and plate appearance results in a SQLite database. Games are handed to
+# a writer thread through a bounded queue; the thread takes whatever games are
+# waiting, up to `batch_games`, and inserts them in one transaction, so the
+# simulator only ever waits when the writer is a whole queue behind. The
+# database is in WAL mode, so queries can run while it is written, and the
+# writers of several worker processes take turns on the same file.
+
+QUEUE_SIZE   = 256
+BATCH_GAMES  = 64
+BUSY_TIMEOUT = 60_000  # ms a writer waits for another to finish its transaction
+
+# runners on second and/or third
+SCORING_POSITION = tuple( mask for mask in range(8) if mask & 0b110 )
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id        INTEGER PRIMARY KEY,
+    seed      TEXT    NOT NULL,  -- 64-bit unsigned, too big for an INTEGER
+    away      TEXT    NOT NULL,
+    home      TEXT    NOT NULL,
+    runs_away INTEGER NOT NULL,
+    runs_home INTEGER NOT NULL,
+    hits_away INTEGER NOT NULL,
+    hits_home INTEGER NOT NULL,
+    innings   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS plate_appearances (
+    game         INTEGER NOT NULL REFERENCES games(id),
+    inning       INTEGER NOT NULL,
+    half         INTEGER NOT NULL,
+    batting      TEXT    NOT NULL,
+    fielding     TEXT    NOT NULL,
+    batter       TEXT    NOT NULL,
+    pitcher      TEXT    NOT NULL,
+    outs_before  INTEGER NOT NULL,
+    bases_before INTEGER NOT NULL,
+    pitch        INTEGER NOT NULL,
+    swing        INTEGER NOT NULL,
+    mss          INTEGER NOT NULL,
+    result       INTEGER NOT NULL,
+    play         TEXT    NOT NULL,
+    outs_after   INTEGER NOT NULL,
+    bases_after  INTEGER NOT NULL,
+    runs         INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pa_batter   ON plate_appearances (batter, pitcher);
+CREATE INDEX IF NOT EXISTS pa_pitcher  ON plate_appearances (pitcher);
+CREATE INDEX IF NOT EXISTS pa_batting  ON plate_appearances (batting);
+CREATE INDEX IF NOT EXISTS pa_fielding ON plate_appearances (fielding);
+CREATE INDEX IF NOT EXISTS pa_state    ON plate_appearances (bases_before, outs_before);
+CREATE INDEX IF NOT EXISTS games_teams ON games (away, home);
+CREATE INDEX IF NOT EXISTS games_home  ON games (home);
+"""
+
+INSERT_GAME = "INSERT INTO games (seed, away, home, runs_away, runs_home, hits_away, hits_home, innings) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+INSERT_PA   = "INSERT INTO plate_appearances VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+def connect(filename, readonly=False) -> sqlite3.Connection:
+    if readonly:
+        # neither creates the file nor changes its journal mode
+        uri = pathlib.Path(filename).absolute().as_uri() + '?mode=ro'
+        connection = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT / 1000, isolation_level=None, check_same_thread=False)
+    else:
+        connection = sqlite3.connect(filename, timeout=BUSY_TIMEOUT / 1000, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+class ResultStore:
+    # `readonly` only queries an existing store: no schema, no writer thread.
+    def __init__(self, filename, queue_size=QUEUE_SIZE, batch_games=BATCH_GAMES, readonly=False):
+        self.filename    = filename
+        self.batch_games = batch_games
+        self.readonly    = readonly
+
+        self._reader = connect(filename, readonly)
+        self._queue  = queue.Queue(queue_size)
+        self._error  = None
+        self._writer = None
+        if not readonly:
+            self._reader.executescript(SCHEMA)
+            self._writer = threading.Thread(target=self._write, name='store-writer', daemon=True)
+            self._writer.start()
+
+    def _write(self):
+        connection = connect(self.filename)
+        while True:
+            games = [ self._queue.get() ]
+            while games[-1] is not None and len(games) < self.batch_games:
+                try:
+                    games.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            done = games[-1] is None
+            if done:
+                games.pop()
+            try:
+                if games and self._error is None:
+                    connection.execute('BEGIN IMMEDIATE')
+                    for game, plate_appearances in games:
+                        game_id = connection.execute(INSERT_GAME, game).lastrowid
+                        connection.executemany(INSERT_PA, [ (game_id, *pa) for pa in plate_appearances ])
+                    connection.execute('COMMIT')
+            except sqlite3.Error as e:
+                # kept for the simulator's thread, which raises it on its next call
+                self._error = e
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+            finally:
+                for n in range(len(games) + done):
+                    self._queue.task_done()
+            if done:
+                connection.close()
+                return
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+    def record(self, game: tuple, plate_appearances: list):
+        # waits only when the queue is full
+        assert not self.readonly, f"{self.filename} is open read-only."
+        self._check()
+        self._queue.put((game, plate_appearances))
+
+    def flush(self):
+        # until everything recorded so far is in the database
+        self._queue.join()
+        self._check()
+
+    def close(self):
+        # more than once is fine
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._reader.close()
+        self._check()
+
+    def recorder(self) -> 'StoreRecorder':
+        return StoreRecorder(self)
+
+    def plate_appearances(self, batter=None, pitcher=None, team=None, bases=None, outs=None, risp=False, limit=None) -> list:
+        # Plate appearances matching every filter given: `team` is the
+        # batting team, `bases` a base mask or several, `risp` runners in
+        # scoring position before the play.
+        where, args = [], []
+        for column, value in (('batter', batter), ('pitcher', pitcher), ('batting', team), ('outs_before', outs)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                args.append(value)
+        if risp:
+            bases = SCORING_POSITION if bases is None else tuple(set(SCORING_POSITION) & set(as_tuple(bases)))
+        if bases is not None:
+            bases = as_tuple(bases)
+            where.append(f"bases_before IN ({', '.join('?' * len(bases))})")
+            args.extend(bases)
+        sql = "SELECT * FROM plate_appearances"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY game, rowid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return self._reader.execute(sql, args).fetchall()
+
+    def games(self, team=None) -> list:
+        if team is None:
+            return self._reader.execute("SELECT * FROM games ORDER BY id").fetchall()
+        return self._reader.execute("SELECT * FROM games WHERE away = ? OR home = ? ORDER BY id", (team, team)).fetchall()
+
+    def batting_line(self, batter, pitcher=None, risp=False) -> dict:
+        # PA, hits, walks and runs scored on the plays of `batter`, against
+        # `pitcher` if given
+        rows = self.plate_appearances(batter=batter, pitcher=pitcher, risp=risp)
+        hits = (SwingResult.ORDINARY_HIT, SwingResult.CRITICAL_HIT)
+        return {
+            'pa':   len(rows),
+            'h':    sum(1 for row in rows if row['result'] in hits and row['play'] != "GREAT PLAY"),
+            'bb':   sum(1 for row in rows if row['result'] == SwingResult.WALK),
+            'runs': sum(row['runs'] for row in rows),
+        }
+
+
+def as_tuple(value) -> tuple:
+    return tuple(value) if isinstance(value, (list, tuple, set, frozenset)) else (value,)
+
+
+class StoreRecorder(Observer):
+    # Collects a game's plate appearances and hands the whole game to the
+    # store once it is over.
+    def __init__(self, store: ResultStore):
+        self.store = store
+        self._plate_appearances = []
+        self._outs = 0
+
+    def game_started(self, game):
+        self._plate_appearances = []
+
+    def at_bat_started(self, at_bat):
+        self._outs = at_bat.half.outs
+
+    def at_bat_finished(self, at_bat):
+        half = at_bat.half
+        self._plate_appearances.append((
+            half.inning.number,
+            half.side,
+            half.batting.name,
+            half.fielding.name,
+            at_bat.batter.name,
+            at_bat.pitcher.name,
+            self._outs,
+            at_bat.bases_before,
+            at_bat.pitch,
+            at_bat.swing,
+            at_bat.mss,
+            int(at_bat.swing_result),
+            at_bat.result,
+            half.outs,
+            at_bat.game.bases.mask,
+            len(at_bat.scored),
+        ))
+
+    def game_finished(self, game):
+        score = game.linescore
+        self.store.record(
+            (str(game.seed), game.away.name, game.home.name, score.runs[0], score.runs[1], score.hits[0], score.hits[1], len(game.innings)),
+            self._plate_appearances,
+        )
+        self._plate_appearances = []
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Query the plate appearances of a results store.")
+    parser.add_argument('database', help="SQLite file written by `simulate.py --store`")
+    parser.add_argument('--batter')
+    parser.add_argument('--pitcher')
+    parser.add_argument('--team', help="batting team")
+    parser.add_argument('--risp', action='store_true', help="only with runners in scoring position")
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    store = ResultStore(args.database, readonly=True)
+    try:
+        rows = store.plate_appearances(batter=args.batter, pitcher=args.pitcher, team=args.team, risp=args.risp, limit=args.limit)
+        columns = ['game', 'inning', 'half', 'batter', 'pitcher', 'outs_before', 'bases_before', 'mss', 'play', 'runs']
+        print(tabulate([ [ row[c] for c in columns ] for row in rows ], headers=columns, tablefmt='fancy_grid'))
+    finally:
+        store.close()
@@ -1,31 +1,110 @@
+from functools import lru_cache
+
+from enums import HitResult, PitcherDice, SwingResult
 from events import *
 
 
+# highest possible MSS: a d100 swing plus the biggest pitcher die
+MAX_MSS = 100 + max(int(pd.name.split('d')[1]) for pd in PitcherDice)
+
+
+
+# d20 roll on the Hit Table -> hit result, indexed by roll - 1
+HIT_TABLE = (
+    HitResult.SINGLE,
+    HitResult.SINGLE,
+    HitResult.SINGLE_DEF_1B,
+    HitResult.SINGLE_DEF_2B,
+    HitResult.SINGLE_DEF_3B,
+    HitResult.SINGLE_DEF_SS,
+    HitResult.SINGLE,
+    HitResult.SINGLE,
+    HitResult.SINGLE,
+    HitResult.SINGLE_ADVANCE_2,
+    HitResult.SINGLE_ADVANCE_2,
+    HitResult.SINGLE_ADVANCE_2,
+    HitResult.SINGLE_ADVANCE_2,
+    HitResult.SINGLE_ADVANCE_2,
+    HitResult.DOUBLE_DEF_LF,
+    HitResult.DOUBLE_DEF_CF,
+    HitResult.DOUBLE_DEF_RF,
+    HitResult.DOUBLE_ADVANCE_3,
+    HitResult.HOME_RUN,
+    HitResult.HOME_RUN,
+)
+
+# events of each hit result, built once and shared by every caller
+HIT_EVENTS = {
+    HitResult.SINGLE          : ( Single(), ),
+    HitResult.SINGLE_DEF_1B   : ( Single(), DefChance(Positions['1B']) ),
+    HitResult.SINGLE_DEF_2B   : ( Single(), DefChance(Positions['2B']) ),
+    HitResult.SINGLE_DEF_3B   : ( Single(), DefChance(Positions['3B']) ),
+    HitResult.SINGLE_DEF_SS   : ( Single(), DefChance(Positions['SS']) ),
+    HitResult.SINGLE_ADVANCE_2: ( Single(), RunnersAdvance(2) ),
+    HitResult.DOUBLE_DEF_LF   : ( Double(), DefChance(Positions['LF']) ),
+    HitResult.DOUBLE_DEF_CF   : ( Double(), DefChance(Positions['CF']) ),
+    HitResult.DOUBLE_DEF_RF   : ( Double(), DefChance(Positions['RF']) ),
+    HitResult.DOUBLE_ADVANCE_3: ( Double(), RunnersAdvance(3) ),
+    HitResult.HOME_RUN        : ( HomeRun(), ),
+}
+
+# bases the batter takes on each hit result
+HIT_BASES = {
+    HitResult.SINGLE          : 1,
+    HitResult.SINGLE_DEF_1B   : 1,
+    HitResult.SINGLE_DEF_2B   : 1,
+    HitResult.SINGLE_DEF_3B   : 1,
+    HitResult.SINGLE_DEF_SS   : 1,
+    HitResult.SINGLE_ADVANCE_2: 1,
+    HitResult.DOUBLE_DEF_LF   : 2,
+    HitResult.DOUBLE_DEF_CF   : 2,
+    HitResult.DOUBLE_DEF_RF   : 2,
+    HitResult.DOUBLE_ADVANCE_3: 2,
+    HitResult.HOME_RUN        : 4,
+}
+
+def _advance(mask, n, r):
+    # the batter takes n bases and every runner r (at least n); base index 3
+    # is the batter
+    r = max(r, n)
+    moves, scored = [], []
+    for base in (2, 1, 0):
+        if mask & (1 << base):
+            if base + r > 2:
+                scored.append(base)
+            else:
+                moves.append((base, base + r))
+    if n > 3:
+        scored.append(3)
+    new_mask = 0
+    for frm, to in moves:
+        new_mask |= 1 << to
+    if 1 <= n <= 3:
+        new_mask |= 1 << (n-1)
+    return new_mask, len(scored), tuple(moves), tuple(scored)
+
+# Base state transitions. Bases are a 3-bit mask, bit n-1 set when a runner is
+# on base n. PLAY_ADVANCE[mask][n][r] = (new mask, runs, moves, scored) when
+# the batter takes n bases and every runner r bases, e.g. a single with the
+# runners advancing two: `moves` are the (from, to) base indexes of runners
+# still on base, and `scored` the indexes of those who came home, the batter
+# being index 3. BASE_ADVANCE[mask][n] is everyone moving n bases.
+PLAY_ADVANCE = tuple(
+    tuple( tuple( _advance(mask, n, r) for r in range(5) ) for n in range(5) )
+    for mask in range(8)
+)
+BASE_ADVANCE = tuple(
+    tuple( PLAY_ADVANCE[mask][n][n] for n in range(5) )
+    for mask in range(8)
+)
+
 def hit_table(n):
-    if 1 <= n <= 2:
-        return [ Single() ]
-    elif n == 3:
-        return [ Single(), DefChance(Positions['1B']) ]
-    elif n == 4:
-        return [ Single(), DefChance(Positions['2B']) ]
-    elif n == 5:
-        return [ Single(), DefChance(Positions['3B']) ]
-    elif n == 6:
-        return [ Single(), DefChance(Positions['SS']) ]
-    elif 7 <= n <= 9:
-        return [ Single() ]
-    elif 10 <= n <= 14:
-        return [ Single(), RunnersAdvance(2) ]
-    elif n == 15:
-        return [ Double(), DefChance(Positions['LF']) ]
-    elif n == 16:
-        return [ Double(), DefChance(Positions['CF']) ]
-    elif n == 17:
-        return [ Double(), DefChance(Positions['RF']) ]
-    elif n == 18:
-        return [ Double(), RunnersAdvance(3) ]
-    if 19 <= n <= 20:
-        return [ HomeRun() ]
+    return HIT_EVENTS[HIT_TABLE[n-1]]
+
+@lru_cache(maxsize=None)
+def shifted_hit_table(mod=0) -> tuple:
+    # events of each d20 roll, indexed by roll - 1, when `mod` is added to it
+    return tuple( hit_table(min(len(HIT_TABLE), max(1, n + mod))) for n in range(1, len(HIT_TABLE)+1) )
 
 def swing_result_table(bt, obt, mss):
     if mss == 1 or mss == 99:
@@ -59,3 +138,14 @@ def swing_result_table(bt, obt, mss):
     elif mss >= 100:
         return 'Out'
         # Out. Runners cannot advance on fly ball. Possible triple play.
+
+
+@lru_cache(maxsize=None)
+def swing_results(bt, obt):
+    # `swing_result_table` compiled for one (BT, OBT) pair into a tuple of
+    # `SwingResult` codes indexed by MSS. Players with equal BT and OBT share it.
+    results = [ swing_result_table(bt, obt, max(1, mss)) for mss in range(MAX_MSS+1) ]
+    return tuple(
+        SwingResult[result.upper().replace(' ', '_')]
+        for result in results
+    )
@@ -1,6 +1,22 @@
+from collections import Counter
+from fractions import Fraction
+import os
+import random
+import shutil
+import sqlite3
+
+import numpy as np
 import pytest
 
-from game import Game, roll
+import markov
+import odds
+from conftest import make_position_player
+import dice
+from enums import PitcherDice, Positions
+from game import Game, Team, roll
+from observers import Observer
+from simulate import simulate_matchup
+import tables
 
 
 def test__retired_player_is_available(empty_team, player):
@@ -48,6 +64,8 @@ def test__lineup(team):
 
     # set custom order
     team.set_lineup(numbers=[1, 2, 3, 7, 8, 9, 4, 5, 6])
+    assert team.lineup == [ team.get_player_by_number(n) for n in (1, 2, 3, 7, 8, 9, 4, 5, 6) ]
+    assert team.lineup == team.lineup and team.lineup != None
 
 def test__get_team_from_roster():
     game = Game()
@@ -57,6 +75,7 @@ def test__get_team_from_roster():
 
 def test__game_ready__bases_empty(game_ready):
     assert game_ready.bases == [None, None, None]
+    assert game_ready.bases != None and game_ready.bases != 0
 
 def test__game_ready__bases_clear(game_ready):
     game_ready.bases.clear()
@@ -145,3 +164,1126 @@ def test__base_queue__bases_loaded__home_run(game_ready):
     g.home_run()
     assert g.bases == [None, None, None]
     assert g.inning.half.runs == 4
+
+def test__headless_game__no_rendering(roster_game, monkeypatch):
+    def forbidden(*args, **kwargs):
+        raise AssertionError("headless games must not render or sleep")
+    monkeypatch.setattr('os.system', forbidden)
+    monkeypatch.setattr('time.sleep', forbidden)
+    monkeypatch.setattr('builtins.print', forbidden)
+
+    g = roster_game
+    assert g.headless
+    g.play()
+    assert len(g.innings) >= 9
+    assert g.away.runs != g.home.runs
+
+def test__observer__hooks_called(roster_game):
+    calls = Counter()
+
+    class Recorder(Observer):
+        def game_started(self, game):
+            calls['game_started'] += 1
+        def half_started(self, half):
+            calls['half_started'] += 1
+        def at_bat_started(self, at_bat):
+            calls['at_bat_started'] += 1
+        def at_bat_finished(self, at_bat):
+            assert at_bat.result is not None
+            calls['at_bat_finished'] += 1
+        def game_finished(self, game):
+            calls['game_finished'] += 1
+
+    g = roster_game
+    g.add_observer(Recorder())
+    assert not g.headless
+    g.play()
+    n_at_bats = sum(len(half.at_bats) for inning in g.innings for half in inning.halfs)
+    assert calls['game_started'] == calls['game_finished'] == 1
+    assert calls['half_started'] == 2 * len(g.innings)
+    assert calls['at_bat_started'] == calls['at_bat_finished'] == n_at_bats
+
+def test__simulate_matchup__aggregates():
+    result = simulate_matchup('roster__denver_dingers.csv', 'roster__diamond_dogs.csv', 20, workers=1, seed=1)
+    assert result.games == 20
+    assert sum(result.wins) == 20
+    assert sum(result.runs[0].values()) == sum(result.runs[1].values()) == 20
+    assert sum(result.innings.values()) == 20
+    assert result.extra_innings == sum(n for i, n in result.innings.items() if i > 9)
+
+def test__simulate_matchup__seeded_runs_match_across_workers():
+    args = ('roster__denver_dingers.csv', 'roster__diamond_dogs.csv', 30)
+    serial   = simulate_matchup(*args, workers=1, seed=7)
+    parallel = simulate_matchup(*args, workers=2, seed=7)
+    assert serial.wins == parallel.wins
+    assert serial.runs == parallel.runs
+    assert serial.innings == parallel.innings
+
+def test__boxscore__running_stat_merges():
+    from boxscore import Histogram, RunningStat
+    values = [ (v * 7) % 13 for v in range(200) ]
+    whole, left, right = RunningStat(), RunningStat(), RunningStat()
+    for n, v in enumerate(values):
+        whole.add(v)
+        (left if n < 70 else right).add(v)
+    left.merge(right)
+    mean = sum(values) / len(values)
+    assert left.n == whole.n == 200
+    assert left.mean == pytest.approx(mean) and whole.mean == pytest.approx(mean)
+    assert left.variance == pytest.approx(sum((v - mean) ** 2 for v in values) / 199)
+    assert (left.min, left.max) == (0, 12)
+
+    histogram = Histogram(5)
+    for v in (0, 1, 1, 2, 9):
+        histogram.add(v)
+    assert histogram.counts == [1, 2, 1, 0, 1]
+    assert histogram.quantile(0.5) == 1
+
+def test__boxscore__matches_linescore(roster_game):
+    from boxscore import BoxScore, BoxScoreKeeper
+    g = roster_game
+    box = BoxScore()
+    g.add_observer(BoxScoreKeeper(box))
+    g.play()
+    n_at_bats = sum(len(half.at_bats) for inning in g.innings for half in inning.halfs)
+    for side, team in enumerate(g.teams):
+        lines = [ line for (name, number), line in box.players.items() if name == team.name ]
+        assert sum(line.pa for line in lines) == sum(len(inning.halfs[side].at_bats) for inning in g.innings if len(inning.halfs) > side)
+        assert sum(line.h for line in lines) == g.linescore.hits[side]
+        assert sum(line.r for line in lines) == g.linescore.runs[side]
+        assert sum(line.pa for line in lines) == sum(line.h + line.bb + line.outs for line in lines)
+        assert box.teams[team.name].runs.mean == g.linescore.runs[side]
+    assert sum(line.pa for line in box.players.values()) == n_at_bats
+
+def test__game__drops_played_at_bats(roster_game):
+    g = roster_game
+    g.keep_at_bats = False
+    g.play()
+    for inning in g.innings:
+        for half in inning.halfs:
+            assert len(half.at_bats) == 1 and half.n_at_bats >= 3
+
+def test__simulate_matchup__box_scores_merge():
+    args = ('roster__denver_dingers.csv', 'roster__diamond_dogs.csv', 30)
+    serial   = simulate_matchup(*args, workers=1, seed=7, box=True)
+    parallel = simulate_matchup(*args, workers=2, seed=7, box=True)
+    assert serial.box.teams.keys() == parallel.box.teams.keys()
+    for name, line in serial.box.teams.items():
+        assert line.runs.n == 30
+        assert line.runs.mean == pytest.approx(parallel.box.teams[name].runs.mean)
+        assert line.runs_histogram.counts == parallel.box.teams[name].runs_histogram.counts
+    assert { k: l.rbi for k, l in serial.box.players.items() } == { k: l.rbi for k, l in parallel.box.players.items() }
+    assert simulate_matchup(*args, workers=1, seed=7).box is None
+
+def regulation_runs_distribution(batting, fielding, bins):
+    # exact odds of `batting` scoring 0..bins-2 and bins-1 or more runs in
+    # nine innings, over the starting pitchers of `fielding`
+    dist = np.mean([
+        markov.game_runs(markov.HalfInning.for_matchup(batting.lineup, p, odds.team_defense(fielding))).sum(axis=1)
+        for p in fielding.starting_pitchers
+    ], axis=0)
+    return np.append(dist[:bins-1], dist[bins-1:].sum())
+
+def assert_matches_distribution(sample, expected):
+    # chi-squared goodness of fit, at a 0.1% false alarm rate for 8 degrees
+    # of freedom
+    assert len(expected) == 9
+    observed = np.bincount(np.minimum(sample, len(expected) - 1), minlength=len(expected))
+    counts   = expected * len(sample)
+    assert ((observed - counts) ** 2 / counts).sum() < 26.12
+
+def test__engines__match_exact_odds():
+    from batch import BatchEngine
+    from simulate import load_roster, play_game
+
+    rosters = load_roster('roster__denver_dingers.csv'), load_roster('roster__diamond_dogs.csv')
+    away, home = Team(*rosters[0]), Team(*rosters[1])
+    away.set_lineup()
+    home.set_lineup()
+    expected = regulation_runs_distribution(away, home, 9), regulation_runs_distribution(home, away, 9)
+    p_away, p_home = markov.matchup_win_probability(away, home)
+
+    seeds = random.Random(2023)
+    games = [ play_game(*rosters, seed=seeds.getrandbits(64), keep_at_bats=False) for n in range(4000) ]
+    obj_runs = np.array([ [ sum(g.linescore.inning_runs(side, n) for n in range(1, 10)) for side in (0, 1) ] for g in games ])
+    obj_wins = np.array([ g.away.runs > g.home.runs for g in games ])
+
+    batch = BatchEngine(away, home).play(50000, seed=2023)
+
+    for side in (0, 1):
+        assert_matches_distribution(obj_runs[:, side], expected[side])
+        assert_matches_distribution(batch.regulation_runs[:, side], expected[side])
+    for wins in (obj_wins, batch.runs[:, 0] > batch.runs[:, 1]):
+        assert abs(wins.mean() - p_away) < 4 * (p_away * p_home / len(wins)) ** 0.5
+    assert all(g.away.runs != g.home.runs for g in games)
+    assert (batch.runs[:, 0] != batch.runs[:, 1]).all()
+    assert (batch.innings >= 9).all()
+
+def test__swing_results__match_table():
+    for bt, obt in [(17, 19), (26, 32), (32, 39), (45, 52)]:
+        results = tables.swing_results(bt, obt)
+        assert len(results) == tables.MAX_MSS + 1
+        for mss in range(1, tables.MAX_MSS + 1):
+            name = tables.swing_result_table(bt, obt, mss)
+            assert results[mss].name == name.upper().replace(' ', '_')
+
+def test__swing_results__shared_between_players(team):
+    a, b = make_position_player(1), make_position_player(2)
+    a.bt, a.obt = b.bt, b.obt = 26, 32
+    assert a.swing_results is b.swing_results
+
+def test__hit_table__no_allocation():
+    assert tables.hit_table(1) is tables.hit_table(2)
+    assert len(tables.HIT_TABLE) == 20
+    assert [ type(e).__name__ for e in tables.hit_table(18) ] == ['Double', 'RunnersAdvance']
+    assert [ type(e).__name__ for e in tables.hit_table(20) ] == ['HomeRun']
+
+def test__events__flyweights():
+    import events
+    assert events.DefChance(Positions['SS']) is events.DefChance(Positions['SS'])
+    assert events.DefChance(Positions['SS']) is not events.DefChance(Positions['1B'])
+    assert events.RunnersAdvance(2).n == 2 and events.Double().arg == 2
+    with pytest.raises(AttributeError):
+        events.Single().arg = 2
+
+def test__events__defense_chance():
+    from events import play_hit
+    chance = tables.hit_table(6)  # single, chance at SS
+    assert [ type(e).__name__ for e in chance ] == ['Single', 'DefChance']
+    rolls = { pos: 5 for pos in Positions }
+
+    play = play_hit(chance, False, rolls)
+    assert (play.batter_bases, play.runner_bases, play.error, play.great_play) == (1, 1, False, False)
+    play = play_hit(chance, False, { **rolls, Positions['SS']: 1 })
+    assert (play.batter_bases, play.runner_bases, play.error) == (2, 2, True)
+    play = play_hit(chance, True, { **rolls, Positions['SS']: 10 })
+    assert play.great_play and play.defense == 10
+
+    # runners go two on a single, three on a critical one
+    play = play_hit(tables.hit_table(10), True, rolls)
+    assert (play.batter_bases, play.runner_bases) == (2, 3)
+
+def test__tables__play_advance():
+    # runner on first, single with the runners taking two: first and third
+    mask, runs, moves, scored = tables.PLAY_ADVANCE[0b001][1][2]
+    assert (mask, runs) == (0b101, 0)
+    # runners on second and third, double with an error: everyone scores
+    mask, runs, moves, scored = tables.PLAY_ADVANCE[0b110][2][3]
+    assert (mask, runs) == (0b010, 2)
+    assert tables.BASE_ADVANCE[0b111][4][:2] == (0, 4)
+
+def test__game__hits_follow_hit_table(roster_game):
+    g = roster_game
+    g.play()
+    at_bats = [ a for inning in g.innings for half in inning.halfs for a in half.at_bats ]
+    hits = [ a for a in at_bats if a.hit_roll is not None ]
+    assert hits and all(1 <= a.hit_roll <= 20 for a in hits)
+    assert sum(not a.great_play for a in hits) == sum(g.linescore.hits)
+    assert sum(a.error for a in hits) == sum(g.linescore.errors)
+
+def test__odds__hit_plays():
+    plays, error = odds.hit_plays()
+    assert sum(plays.values()) == 1
+    # four chances on singles and three on doubles, each a great play on a 10-12
+    assert plays[(1, 0, 0)] == Fraction(7, 20) * Fraction(3, 12)
+    assert error == Fraction(7, 20) * Fraction(1, 12)
+    # a sure-handed shortstop makes more great plays
+    better, _ = odds.hit_plays(defense=((Positions['SS'], 1),))
+    assert better[(1, 0, 0)] == plays[(1, 0, 0)] + Fraction(1, 20) * Fraction(1, 12)
+
+def test__traits__compiled_once():
+    from enums import Traits
+    from traits import NO_MODS, compile_traits, parse_traits
+    mods = compile_traits((Traits['C+'], Traits['P++'], Traits['D-']))
+    assert mods[:4] == (-2, 0, 2, -1)
+    assert mods is compile_traits((Traits['C+'], Traits['P++'], Traits['D-']))
+    assert mods.hit_table[0] is tables.hit_table(3) and mods.hit_table[19] is tables.hit_table(20)
+    assert compile_traits((Traits['S+'],)) == NO_MODS
+    with pytest.raises(AssertionError):
+        compile_traits(tuple("K+ CN-"))
+    assert parse_traits("K+ CN-") == parse_traits(['K+', Traits['CN-']]) == (Traits['K+'], Traits['CN-'])
+
+    # a roster's trait names are parsed when they are compiled
+    player = make_position_player(1)
+    assert player.traits == "K+ CN-" and player.mods[:4] == (0, 1, 0, 0)
+
+def test__traits__applied_to_at_bats(roster_game):
+    import pickle
+    from enums import Traits
+    g = roster_game
+    batter, pitcher = g.away.lineup[0], g.home.pitcher
+    batter.traits, pitcher.traits = [ Traits['C+'] ], [ Traits['K+'] ]
+    # compiled when they go in, not read while playing
+    assert batter.mods.swing == 0
+    g.away.lineup.replace(batter, batter)
+    g.home.set_pitcher(pitcher)
+    assert (batter.mods.swing, pitcher.mods.pitch) == (-2, 2)
+    assert pickle.loads(pickle.dumps(batter)).mods == batter.mods
+
+def test__odds__traits_shift_matchup(roster_game):
+    from enums import Traits
+    g = roster_game
+    batter, pitcher = g.away.lineup[0], g.home.pitcher
+    plain = odds.matchup(batter, pitcher)
+    pitcher.traits = [ Traits['K+'] ]
+    pitcher.compile_traits()
+    assert odds.matchup(batter, pitcher).out > plain.out
+    batter.traits = [ Traits['P++'] ]
+    batter.compile_traits()
+    assert odds.matchup(batter, pitcher).bases[4] > plain.bases[4]
+
+def test__dice__parse():
+    assert dice.parse('2d10') is dice.parse('2d10')
+    spec = dice.parse('-d4')
+    assert (spec.count, spec.sides, spec.sign) == (1, 4, -1)
+    assert (spec.min, spec.max) == (-4, -1)
+    assert dice.PITCHER_DICE[PitcherDice['d20']].max == 20
+    assert roll('-d4') > 0
+
+def test__dice__roll_many():
+    rolls = dice.parse('-d4').roll_many(1000)
+    assert set(rolls) == {-1, -2, -3, -4}
+    rolls = dice.parse('3d6').roll_many(1000)
+    assert min(rolls) >= 3 and max(rolls) <= 18
+    # the same rolls one at a time would give, across refills of the buffer
+    for spec in ('d20', '-d4', '2d10'):
+        many, one = dice.Roller(9), dice.Roller(9)
+        assert dice.parse(spec).roll_many(500, many) == [ dice.parse(spec).roll(one) for n in range(500) ]
+        assert many.uniform() == one.uniform()
+
+def test__dice__seeded_roller():
+    a, b = dice.Roller(seed=42), dice.Roller(seed=42)
+    assert dice.D100.roll_many(5000, a) == dice.D100.roll_many(5000, b)
+    a.seed(1)
+    b.seed(1)
+    assert dice.D20.roll(a) == dice.D20.roll(b)
+
+def test__odds__plate_appearance_exact():
+
+    for pd in PitcherDice:
+        outcomes = odds.plate_appearance(26, 32, pd)
+        assert sum(outcomes.swing) == 1
+        assert sum(outcomes.bases.values()) == outcomes.hit
+        assert outcomes.hit + outcomes.walk + outcomes.out == 1
+
+        # brute force over every pitch and swing
+        spec = dice.PITCHER_DICE[pd]
+        expected = Counter()
+        for pitch in range(1, spec.sides + 1):
+            for swing in range(1, 101):
+                mss = max(1, swing + spec.sign * pitch)
+                expected[tables.swing_result_table(26, 32, mss)] += Fraction(1, 100 * spec.sides)
+        assert outcomes.walk == expected['Walk']
+        assert outcomes.hit == expected['Ordinary Hit'] + expected['Critical Hit']
+
+    assert odds.plate_appearance(26, 32, PitcherDice['d4']) is odds.plate_appearance(26, 32, PitcherDice['d4'])
+
+def test__odds__hit_bases():
+    assert odds.hit_bases() == {1: Fraction(14, 20), 2: Fraction(4, 20), 4: Fraction(2, 20)}
+    assert odds.hit_bases(critical=True) == {2: Fraction(14, 20), 3: Fraction(4, 20), 4: Fraction(2, 20)}
+
+def test__odds__matchup_matrices(roster_game):
+    g = roster_game
+    away_batting, home_batting = odds.matchup_matrices(g.away, g.home)
+    assert len(away_batting.batters) == 9
+    assert away_batting.pitchers == sorted(g.home.bullpen, key=lambda p: p.number)
+    batter, pitcher = g.away.lineup[0], g.home.pitcher
+    assert away_batting[batter, pitcher] is odds.matchup(batter, pitcher, odds.team_defense(g.home))
+    hits = home_batting.matrix('hit')
+    assert len(hits) == 9 and all(0 < p < 1 for row in hits for p in row)
+
+def test__markov__half_inning(roster_game):
+    g = roster_game
+    half = markov.HalfInning.for_matchup(g.away.lineup, g.home.pitcher)
+    # every leadoff ends its half with certainty
+    assert half.runs.sum(axis=(1, 2)) == pytest.approx([1] * 9)
+    assert half.next_leadoff.sum(axis=1) == pytest.approx([1] * 9)
+    assert half.runs_distribution(0).sum() == pytest.approx(1)
+    assert (half.expected_runs > 0).all()
+
+def test__markov__matches_batch_engine(roster_game):
+    from batch import BatchEngine
+
+    g = roster_game
+    p_away, p_home = markov.matchup_win_probability(g.away, g.home)
+    assert p_away + p_home == pytest.approx(1)
+
+    n = 50000
+    batch = BatchEngine(g.away, g.home).play(n, seed=11)
+    stderr = (p_away * p_home / n) ** 0.5
+    assert abs(batch.win_pct(0) - p_away) < 4 * stderr
+
+def test__linescore__tracks_halves(roster_game):
+    g = roster_game
+    g.play()
+    for side, team in enumerate(g.teams):
+        halves = [ half for inning in g.innings for half in inning.halfs if half.batting is team ]
+        assert team.runs == sum(half.runs for half in halves)
+        assert team.hits == sum(half.hits for half in halves)
+        assert team.errors == sum(half.errors for inning in g.innings for half in inning.halfs if half.fielding is team)
+        assert [ g.linescore.inning_runs(side, n+1) for n in range(len(halves)) ] == [ half.runs for half in halves ]
+    assert g.linescore.inning_runs(0, len(g.innings) + 1) is None
+    assert not g.linescore.is_tied
+
+def test__linescore__runs_by_inning(game_ready):
+    g = game_ready
+    for n in range(4):
+        g.inning.half.make_next_at_bat()
+        g.single()
+    assert g.linescore.runs == [1, 0]
+    assert g.linescore.hits == [4, 0]
+    assert g.linescore.inning_runs(0, 1) == 1
+    assert g.linescore.inning_runs(1, 1) is None
+    g.inning.make_next_half()
+    assert g.linescore.inning_runs(1, 1) == 0
+
+def test__linescore__errors_charged_to_fielding_team(game_ready):
+    g = game_ready
+    top = g.inning.half
+    top.add_error()
+    assert (top.errors, g.home.errors, g.away.errors) == (1, 1, 0)
+    g.inning.make_next_half()
+    g.inning.half.add_error()
+    assert (g.inning.half.errors, g.away.errors, g.home.errors) == (1, 1, 1)
+
+def test__base_advance_table():
+    # bases loaded, double: runners from second and third score, first to third
+    mask, runs, moves, scored = tables.BASE_ADVANCE[0b111][2]
+    assert (mask, runs) == (0b110, 2)
+    assert moves == ((0, 2),)
+    assert scored == (2, 1)
+    # bases empty, home run
+    assert tables.BASE_ADVANCE[0][4] == (0, 1, (), (3,))
+    # runner on second, single
+    assert tables.BASE_ADVANCE[0b010][1][:2] == (0b101, 0)
+
+def test__base_queue__mask(game_ready):
+    g = game_ready
+    g.inning.half.make_next_at_bat()
+    g.double()
+    assert g.bases.mask == 0b010
+    assert g.bases.base_is_empty(1) and not g.bases.base_is_empty(2)
+    g.inning.half.make_next_at_bat()
+    batter = g.inning.half.batting.up_to_bat
+    g.single()
+    assert g.bases.mask == 0b101
+    assert g.bases.get_player_at_base(1) is batter
+    assert list(g.bases) == [batter, None, g.bases[2]]
+
+def test__player__slots(player):
+    with pytest.raises(AttributeError):
+        player.nickname = "Slugger"
+
+def test__roster__indexes(roster_game):
+    team = roster_game.away
+    assert team.get_player_by_number(1).name == 'Raimel Tapia'
+    assert [ p.pos.name for p in team.roster.at_position(Positions.SP) ] == ['SP', 'SP']
+    assert team.starting_pitchers == sorted(team.starting_pitchers, key=lambda p: p.number)
+    assert team.roster.at_position(Positions.DH)[0].name == 'Connor Joe'
+
+def test__lineup__ring(team):
+    team.set_lineup()
+    order = [ team.get_player_by_number(n) for n in range(1, 10) ]
+    seen = []
+    for n in range(20):
+        team.lineup.advance()
+        seen.append(team.up_to_bat)
+    assert seen == (order * 3)[:20]
+
+def test__sub_player__keeps_slot_and_bench(team):
+    team.set_lineup()
+    entering = team.get_player_by_number(21)
+    leaving  = team.get_player_by_number(4)
+    assert entering in team.bench
+    team.sub_player(entering, leaving)
+    assert team.lineup.index(entering) == 3
+    assert entering not in team.bench
+    assert leaving not in team.bench
+    assert len(team.lineup) == 9
+
+def test__lineup__remove_keeps_batting_order(team):
+    team.set_lineup()
+    order = list(team.lineup)
+    for n in range(3):
+        team.lineup.advance()
+    assert team.up_to_bat is order[2]
+    team.retire(order[0])
+    team.lineup.advance()
+    assert team.up_to_bat is order[3]
+    # the batter up leaving: the next one in the order takes the slot
+    team.retire(order[3])
+    team.lineup.advance()
+    assert team.up_to_bat is order[4]
+
+def test__roster__indexes_follow_subs_and_retirements():
+    from simulate import load_roster
+    team = Team(*load_roster('roster__denver_dingers.csv'))
+    team.set_lineup()
+    starters = list(team.starting_pitchers)
+    assert team.retire(starters[0]) is None
+    assert team.starting_pitchers == starters[1:]
+
+    fielder = team.lineup[0]
+    entering = next(p for p in team.bench if p.pos is not fielder.pos and team.lineup.at_position(p.pos) is None)
+    assert team.lineup.at_position(fielder.pos) is fielder
+    team.sub_player(entering, fielder)
+    assert team.lineup.at_position(entering.pos) is entering
+    assert team.lineup.at_position(fielder.pos) is None
+    assert fielder not in team.roster.at_position(fielder.pos)
+
+    # copies: changing them leaves the team alone
+    team.bench.clear()
+    team.starting_pitchers.clear()
+    assert team.bench and team.starting_pitchers == starters[1:]
+
+    # a number worn twice finds the first player to wear it
+    twin = make_position_player(fielder.number)
+    team.add_player(twin)
+    assert team.get_player_by_number(fielder.number) is fielder
+    team.retire(twin)
+    assert team.get_player_by_number(fielder.number) is fielder
+
+def make_league_dir(tmp_path, n_teams=2):
+    rosters = ['roster__denver_dingers.csv', 'roster__diamond_dogs.csv']
+    for n in range(n_teams):
+        shutil.copy(rosters[n % 2], tmp_path / f"roster__team_{n}.csv")
+    return tmp_path
+
+def test__league__loads_and_caches(tmp_path):
+    from league import League
+    league_dir = make_league_dir(tmp_path, 3)
+
+    cache_dir = tmp_path / 'cache'
+    league = League(str(league_dir), cache_dir=str(cache_dir))
+    assert league.names == ['Team 0', 'Team 1', 'Team 2']
+    assert len(list(cache_dir.glob('league-*.cache'))) == 1
+    assert not list(league_dir.glob('*.cache'))
+    assert cache_dir.stat().st_mode & 0o077 == 0
+
+    team = league.team('Team 0')
+    team.set_lineup()
+    assert team.lineup[0].name == 'Raimel Tapia'
+    assert [ t.name for t in team.lineup[0].traits ] == ['P-', 'S+']
+    # players are shared, teams are not
+    assert league.team('Team 0') is not team
+    assert league.players('Team 0') is league.players('Team 0')
+
+    # reopened from the cache, without reparsing
+    again = League(str(league_dir), cache_dir=str(cache_dir))
+    assert again.hash == league.hash
+    assert [ p.name for p in again.players('Team 2') ] == [ p.name for p in league.players('Team 2') ]
+    # mapped until every team is read, and again if needed after a close
+    again.close()
+    assert again.players('Team 1') and again._mmap is not None
+    again.players('Team 0')
+    assert again._mmap is None
+
+    # editing a roster invalidates the cache
+    with open(league_dir / 'roster__team_1.csv', 'a') as fh:
+        fh.write("Rookie,LF,R,20,25,,\n")
+    with League(str(league_dir), cache_dir=str(cache_dir)) as changed:
+        assert changed.hash != league.hash
+        assert len(changed.players('Team 1')) == 15
+    assert changed._mmap is None
+    assert len(list(cache_dir.glob('league-*.cache'))) == 1
+
+def test__league__reports_every_bad_roster(tmp_path):
+    from league import League, RosterError
+    league_dir = make_league_dir(tmp_path, 2)
+    (league_dir / 'roster__bad_one.csv').write_text("Name,Position,Handedness,BT,OBT,Traits,PD\nX,QB,R,1,2,,\n")
+    (league_dir / 'roster__bad_two.csv').write_text("Name,Position,Handedness,BT,OBT,Traits,PD\nY,LF,R,x,2,,\n")
+    with pytest.raises(RosterError) as e:
+        League(str(league_dir))
+    assert 'roster__bad_one.csv:2' in str(e.value)
+    assert 'roster__bad_two.csv:2' in str(e.value)
+
+def test__playlog__records_every_plate_appearance(roster_game, tmp_path):
+    from playlog import BinarySink, PlayLog, read_records
+    filename = tmp_path / 'plays.bin'
+    log = PlayLog(capacity=10, sink=BinarySink(filename, batch_size=7))
+    g = roster_game
+    g.add_observer(log)
+    g.play()
+    log.close()
+
+    n_at_bats = sum(len(half.at_bats) for inning in g.innings for half in inning.halfs)
+    records = list(read_records(filename))
+    assert len(records) == n_at_bats
+    assert len(log) == 10
+    assert list(log) == records[-10:]
+
+    last = records[-1]
+    assert (last.runs_away, last.runs_home) == tuple(g.linescore.runs)
+    assert last.outs == 3
+    assert all(r.mss == min(tables.MAX_MSS, max(1, r.swing + r.pitch)) for r in records)
+    assert all(r.game == g.seed for r in records)
+
+    # appended to, but only if it is a play log of this layout
+    BinarySink(filename).close()
+    assert len(list(read_records(filename))) == n_at_bats
+    old = tmp_path / 'old.bin'
+    old.write_bytes(bytes(24))
+    with pytest.raises(AssertionError):
+        BinarySink(old)
+    with pytest.raises(AssertionError):
+        list(read_records(old))
+    assert old.read_bytes() == bytes(24)
+
+def test__columnar__round_trip(roster_game, tmp_path):
+    from columnar import ColumnarLog, ColumnarSink
+    from playlog import PlayLog
+    log = PlayLog(capacity=10000, sink=ColumnarSink(tmp_path / 'plays', batch_size=50))
+    g = roster_game
+    g.add_observer(log)
+    g.play()
+    log.close()
+
+    columns = ColumnarLog(tmp_path / 'plays')
+    assert len(columns) == len(log)
+    assert columns.columns[:3] == ['game', 'inning', 'half']
+    assert columns.row(7) == log.records[7]
+    mss = columns['mss']
+    assert isinstance(mss, np.memmap) and not mss.flags.writeable
+    assert (mss == np.clip(columns['swing'].astype(int) + columns['pitch'], 1, tables.MAX_MSS)).all()
+    assert columns['runs'].sum() == sum(g.linescore.runs)
+
+    # a row cut short while writing is left out
+    with open(tmp_path / 'plays' / 'runs.bin', 'ab') as fh:
+        fh.write(b'\x01')
+    with open(tmp_path / 'plays' / 'game.bin', 'ab') as fh:
+        fh.write(b'\x01\x00\x00\x00')
+    assert len(ColumnarLog(tmp_path / 'plays')) == len(log)
+
+def test__simulate__records_columnar_parts(tmp_path):
+    from columnar import open_parts
+    result = simulate_matchup('roster__denver_dingers.csv', 'roster__diamond_dogs.csv', 300, workers=2, seed=3, record=str(tmp_path))
+    parts = open_parts(tmp_path)
+    assert len(parts) == 2
+    assert sum(int(part['runs'].sum()) for part in parts) == sum(r * n for side in (0, 1) for r, n in result.runs[side].items())
+    assert sum(len(set(part['game'].tolist())) for part in parts) == 300
+
+def test__store__records_and_queries(tmp_path):
+    from store import ResultStore
+    filename = str(tmp_path / 'results.db')
+    result = simulate_matchup('roster__denver_dingers.csv', 'roster__diamond_dogs.csv', 40, workers=2, seed=2, store=filename)
+    # the workers closed theirs, so the last one out checkpointed the log
+    assert not os.path.exists(filename + '-wal')
+
+    # queries only: nothing written, not even the schema
+    with pytest.raises(sqlite3.OperationalError):
+        ResultStore(str(tmp_path / 'missing.db'), readonly=True)
+    reader = ResultStore(filename, readonly=True)
+    try:
+        assert reader._writer is None and len(reader.games()) == 40
+        with pytest.raises(AssertionError):
+            reader.record((), [])
+    finally:
+        reader.close()
+
+    store = ResultStore(filename, queue_size=4, batch_games=3)
+    try:
+        games = store.games()
+        assert len(games) == 40
+        assert sorted(g['runs_away'] for g in games) == sorted(result.runs[0].elements())
+        assert store._reader.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+        pa = store.plate_appearances(limit=1)[0]
+        batter, pitcher = pa['batter'], pa['pitcher']
+        rows = store.plate_appearances(batter=batter, pitcher=pitcher, risp=True)
+        assert all(row['batter'] == batter and row['pitcher'] == pitcher and row['bases_before'] & 0b110 for row in rows)
+        assert len(store.plate_appearances(team='Denver Dingers', bases=0, outs=2)) > 0
+        line = store.batting_line(batter)
+        assert line['pa'] == len(store.plate_appearances(batter=batter)) >= line['h'] + line['bb']
+        plan = store._reader.execute("EXPLAIN QUERY PLAN SELECT * FROM plate_appearances WHERE batter = ? AND pitcher = ?", (batter, pitcher)).fetchall()
+        assert 'pa_batter' in str([ tuple(row) for row in plan ])
+        plan = store._reader.execute("EXPLAIN QUERY PLAN SELECT * FROM games WHERE home = ?", ('Diamond Dogs',)).fetchall()
+        assert 'games_home' in str([ tuple(row) for row in plan ])
+
+        # games recorded through the observer are written in the background
+        from simulate import load_roster, play_game
+        rosters = load_roster('roster__denver_dingers.csv'), load_roster('roster__diamond_dogs.csv')
+        for seed in range(10):
+            play_game(*rosters, seed=seed, observers=[store.recorder()])
+        store.flush()
+        assert len(store.games(team='Diamond Dogs')) == 50
+        # every plate appearance belongs to the game it was played in
+        games = store._reader.execute("SELECT g.innings, max(pa.inning) FROM games g JOIN plate_appearances pa ON pa.game = g.id GROUP BY g.id").fetchall()
+        assert len(games) == 50 and all(innings == last for innings, last in games)
+    finally:
+        store.close()
+
+def test__no_debug_log(roster_game, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    roster_game.play()
+    assert not (tmp_path / 'debug.log').exists()
+
+def test__game__seeds_fit_the_play_log():
+    import argparse
+    from game import MAX_SEED, parse_seed
+    from playlog import PlayLog, RECORD
+    for seed in (-5, MAX_SEED + 1):
+        with pytest.raises(AssertionError):
+            Game(seed=seed)
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_seed(str(seed))
+    assert parse_seed(str(MAX_SEED)) == MAX_SEED
+    log = PlayLog()
+    g = Game(seed=MAX_SEED, observers=[log])
+    g.set_teams(g.get_team_from_roster('roster__denver_dingers.csv'), g.get_team_from_roster('roster__diamond_dogs.csv'))
+    for team in g.teams:
+        team.set_lineup()
+    g.set_starting_pitchers()
+    g.play()
+    assert RECORD.unpack(RECORD.pack(*log.records[0]))[0] == MAX_SEED
+
+def test__game__same_seed_same_game():
+    from simulate import load_roster, play_game
+    rosters = load_roster('roster__denver_dingers.csv'), load_roster('roster__diamond_dogs.csv')
+    a = play_game(*rosters, seed=4812337)
+    b = play_game(*rosters, seed=4812337)
+    assert a.linescore.innings == b.linescore.innings
+    assert a.linescore.hits == b.linescore.hits
+    assert [ t.pitcher.number for t in a.teams ] == [ t.pitcher.number for t in b.teams ]
+
+def test__game__steps(roster_game):
+    g = roster_game
+    steps = g.steps()
+    first = next(steps)
+    assert first.result is not None
+    assert g.inning.number == 1 and g.inning.half.side == 0
+    rest = list(steps)
+    assert 1 + len(rest) == sum(len(half.at_bats) for inning in g.innings for half in inning.halfs)
+    assert not g.linescore.is_tied
+
+def test__replay__seek_and_play():
+    from replay import Replay, record
+    from playlog import PlayLog
+    from simulate import load_roster, play_game
+    rosters = load_roster('roster__denver_dingers.csv'), load_roster('roster__diamond_dogs.csv')
+
+    original = play_game(*rosters, seed=99)
+    rec = record(original)
+
+    again = Replay(rec, Team(*rosters[0]), Team(*rosters[1]))
+    at_bat = again.seek(5, 1, 2)
+    assert (again.game.inning.number, again.game.inning.half.side) == (5, 1)
+    original_half = original.innings[4].halfs[1]
+    assert at_bat.result == original_half.at_bats[1].result
+    assert at_bat.mss == original_half.at_bats[1].mss
+
+    # a replay that keeps only the last at-bat of a half seeks just as well
+    lean = Replay(rec, Team(*rosters[0]), Team(*rosters[1]), keep_at_bats=False)
+    assert lean.seek(5, 1, 2).mss == at_bat.mss and lean.game.inning.half.n_at_bats == 2
+
+    class Hooks(Observer):
+        def __init__(self):
+            self.calls = []
+        def game_started(self, game):
+            self.calls.append('game_started')
+        def half_started(self, half):
+            self.calls.append('half_started')
+        def half_finished(self, half):
+            self.calls.append('half_finished')
+        def game_finished(self, game):
+            self.calls.append('game_finished')
+
+    log, hooks = PlayLog(), Hooks()
+    game = again.play(observers=[log, hooks])
+    assert game.linescore.innings == original.linescore.innings
+    assert log.records[0].inning == 5 and log.records[0].half == 1
+    # late observers see the game and the half under way start
+    assert log.records[0].game == original.seed
+    assert hooks.calls[:2] == ['game_started', 'half_started']
+    assert hooks.calls.count('half_started') == hooks.calls.count('half_finished')
+    assert hooks.calls[-1] == 'game_finished'
+
+    # nothing left to draw
+    import io
+    from observers import AnsiTerminalObserver
+    last = original.innings[-1].halfs[-1]
+    again = Replay(rec, Team(*rosters[0]), Team(*rosters[1]))
+    again.seek(last.inning.number, last.side, len(last.at_bats))
+    again.play(observers=[AnsiTerminalObserver(stream=io.StringIO())])
+
+    with pytest.raises(ValueError):
+        Replay(rec, Team(*rosters[0]), Team(*rosters[1])).seek(500)
+
+def test__simulate__game_seed_replays_batch_game():
+    from simulate import game_seed, load_roster, play_game
+    rosters = load_roster('roster__denver_dingers.csv'), load_roster('roster__diamond_dogs.csv')
+    result = simulate_matchup('roster__denver_dingers.csv', 'roster__diamond_dogs.csv', 3, workers=1, seed=5)
+    games = [ play_game(*rosters, seed=game_seed(3, 5, i)) for i in range(3) ]
+    assert Counter(g.away.runs for g in games) == result.runs[0]
+    assert Counter(len(g.innings) for g in games) == result.innings
+
+def test__art__field_template():
+    import art
+    template = art.compile_field(art.field)
+    assert set(template.slots) == set(art.SLOT_TOKENS)
+    lines = art.field.split('\n')
+    for token, (row, column, width) in template.slots.items():
+        assert lines[row][column:column+width] == token
+    assert template.render({}).count('PPP') == 1
+
+def test__art__field_renderer_redraws_changed_slots():
+    import art
+    renderer = art.FieldRenderer(top=3)
+    slots = { token: token.lower() for token in art.SLOT_TOKENS }
+    first = renderer.frame(slots)
+    assert first.startswith(art.move_to(3, 0)) and 'ppp' in first
+    assert renderer.frame(slots) == ''
+
+    row, column, width = renderer.template.slots['R2']
+    slots['R2'] = ' 7'
+    assert renderer.frame(slots) == art.move_to(3 + row, column) + ' 7'
+
+def test__observers__ansi_frames(roster_game):
+    import io
+    from observers import AnsiTerminalObserver
+    for team, color in zip(roster_game.teams, ('light_red', 'light_blue')):
+        team.color = color
+    stream = io.StringIO()
+    observer = AnsiTerminalObserver(stream=stream)
+    roster_game.add_observer(observer)
+    steps = roster_game.steps()
+    next(steps)
+    assert '\x1b[2J' in stream.getvalue()
+    # the observer has just drawn this at-bat: nothing left to redraw
+    assert observer.frame(roster_game) == ''
+    list(steps)
+    # the screen is only cleared when the scoreboard grows for extra innings
+    assert stream.getvalue().count('\x1b[2J') <= 1 + len(roster_game.innings) - 9
+
+def test__spectate__streams_games(tmp_path):
+    import asyncio, json
+    from league import League
+    import spectate
+
+    for filename in ('roster__denver_dingers.csv', 'roster__diamond_dogs.csv'):
+        shutil.copy(filename, tmp_path)
+    games = spectate.make_games(League(str(tmp_path)), 4, seed=8)
+
+    async def main():
+        server = spectate.SpectatorServer(games, pace_secs=0)
+        listening = await server.listen_tcp('127.0.0.1', 0)
+        port = listening.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(spectate.encode({ 'watch': [1, 2] }))
+        await writer.drain()
+        hello = json.loads(await reader.readline())
+        running = asyncio.create_task(server.run())
+        messages = [ json.loads(line) async for line in reader ]
+        await running
+        return hello, messages
+
+    hello, messages = asyncio.run(main())
+    assert hello['type'] == 'hello' and len(hello['games']) == 4
+    assert messages[-1] == { 'type': 'done' }
+    assert { m['game'] for m in messages[:-1] } == {1, 2}
+
+    finals = { m['game']: m['runs'] for m in messages if m['type'] == 'final' }
+    assert finals == { n: games[n].linescore.runs for n in (1, 2) }
+
+    # the deltas add up to the final scoreboard
+    runs = { 1: [0, 0], 2: [0, 0] }
+    for m in messages:
+        if m['type'] == 'play' and 'runs' in m['delta']:
+            runs[m['game']] = m['delta']['runs']
+    assert runs == finals
+
+    # and a viewer's snapshots, inning by inning
+    seen = {}
+    for m in [ hello ] + messages:
+        spectate.describe(m, seen)
+    for n in (1, 2):
+        assert seen[n]['innings'] == [ list(cells) for cells in games[n].linescore.innings ]
+        assert seen[n]['runs'] == finals[n]
+
+def test__spectate__slow_viewer_gets_snapshot():
+    import asyncio
+    import spectate
+
+    async def main():
+        viewer = spectate.Viewer(writer=None, queue_size=2)
+        for n in range(5):
+            viewer.offer(0, b'play\n')
+        return viewer
+
+    viewer = asyncio.run(main())
+    assert viewer.queue.qsize() == 2
+    assert viewer.lagging and viewer.dropped == 3
+
+def test__spectate__stalled_viewer_does_not_hold_up_the_end(tmp_path):
+    import asyncio
+    from league import League
+    import spectate
+
+    for filename in ('roster__denver_dingers.csv', 'roster__diamond_dogs.csv'):
+        shutil.copy(filename, tmp_path)
+    games = spectate.make_games(League(str(tmp_path)), 2, seed=8)
+
+    class Stalled:
+        # a viewer that connected, then stopped reading and writing
+        aborted = False
+        def __init__(self):
+            self.transport = self
+        def __aiter__(self):
+            return self
+        async def __anext__(self):
+            await asyncio.Event().wait()
+        def write(self, data):
+            pass
+        async def drain(self):
+            await asyncio.Event().wait()
+        def abort(self):
+            self.aborted = True
+
+    async def main():
+        server  = spectate.SpectatorServer(games, pace_secs=0, queue_size=2, close_secs=0.05)
+        stalled = Stalled()
+        handler = asyncio.create_task(server.handle(stalled, stalled))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(server.run(), 5)
+        return server, stalled, handler
+
+    server, stalled, handler = asyncio.run(main())
+    assert stalled.aborted and handler.cancelled()
+    assert not server.viewers and not server._handlers
+
+@pytest.mark.parametrize('n_teams', [2, 5, 6])
+def test__season__schedule_is_balanced(n_teams):
+    from season import make_schedule
+    names = [ f"Team {n}" for n in range(n_teams) ]
+    schedule = make_schedule(names, 20)
+    games = Counter()
+    home  = Counter()
+    for day in schedule:
+        teams = [ name for pair in day for name in pair ]
+        assert len(teams) == len(set(teams))
+        games.update(teams)
+        home.update(h for a, h in day)
+    assert set(games.values()) == {20}
+    assert all(abs(2 * home[name] - games[name]) <= 2 for name in names)
+
+@pytest.mark.parametrize('names, games_per_team', [('ABC', 1), ('ABCDE', 3)])
+def test__season__schedule_must_be_possible(names, games_per_team):
+    from season import make_schedule
+    with pytest.raises(AssertionError):
+        make_schedule(list(names), games_per_team)
+    assert len(make_schedule(list(names), games_per_team + 1)) > 0
+
+def test__season__standings():
+    from season import Standings
+    standings = Standings(['A', 'B'])
+    standings.record('A', 'B', 3, 1)
+    standings.record('A', 'B', 2, 1)
+    standings.record('B', 'A', 5, 0)
+    assert standings.wins == { 'A': 2, 'B': 1 }
+    assert standings.streak == { 'A': -1, 'B': 1 }
+    assert standings.run_differential('B') == 2
+    assert standings.order() == ['A', 'B']
+    assert standings.rows()[1][4] == '1'
+
+def test__season__resumes_from_checkpoint(tmp_path):
+    from season import Season
+    directory  = str(make_league_dir(tmp_path, 4))
+    checkpoint = str(tmp_path / 'season.ckpt')
+
+    whole = Season(directory, games_per_team=6, seed=3).play(workers=1)
+
+    season = Season(directory, games_per_team=6, seed=3, checkpoint=checkpoint)
+    season.play(workers=1, days=2)
+    assert season.day == 2
+    resumed = Season(directory, games_per_team=6, checkpoint=checkpoint)
+    assert resumed.day == 2 and resumed.seed == 3
+    standings = resumed.play(workers=2)
+    assert resumed.is_over
+    assert standings.rows() == whole.rows()
+
+def test__season__projection(tmp_path):
+    from season import project
+    directory = str(make_league_dir(tmp_path, 4))
+    one = project(directory, 3, games_per_team=4, workers=1, seed=1)
+    two = project(directory, 3, games_per_team=4, workers=2, seed=1)
+    assert one.seasons == 3
+    assert one.wins == two.wins
+    assert sum(one.firsts.values()) == 3
+
+def test__season__projection_box_scores(tmp_path):
+    from season import project
+    directory = str(make_league_dir(tmp_path, 4))
+    projection = project(directory, 2, games_per_team=4, workers=1, seed=1, box=True)
+    assert len(projection.box.teams) == 4
+    assert all(line.runs.n == 2 * 4 for line in projection.box.teams.values())
+
+def test__optimize__scorer_matches_markov():
+    import optimize
+    from simulate import load_roster
+    team     = Team(*load_roster('roster__denver_dingers.csv'))
+    opponent = Team(*load_roster('roster__diamond_dogs.csv'))
+    team.set_lineup()
+    pitcher = opponent.starting_pitchers[0]
+
+    scorer = optimize.LineupScorer(list(team.lineup), [pitcher])
+    order  = [ p.number for p in team.lineup ]
+    expected = markov.game_runs(markov.HalfInning.for_matchup(team.lineup, pitcher)).sum(axis=1) @ np.arange(markov.MAX_GAME_RUNS+1)
+    assert scorer.score(order) == pytest.approx(expected)
+
+    # a rotation is another leadoff of the same half-inning chain
+    rotated = order[4:] + order[:4]
+    team.set_lineup(rotated)
+    expected = markov.game_runs(markov.HalfInning.for_matchup(team.lineup, pitcher)).sum(axis=1) @ np.arange(markov.MAX_GAME_RUNS+1)
+    assert scorer.score(rotated) == pytest.approx(expected)
+    assert len(scorer._halves) == 1
+
+def test__optimize__optimize_lineup(monkeypatch):
+    from optimize import optimize_lineup
+    from simulate import load_roster
+    team     = Team(*load_roster('roster__denver_dingers.csv'))
+    opponent = Team(*load_roster('roster__diamond_dogs.csv'))
+    for t in (team, opponent):
+        t.set_lineup()
+    lineup = list(team.lineup)
+
+    ranked = optimize_lineup(team, opponent, restarts=4, top=3, n_games=500, workers=1, seed=4)
+    assert 1 <= len(ranked) <= 3
+    assert len({ r.order for r in ranked }) == len(ranked)
+    assert [ r.expected_runs for r in ranked ] == sorted((r.expected_runs for r in ranked), reverse=True)
+    assert sorted(ranked[0].order) == sorted(p.number for p in lineup)
+    for r in ranked:
+        assert r.ci[0] < r.runs < r.ci[1]
+    assert list(team.lineup) == lineup
+
+    # the lineup is put back whatever happens
+    import optimize
+    def fail(*args, **kwargs):
+        raise RuntimeError
+    monkeypatch.setattr(optimize.BatchEngine, 'play', fail)
+    with pytest.raises(RuntimeError):
+        optimize_lineup(team, opponent, restarts=1, top=1, workers=1, seed=4)
+    assert list(team.lineup) == lineup
+
+def test__bench__run_and_compare(tmp_path):
+    import bench
+    run = bench.run_benchmarks(['roll', 'field_frame'], repeat=1, min_secs=0.001)
+    assert set(run['results']) == {'roll_d100', 'dice_roll', 'field_frame'}
+    assert all(r['secs'] > 0 for r in run['results'].values())
+
+    history = str(tmp_path / 'history.json')
+    bench.save_run(history, run)
+    slower = { **run, 'results': { name: dict(r, secs=r['secs'] * 1.5) for name, r in run['results'].items() } }
+    bench.save_run(history, slower)
+    before, after = bench.load_history(history)
+    rows = bench.compare(before, after, threshold=0.2)
+    assert all(regressed for *_, regressed in rows)
+    assert not any(regressed for *_, regressed in bench.compare(after, before, threshold=0.2))
+
+def test__instrument__game_stats():
+    import instrument
+    from simulate import load_roster, play_game
+    rosters = load_roster('roster__denver_dingers.csv'), load_roster('roster__diamond_dogs.csv')
+    plain = play_game(*rosters, seed=21)
+    assert plain.stats is None
+
+    instrument.enable()
+    try:
+        game = play_game(*rosters, seed=21)
+    finally:
+        instrument.disable()
+
+    # timing a game does not change it
+    assert game.linescore.innings == plain.linescore.innings
+    at_bats = [ at_bat for inning in game.innings for half in inning.halfs for at_bat in half.at_bats ]
+    stats = game.stats
+    assert stats.games == 1
+    assert stats.calls['at_bat'] == len(at_bats)
+    # pitch and swing, then the hit table and the defense when they come up
+    assert stats.calls['dice'] == sum(2 + (a.hit_roll is not None) + (a.defense is not None) for a in at_bats)
+    assert stats.calls['bookkeeping'] == sum(game.linescore.runs) + sum(game.linescore.hits) + sum(game.linescore.errors)
+    assert stats.calls['swing_lookup'] == len(at_bats)
+    assert stats.nanos['at_bat'] >= stats.nanos['dice'] > 0
+    assert instrument.totals.calls == stats.calls
+    assert 'at_bat' in stats.report()
+
+def test__instrument__disable_restores_and_sampling():
+    import dice, game, instrument
+    from simulate import load_roster, play_game
+    originals = (dice.Dice.roll, game.AtBat.play, game.Game.steps, vars(game.Player)['swing_results'])
+    rosters = load_roster('roster__denver_dingers.csv'), load_roster('roster__diamond_dogs.csv')
+
+    instrument.enable(sample=0.0)
+    try:
+        assert game.AtBat.play is not originals[1]
+        g = play_game(*rosters, seed=3)
+        assert g.stats is None and instrument.totals.games == 0
+    finally:
+        instrument.disable()
+    assert (dice.Dice.roll, game.AtBat.play, game.Game.steps, vars(game.Player)['swing_results']) == originals
+    assert not instrument.is_enabled()
+
+def test__instrument__abandoned_game_leaves_nothing_installed():
+    import dice, game, instrument
+    from simulate import load_roster, play_game
+    roll = dice.Dice.roll
+    rosters = load_roster('roster__denver_dingers.csv'), load_roster('roster__diamond_dogs.csv')
+
+    instrument.enable()
+    try:
+        g = Game(seed=5)
+        g.set_teams(Team(*rosters[0]), Team(*rosters[1]))
+        g.home.set_lineup()
+        g.away.set_lineup()
+        g.set_starting_pitchers()
+        steps = g.steps()
+        for _ in range(5):
+            next(steps)
+            assert dice.Dice.roll is roll
+        # left unfinished, like a replay seeking past it
+        assert g.stats.calls['dice'] > 0 and g.stats.games == 0
+        assert play_game(*rosters, seed=5).stats.games == 1
+        assert dice.Dice.roll is roll
+    finally:
+        instrument.disable()
+
+def test__simulate__profile_merges_stats():
+    result = simulate_matchup('roster__denver_dingers.csv', 'roster__diamond_dogs.csv', 20, workers=1, seed=1, profile=1.0)
+    assert result.stats.games == 20
+    assert result.stats.calls['dice'] > 2 * result.stats.calls['at_bat']
+
+def test__dice__slot_roller_slots_and_antithetic():
+    a, b, turned = dice.SlotRoller(5), dice.SlotRoller(5), dice.SlotRoller(5, antithetic=True)
+    a.start_slot(0)
+    a.uniform()
+    b.start_slot(0)
+    for roller in (a, b, turned):
+        roller.start_slot(1)
+    # the second slot of a side is the same however much of the first was used
+    a.start_slot(0)
+    b.start_slot(0)
+    turned.start_slot(0)
+    turned.start_slot(0)
+    rolls = [ dice.D20.roll(a) for n in range(dice.SLOT_DRAWS) ]
+    assert rolls == [ dice.D20.roll(b) for n in range(dice.SLOT_DRAWS) ]
+    assert [ 21 - r for r in rolls ] == [ dice.D20.roll(turned) for n in range(dice.SLOT_DRAWS) ]
+    with pytest.raises(AssertionError):
+        a.uniform()
+
+def test__compare__same_variant_has_no_difference():
+    from compare import Variant, compare
+    variant = Variant('roster__denver_dingers.csv', None)
+    result = compare(variant, variant, 'roster__diamond_dogs.csv', 30, workers=1, seed=4)
+    for stat in ('won', 'runs', 'allowed'):
+        assert result.difference(stat) == (0.0, (0.0, 0.0))
+    assert result.n == 30
+
+def test__compare__common_random_numbers_narrow_the_interval():
+    from compare import Variant, compare
+    a = Variant('roster__denver_dingers.csv', None)
+    b = Variant('roster__denver_dingers.csv', (9, 8, 7, 6, 5, 4, 3, 2, 1))
+    for antithetic in (False, True):
+        result = compare(a, b, 'roster__diamond_dogs.csv', 200, workers=1, seed=4, antithetic=antithetic)
+        mean, ci = result.difference('runs')
+        independent = result.independent_interval('runs')
+        assert ci[0] <= mean <= ci[1]
+        assert ci[1] - ci[0] < independent[1] - independent[0]
+        assert result.variance_reduction('runs') > 1
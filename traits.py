@@ -1,29 +1,54 @@
+from collections import namedtuple
+from functools import lru_cache
+
 from enums import Traits
+import tables
+
+
+# Traits are compiled once per set of traits into what they add to each roll,
+# so nothing looks at a player's traits while a game is played: the at-bat
+# adds `swing` to the batter's d100, `pitch` to the pitcher's die, plays hits
+# off the batter's `hit_table` (the d20 roll already shifted by `hit`), and a
+# chance at a position adds the fielder's `defense` to the d12. Higher MSS
+# are worse for the batter, so a good pitcher adds and a good batter takes
+# away.
+
+Modifiers = namedtuple('Modifiers', ['swing', 'pitch', 'hit', 'defense', 'hit_table'])
 
-from events import Event
-
-
-class TODOEvent(Event):
-    def resolve(self):
-        pass
-
-
-trait_events = {
-    Traits['C+']  : TODOEvent,
-    Traits['C-']  : TODOEvent,
-    Traits['CN+'] : TODOEvent,
-    Traits['CN-'] : TODOEvent,
-    Traits['CND-']: TODOEvent,
-    Traits['D+']  : TODOEvent,
-    Traits['D-']  : TODOEvent,
-    Traits['GB+'] : TODOEvent,
-    Traits['K+']  : TODOEvent,
-    Traits['P+']  : TODOEvent,
-    Traits['P++'] : TODOEvent,
-    Traits['P-']  : TODOEvent,
-    Traits['P--'] : TODOEvent,
-    Traits['S+']  : TODOEvent,
-    Traits['S-']  : TODOEvent,
-    Traits['ST+'] : TODOEvent,
-    Traits['T+']  : TODOEvent,
+TRAIT_MODS = {
+    # trait         swing pitch  hit defense
+    Traits['C+']  : (  -2,    0,   0,   0),
+    Traits['C-']  : (   2,    0,   0,   0),
+    Traits['CN+'] : (   0,    1,   0,   0),
+    Traits['CN-'] : (   0,   -1,   0,   0),
+    Traits['CND-']: (   0,   -2,   0,   0),
+    Traits['D+']  : (   0,    0,   0,   1),
+    Traits['D-']  : (   0,    0,   0,  -1),
+    Traits['GB+'] : (   0,    0,   0,   0),  # no double plays yet
+    Traits['K+']  : (   0,    2,   0,   0),
+    Traits['P+']  : (   0,    0,   1,   0),
+    Traits['P++'] : (   0,    0,   2,   0),
+    Traits['P-']  : (   0,    0,  -1,   0),
+    Traits['P--'] : (   0,    0,  -2,   0),
+    Traits['S+']  : (   0,    0,   0,   0),  # no stolen bases yet
+    Traits['S-']  : (   0,    0,   0,   0),
+    Traits['ST+'] : (   0,    0,   0,   0),  # no fatigue yet
+    Traits['T+']  : (   0,    0,   0,   0),  # no injuries yet
 }
+
+
+def parse_traits(traits) -> tuple:
+    # Traits, their names, or a roster's space separated names
+    if isinstance(traits, str):
+        traits = traits.split()
+    return tuple( Traits[t] if isinstance(t, str) else t for t in traits )
+
+@lru_cache(maxsize=None)
+def compile_traits(traits: tuple) -> Modifiers:
+    # shared by every player with the same traits
+    unknown = [ t for t in traits if t not in TRAIT_MODS ]
+    assert not unknown, f"Not traits: {unknown}. Parse them with `Traits[name]`."
+    swing, pitch, hit, defense = map(sum, zip((0, 0, 0, 0), *(TRAIT_MODS[t] for t in traits)))
+    return Modifiers(swing, pitch, hit, defense, tables.shifted_hit_table(hit))
+
+NO_MODS = compile_traits(())